@@ -1,49 +1,489 @@
 import sys
 import json
+import hashlib
+import itertools
+import os
 import re
-from pdfminer.high_level import extract_text
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+import pdfminer
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import PDFObjRef, PDFStream
+from pdfminer.psparser import PSKeyword, PSLiteral
+from extraction_cache import ExtractionCache, file_sha256
 
-def extract_requirement_sentences(text):
-    # Normalize whitespace
-    text = re.sub(r'\s+', ' ', text)
+# Bump when a change alters extracted requirements, so cached results are not reused
+EXTRACTOR_VERSION = '3'
+# Bump when a change alters the text extracted from a page
+PAGE_TEXT_VERSION = '1'
+
+# Pages handed to each worker process, and the number of worker processes
+PAGES_PER_TASK = int(os.environ.get('EXTRACT_PAGES_PER_TASK', '8'))
+EXTRACT_WORKERS = int(os.environ.get('EXTRACT_WORKERS', str(os.cpu_count() or 1)))
+
+# Local cache of results and page text, bounded by the bytes of text it holds
+EXTRACTION_CACHE_PATH = os.environ.get('EXTRACTION_CACHE_PATH') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'extract_requirements', 'cache.sqlite3')
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get('EXTRACTION_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# Document kept open by open_document() in this process
+_OPEN_DOCUMENT = {}
+
+# Requirement modal keywords, and filler words removed from the beginning of a sentence
+MODAL_KEYWORDS = ('should', 'must', 'shall', 'could', 'can', 'may', 'might')
+FILLER_WORDS = ('so', 'then', 'thus', 'therefore', 'and', 'but', 'because', 'well')
+
+WHITESPACE = re.compile(r'\s+')
+
+# One sentence: everything up to a . ! or ? that is followed by whitespace (or the end of the text)
+SENTENCE = re.compile(r'\s*((?:[^.!?]+|[.!?](?!\s))*[.!?]?)')
+
+# End of a sentence: the whitespace after . ! or ?
+SENTENCE_END = re.compile(r'[.!?]\s+')
+
+def heading_prefix_pattern(parts):
+    # Nest every part after the first as optional, a(?:b(?:c)?)?, anchored to the end of the text
+    pattern = ''
+    for part in reversed(parts[1:]):
+        pattern = f'(?:{part}{pattern})?'
+    return re.compile(rf'{parts[0]}{pattern}\Z', re.IGNORECASE)
 
-    # Split into sentences
-    sentences = re.split(r'(?<=[.!?])\s+', text)
+class Section:
+    """A numbered document section, e.g. "3.1 Functional Requirements"
 
-    # Requirement modal keywords
-    keywords = ['should', 'must', 'shall', 'could', 'can', 'may', 'might']
+    The heading matches case-insensitively, with any whitespace between the
+    number and the title, and a hyphen in the title also matches a space.
+    """
 
-    # Remove filler words only from the beginning
-    filler_pattern = re.compile(r'^(so|then|thus|therefore|and|but|because|well)\s+', re.IGNORECASE)
+    def __init__(self, name, number, title):
+        self.name = name
+        parts = [re.escape(c) for c in number] + [r'\s*'] + ['[- ]' if c == '-' else re.escape(c) for c in title]
+        self.pattern = ''.join(parts)
+        self.heading = re.compile(self.pattern, re.IGNORECASE)
+        # Matches a heading cut off at the end of the text read so far
+        self.prefix = heading_prefix_pattern(parts)
 
-    filtered = []
-    for sentence in sentences:
+# Sections to extract, in document order; each one ends at the next one's heading
+SECTIONS = (
+    Section("functional_requirements", '3.1', 'Functional Requirements'),
+    Section("non_functional_requirements", '3.2', 'Non-Functional Requirements')
+)
+
+class RequirementClassifier:
+    """Keep the sentences of a section that state requirements
+
+    Sentences are found, filtered and cleaned in one pass with precompiled
+    patterns: questions are dropped, a sentence is kept when it contains
+    one of the modal keywords as a whole word, and one leading filler word
+    is removed. Whitespace is only normalised in the sentences kept.
+    """
+
+    def __init__(self, keywords=MODAL_KEYWORDS, fillers=FILLER_WORDS):
+        self.keywords = tuple(keywords)
+        self.fillers = tuple(fillers)
+        keyword_alternatives = '|'.join(re.escape(kw) for kw in self.keywords) or '(?!)'
+        filler_alternatives = '|'.join(re.escape(word) for word in self.fillers) or '(?!)'
+        self.keyword_pattern = re.compile(rf'\b(?:{keyword_alternatives})\b', re.IGNORECASE)
+        self.filler_pattern = re.compile(rf'^(?:{filler_alternatives})\s+', re.IGNORECASE)
+
+    def classify(self, sentence):
+        """Returns the cleaned sentence if it is a requirement, otherwise None"""
         sentence = sentence.strip()
-        if not sentence or sentence.endswith('?'):
+        if not sentence or sentence[-1] == '?' or not self.keyword_pattern.search(sentence):
+            return None
+        return WHITESPACE.sub(' ', self.filler_pattern.sub('', sentence, count=1))
+
+    def sentences(self, text):
+        """Requirement sentences of a section's text, in order"""
+        classify = self.classify
+        return [s for s in (classify(m.group(1)) for m in SENTENCE.finditer(text)) if s is not None]
+
+CLASSIFIER = RequirementClassifier()
+
+def extract_requirement_sentences(text):
+    return CLASSIFIER.sentences(text)
+
+def extract_requirements(text, sections=SECTIONS, classifier=CLASSIFIER):
+    requirements = {}
+    for i, section in enumerate(sections):
+        # Each section runs up to the next section's heading, the last one to the end of the text
+        if i + 1 < len(sections):
+            pattern = f'{section.pattern}(.*?)(?={sections[i + 1].pattern})'
+        else:
+            pattern = f'{section.pattern}(.*)'
+        match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+        raw = match.group(1).strip() if match else ""
+        requirements[section.name] = classifier.sentences(raw)
+    return requirements
+
+class HeadingFinder:
+    """Find the first heading of a section in text that arrives in pieces
+
+    Only a trailing partial heading is held back between pieces, so text
+    before the heading is released as soon as it is known not to start one.
+    """
+
+    def __init__(self, section):
+        self.heading = section.heading
+        self.prefix = section.prefix
+        self.pending = ''
+
+    def feed(self, text):
+        """Returns (text before the heading, text after it or None if not found yet)"""
+        text = self.pending + text
+        match = self.heading.search(text)
+        if match:
+            self.pending = ''
+            return text[:match.start()], text[match.end():]
+
+        partial = self.prefix.search(text)
+        cut = partial.start() if partial else len(text)
+        self.pending = text[cut:]
+        return text[:cut], None
+
+    def flush(self):
+        text, self.pending = self.pending, ''
+        return text
+
+class SentenceSplitter:
+    """Classify the complete sentences of streamed section text"""
+
+    def __init__(self, classifier):
+        self.classifier = classifier
+        self.buffer = ''
+
+    def feed(self, text):
+        # Only the new text (and the last character before it) can hold new sentence ends
+        search_from = max(len(self.buffer) - 1, 0)
+        self.buffer += text
+        end = None
+        for end in SENTENCE_END.finditer(self.buffer, search_from):
+            pass
+        if end is None:
+            return []
+        complete, self.buffer = self.buffer[:end.end()], self.buffer[end.end():]
+        return self.classifier.sentences(complete)
+
+    def flush(self):
+        text, self.buffer = self.buffer, ''
+        return self.classifier.sentences(text)
+
+class SectionTracker:
+    """Requirement sentences of one section of a streamed document
+
+    The section starts after the first start heading and ends at the first
+    end heading after it (or at the end of the document without one).
+    """
+
+    def __init__(self, name, start, end=None, classifier=CLASSIFIER):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.state = 'before'
+        self.splitter = SentenceSplitter(classifier)
+
+    @property
+    def unterminated(self):
+        """Whether the section started but its end heading never followed"""
+        return self.end is not None and self.state == 'inside'
+
+    def feed(self, text):
+        if self.state == 'before':
+            _, text = self.start.feed(text)
+            if text is None:
+                return []
+            self.state = 'inside'
+        if self.state != 'inside':
+            return []
+        if self.end is None:
+            return self.splitter.feed(text)
+
+        text, rest = self.end.feed(text)
+        sentences = self.splitter.feed(text)
+        if rest is not None:
+            self.state = 'closed'
+            sentences += self.splitter.flush()
+        return sentences
+
+    def close(self):
+        if self.state != 'inside':
+            return []
+        text = self.end.flush() if self.end is not None else ''
+        return self.splitter.feed(text) + self.splitter.flush()
+
+class RequirementStream:
+    """Incremental version of extract_requirements() over chunks of document text
+
+    Yields (section, sentence) pairs as soon as each sentence is complete.
+    A section's sentences are yielded before the next section's heading is
+    seen, so if the document never has one they have already been emitted
+    although extract_requirements() would return none for that section;
+    unterminated_sections() names those sections.
+    """
+
+    def __init__(self, sections=SECTIONS, classifier=CLASSIFIER):
+        self.trackers = [
+            SectionTracker(
+                section.name,
+                HeadingFinder(section),
+                HeadingFinder(sections[i + 1]) if i + 1 < len(sections) else None,
+                classifier)
+            for i, section in enumerate(sections)
+        ]
+
+    def unterminated_sections(self):
+        return [tracker.name for tracker in self.trackers if tracker.unterminated]
+
+    def feed(self, text):
+        for tracker in self.trackers:
+            for sentence in tracker.feed(text):
+                yield tracker.name, sentence
+
+    def close(self):
+        for tracker in self.trackers:
+            for sentence in tracker.close():
+                yield tracker.name, sentence
+
+def open_document(pdf_path):
+    """Pages and resource manager of a PDF, parsed once per process
+
+    Walking the page tree is the expensive part of opening a page, so each
+    process keeps the most recently used document open instead of walking
+    it again for every page range.
+    """
+    stat = os.stat(pdf_path)
+    key = (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+    if _OPEN_DOCUMENT.get('key') != key:
+        if 'file' in _OPEN_DOCUMENT:
+            _OPEN_DOCUMENT['file'].close()
+        _OPEN_DOCUMENT.clear()
+        f = open(pdf_path, 'rb')
+        # The parser reads objects lazily, so the file stays open with the document
+        _OPEN_DOCUMENT.update(key=key, file=f, pages=list(PDFPage.create_pages(PDFDocument(PDFParser(f)))),
+                              resources=PDFResourceManager(caching=True))
+    return _OPEN_DOCUMENT['pages'], _OPEN_DOCUMENT['resources']
+
+def count_pages(pdf_path):
+    return len(open_document(pdf_path)[0])
+
+def update_digest(digest, obj, seen=frozenset()):
+    # Hash a PDF object with its references resolved, so equal content hashes equally across files
+    if isinstance(obj, PDFObjRef):
+        if obj.objid in seen:
+            digest.update(b'<cycle>')
+            return
+        update_digest(digest, obj.resolve(), seen | {obj.objid})
+    elif isinstance(obj, PDFStream):
+        digest.update(b'<stream>')
+        update_digest(digest, obj.attrs, seen)
+        digest.update(obj.get_data())
+    elif isinstance(obj, dict):
+        digest.update(b'<<')
+        for key in sorted(obj, key=str):
+            update_digest(digest, key, seen)
+            update_digest(digest, obj[key], seen)
+        digest.update(b'>>')
+    elif isinstance(obj, (list, tuple)):
+        digest.update(b'[')
+        for item in obj:
+            update_digest(digest, item, seen)
+        digest.update(b']')
+    elif isinstance(obj, (PSLiteral, PSKeyword)):
+        digest.update(b'/' + str(obj.name).encode('utf-8'))
+    elif isinstance(obj, bytes):
+        digest.update(repr(obj).encode('ascii'))
+    else:
+        digest.update(repr(obj).encode('utf-8'))
+
+def page_fingerprints(pdf_path):
+    """Key for the text of every page, from what its text depends on
+
+    A page's text is determined by its content streams, its resources
+    (fonts and form XObjects) and its boxes and rotation, so a page that is
+    unchanged in an edited document keeps its key.
+
+    Returns:
+        List of hex digests, or None for pages that could not be fingerprinted
+    """
+    fingerprints = []
+    for number, page in enumerate(open_document(pdf_path)[0], start=1):
+        digest = hashlib.sha256(f'{PAGE_TEXT_VERSION}:{pdfminer.__version__}'.encode('utf-8'))
+        try:
+            update_digest(digest, [page.contents, page.resources, page.mediabox, page.cropbox, page.rotate])
+            fingerprints.append(digest.hexdigest())
+        except Exception as e:
+            print(f"Could not fingerprint page {number}: {e}", file=sys.stderr)
+            fingerprints.append(None)
+    return fingerprints
+
+def extract_page_texts(pdf_path, page_numbers):
+    """Text of each of the given pages, exactly as extract_text() renders them
+
+    Each page's text ends with a form feed, so consecutive pages concatenate
+    to the whole document's text.
+    """
+    pages, resources = open_document(pdf_path)
+    texts = []
+    with StringIO() as output:
+        device = TextConverter(resources, output, laparams=LAParams())
+        interpreter = PDFPageInterpreter(resources, device)
+        for number in page_numbers:
+            interpreter.process_page(pages[number])
+            texts.append(output.getvalue())
+            output.seek(0)
+            output.truncate()
+    return texts
+
+def extract_tasks(pdf_path, tasks, workers):
+    """Yield the page texts of each task (a list of page numbers), in order
+
+    Tasks are extracted by a process pool with a bounded number in flight,
+    so memory does not grow with the length of the document.
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        for pages in tasks:
+            yield extract_page_texts(pdf_path, pages)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        pending = iter(tasks)
+        in_flight = [executor.submit(extract_page_texts, pdf_path, pages)
+                     for pages in itertools.islice(pending, 2 * workers)]
+        while in_flight:
+            texts = in_flight.pop(0).result()
+            pages = next(pending, None)
+            if pages is not None:
+                in_flight.append(executor.submit(extract_page_texts, pdf_path, pages))
+            yield texts
+
+def iter_page_texts(pdf_path, workers=EXTRACT_WORKERS, pages_per_task=PAGES_PER_TASK, cache=None):
+    """Yield the text of every page, in order
+
+    With a cache, pages whose fingerprint is cached are not extracted again
+    and newly extracted pages are added to it.
+    """
+    if cache is not None:
+        fingerprints = page_fingerprints(pdf_path)
+        found = cache.get_pages([key for key in fingerprints if key is not None])
+        cached = {page: found[key] for page, key in enumerate(fingerprints) if key in found}
+        page_count = len(fingerprints)
+    else:
+        cached = {}
+        page_count = count_pages(pdf_path)
+
+    missing = [page for page in range(page_count) if page not in cached]
+    pages_per_task = max(1, pages_per_task)
+    tasks = [missing[i:i + pages_per_task] for i in range(0, len(missing), pages_per_task)]
+    results = zip(tasks, extract_tasks(pdf_path, tasks, workers))
+
+    extracted = {}
+    for page in range(page_count):
+        if page in cached:
+            yield cached[page]
             continue
-        if any(re.search(rf'\b{kw}\b', sentence, re.IGNORECASE) for kw in keywords):
-            sentence = filler_pattern.sub('', sentence)
-            filtered.append(sentence)
-    return filtered
-
-def extract_requirements(text):
-    # Match sections
-    functional_pattern = r'3\.1\s*Functional Requirements(.*?)(?=3\.2\s*Non[- ]Functional Requirements)'
-    non_functional_pattern = r'3\.2\s*Non[- ]Functional Requirements(.*)'
-
-    functional_match = re.search(functional_pattern, text, re.IGNORECASE | re.DOTALL)
-    non_functional_match = re.search(non_functional_pattern, text, re.IGNORECASE | re.DOTALL)
-
-    functional_raw = functional_match.group(1).strip() if functional_match else ""
-    non_functional_raw = non_functional_match.group(1).strip() if non_functional_match else ""
-
-    return {
-        "functional_requirements": extract_requirement_sentences(functional_raw),
-        "non_functional_requirements": extract_requirement_sentences(non_functional_raw)
-    }
-
-# Entry point
-pdf_path = sys.argv[1]
-text = extract_text(pdf_path)
-requirements = extract_requirements(text)
-print(json.dumps(requirements, indent=2))
+        if page not in extracted:
+            pages, texts = next(results)
+            extracted.update(zip(pages, texts))
+            if cache is not None:
+                cache.put_pages({fingerprints[p]: text for p, text in zip(pages, texts) if fingerprints[p]})
+        yield extracted.pop(page)
+
+def result_cache_key(pdf_path):
+    # The extractor version, pdfminer version and requirement settings all change the result
+    settings = json.dumps([EXTRACTOR_VERSION, pdfminer.__version__, CLASSIFIER.keywords, CLASSIFIER.fillers,
+                           [[section.name, section.pattern] for section in SECTIONS]])
+    return f"{file_sha256(pdf_path)}:{hashlib.sha256(settings.encode('utf-8')).hexdigest()}"
+
+def stream_requirements(pdf_path, workers=EXTRACT_WORKERS, pages_per_task=PAGES_PER_TASK, cache=None):
+    """Yield (section, sentence) pairs from a PDF as pages are extracted
+
+    A cached result for the same PDF bytes and extractor version is replayed
+    without opening the PDF.
+
+    Returns:
+        Names of the sections whose end heading never appeared
+    """
+    key = result_cache_key(pdf_path) if cache is not None else None
+    result = cache.get_result(key) if key else None
+    if result is not None:
+        for section, sentence in result['requirements']:
+            yield section, sentence
+        return result['unterminated_sections']
+
+    stream = RequirementStream()
+    requirements = []
+    for text in iter_page_texts(pdf_path, workers, pages_per_task, cache):
+        for event in stream.feed(text):
+            requirements.append(event)
+            yield event
+    for event in stream.close():
+        requirements.append(event)
+        yield event
+
+    unterminated = stream.unterminated_sections()
+    if cache is not None:
+        cache.put_result(key, {'requirements': requirements, 'unterminated_sections': unterminated})
+    return unterminated
+
+def extract_pdf(pdf_path, cache=None, workers=EXTRACT_WORKERS, pages_per_task=PAGES_PER_TASK, on_requirement=None):
+    """Extract the requirements of a PDF, as extract_requirements() would from its text
+
+    Args:
+        cache: Optional ExtractionCache
+        on_requirement: Optional callback(section, sentence) called as each requirement is found
+
+    Returns:
+        Tuple of (dictionary of requirement lists by section, names of unterminated sections)
+    """
+    requirements = {section.name: [] for section in SECTIONS}
+    events = stream_requirements(pdf_path, workers, pages_per_task, cache)
+    while True:
+        try:
+            section, sentence = next(events)
+        except StopIteration as done:
+            unterminated = done.value
+            break
+        if on_requirement is not None:
+            on_requirement(section, sentence)
+        requirements[section].append(sentence)
+
+    # A section whose end heading never appears is empty in the regex version
+    for name in unterminated:
+        requirements[name] = []
+    return requirements, unterminated
+
+def main():
+    args = sys.argv[1:]
+    ndjson = '--ndjson' in args
+    use_cache = '--no-cache' not in args
+    args = [arg for arg in args if arg not in ('--ndjson', '--no-cache')]
+    if not args:
+        print("Usage: python extract_requirements.py <pdf_path> [--ndjson] [--no-cache]", file=sys.stderr)
+        sys.exit(1)
+    pdf_path = args[0]
+
+    def emit(section, sentence):
+        # One line per requirement, written as soon as it is found
+        print(json.dumps({"section": section, "requirement": sentence}), flush=True)
+
+    cache = ExtractionCache(EXTRACTION_CACHE_PATH, EXTRACTION_CACHE_MAX_BYTES) if use_cache else None
+    requirements, unterminated = extract_pdf(pdf_path, cache, on_requirement=emit if ndjson else None)
+    if cache is not None:
+        print(f"Extraction cache: {json.dumps(cache.stats())}", file=sys.stderr)
+        cache.close()
+
+    if ndjson:
+        summary = {"done": True}
+        summary.update((name, len(sentences)) for name, sentences in requirements.items())
+        summary["unterminated_sections"] = unterminated
+        print(json.dumps(summary), flush=True)
+    else:
+        print(json.dumps(requirements, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """SQLite cache of extraction results and per-page text
+
+    Results are keyed by the PDF's SHA-256 plus the extractor version, page
+    text by a fingerprint of the page's content. Both kinds share one
+    least-recently-used table, trimmed to max_bytes of cached text after
+    every write.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._db = None
+
+        # Hit/miss counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Several uploads can be extracted at the same time
+            self._db = sqlite3.connect(path, timeout=30, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            # Losing the last writes on power failure only costs a re-extraction
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS entries '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error opening extraction cache: {e}", file=sys.stderr)
+            self._db = None
+
+    def get_result(self, key):
+        """Return the cached extraction result for key, or None"""
+        values = self._get_many(['result:' + key])
+        if values:
+            self.hits += 1
+            return json.loads(values['result:' + key])
+        self.misses += 1
+        return None
+
+    def put_result(self, key, result):
+        self._put_many({'result:' + key: json.dumps(result)})
+
+    def get_pages(self, keys):
+        """Return a dictionary of cached page text for the keys that are cached"""
+        values = self._get_many(['page:' + key for key in keys])
+        pages = {key: values['page:' + key] for key in keys if 'page:' + key in values}
+        self.hits += len(pages)
+        self.misses += len(set(keys)) - len(pages)
+        return pages
+
+    def put_pages(self, pages):
+        """Store page text keyed by page fingerprint"""
+        self._put_many({'page:' + key: text for key, text in pages.items()})
+
+    def _get_many(self, keys):
+        if self._db is None or not keys:
+            return {}
+        values = {}
+        try:
+            # Stay below SQLite's limit on query parameters
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                values.update(self._db.execute(
+                    f'SELECT key, value FROM entries WHERE key IN ({placeholders})', chunk).fetchall())
+                self._db.execute(f'UPDATE entries SET accessed = ? WHERE key IN ({placeholders})',
+                                 [time.time()] + chunk)
+        except sqlite3.Error as e:
+            print(f"Error reading extraction cache: {e}", file=sys.stderr)
+        return values
+
+    def _put_many(self, values):
+        if self._db is None or not values:
+            return
+        try:
+            now = time.time()
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)',
+                    [(key, value, len(value), now) for key, value in values.items()]
+                )
+                self._trim()
+                self._db.execute('COMMIT')
+            except sqlite3.Error:
+                self._db.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            print(f"Error writing extraction cache: {e}", file=sys.stderr)
+
+    def _trim(self):
+        """Evict least recently used entries until the cache is within max_bytes"""
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for key, size in self._db.execute('SELECT key, size FROM entries ORDER BY accessed'):
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._db.executemany('DELETE FROM entries WHERE key = ?', evicted)
+        self.evictions += len(evicted)
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        entries, size = 0, 0
+        if self._db is not None:
+            try:
+                entries, size = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+            except sqlite3.Error:
+                pass
+        return {
+            'path': self.path,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
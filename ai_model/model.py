@@ -1,44 +1,194 @@
-import tensorflow as tf
 from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.text import Tokenizer
 from tensorflow.keras.preprocessing.sequence import pad_sequences
-import string
 import numpy as np
+import json
+import os
 import sys
-import pickle
+from utils import load_tokenizers
 
-# Load the saved model
-model = load_model('software_task_model.h5')
+# Model file (saved during training), next to this script by default so it is found from any
+# working directory; the tokenizers are loaded by utils.py
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.environ.get('TASK_MODEL_PATH', os.path.join(MODEL_DIR, 'software_task_model.h5'))
 
-# Load tokenizers (ensure these tokenizers are saved correctly during training)
-with open('tokenizer_inp.pkl', 'rb') as f_inp, open('tokenizer_out.pkl', 'rb') as f_out:
-    tokenizer_inp = pickle.load(f_inp)
-    tokenizer_out = pickle.load(f_out)
+# Requirements per forward pass
+BATCH_SIZE = int(os.environ.get('TASK_MODEL_BATCH_SIZE', '256'))
 
-# Function to preprocess input text
-def preprocess_input(text, tokenizer_inp, max_len=100):
-    sequence = tokenizer_inp.texts_to_sequences([text])
-    padded_sequence = pad_sequences(sequence, maxlen=max_len, padding='post')
-    return padded_sequence
+# With TASK_MODEL_BUCKETING=true, inputs are padded to the smallest of these lengths that fits them
+# rather than always to max_len. The model's output is as long as its input, so shorter padding can
+# cut tasks short; only enable it once --check-buckets reports no mismatches for the model.
+LENGTH_BUCKETS = (8, 16, 32, 64)
+BUCKETING = os.environ.get('TASK_MODEL_BUCKETING', 'false').lower() == 'true'
 
-# Function to decode the output sequence
-def decode_output(sequence, tokenizer_out):
-    return tokenizer_out.sequences_to_texts(sequence)
+# Optional end-of-sequence word; decoding stops at it (it is kept by default)
+END_TOKEN = os.environ.get('TASK_END_TOKEN') or None
 
-# Main method to run the script
-def main():
+_model = None
+_output_words = {}
+
+# Load the saved model on first use
+def get_model():
+    global _model
+    if _model is None:
+        _model = load_model(MODEL_PATH)
+    return _model
+
+# Function to preprocess input text (one string or a list of strings) into one padded batch
+def preprocess_input(texts, tokenizer_inp, max_len=100):
+    if isinstance(texts, str):
+        texts = [texts]
+    sequences = tokenizer_inp.texts_to_sequences(texts)
+    padded_sequences = pad_sequences(sequences, maxlen=max_len, padding='post')
+    return padded_sequences
+
+# Function to decode the output sequences
+def decode_output(sequences, tokenizer_out):
+    sequences = np.asarray(sequences)
+    return decode_ids(sequences, output_words(tokenizer_out, int(sequences.max(initial=0)) + 1))
+
+def output_words(tokenizer_out, size):
+    """Word emitted for every output index, as sequences_to_texts would emit it
+
+    Index 0 (padding) and other unknown indices become the OOV word when the
+    tokenizer has one and '' otherwise, and indices at or above num_words
+    become the OOV word or ''.
+    """
+    size = max(size, max(tokenizer_out.index_word, default=0) + 1)
+    key = (id(tokenizer_out), size)
+    words = _output_words.get(key)
+    if words is not None:
+        return words
+
+    num_words = tokenizer_out.num_words
+    oov_word = tokenizer_out.index_word.get(tokenizer_out.word_index.get(tokenizer_out.oov_token)) or ''
+    words = np.full(size, oov_word, dtype=object)
+    for index, word in tokenizer_out.index_word.items():
+        words[index] = oov_word if num_words and index >= num_words else word
+    _output_words[key] = words
+    return words
+
+def decode_ids(ids, words, end_token=END_TOKEN):
+    """Join the words of each row of output indices, skipping empty ones"""
+    tokens = words[ids]
+    present = tokens != ''
+    if end_token is not None:
+        # Drop the end token and everything after it
+        ended = np.cumsum(tokens == end_token, axis=1) > 0
+        present &= ~ended
+    texts = []
+    for row, keep in zip(tokens, present):
+        texts.append(' '.join(row[keep]))
+    return texts
+
+def bucket_inputs(sequences, max_len, buckets):
+    """Group token sequences into length buckets, each padded to its own length
+
+    Sequences longer than max_len keep their last max_len tokens and are
+    padded at the end, like pad_sequences(maxlen=max_len, padding='post').
+
+    Returns:
+        List of (positions in sequences, padded int32 array) pairs
+    """
+    lengths = np.fromiter((min(len(seq), max_len) for seq in sequences), dtype=np.int64, count=len(sequences))
+    bucket_ids = np.searchsorted(buckets, lengths, side='left')
+    groups = []
+    for bucket_id in np.unique(bucket_ids):
+        positions = np.flatnonzero(bucket_ids == bucket_id)
+        padded = np.zeros((len(positions), buckets[bucket_id]), dtype=np.int32)
+        for row, position in enumerate(positions):
+            seq = sequences[position][-max_len:] if lengths[position] else []
+            padded[row, :len(seq)] = seq
+        groups.append((positions, padded))
+    return groups
+
+def fixed_input_length(model):
+    # Models built with a fixed sequence length cannot take shorter buckets
+    try:
+        return model.inputs[0].shape[1]
+    except (AttributeError, IndexError, TypeError):
+        return None
 
-    input_text = "email notification setup"
+def predict_tasks(requirements, batch_size=BATCH_SIZE, max_len=100, bucketing=BUCKETING):
+    """Predict one development task per requirement with batched forward passes
 
-    # Preprocess input text
-    input_sequence = preprocess_input(input_text, tokenizer_inp)
+    Inputs are padded to max_len. With bucketing, requirements of similar
+    length share a batch padded to their bucket's length instead, so short
+    requirements do not pay for max_len positions.
+
+    Args:
+        requirements: List of requirement sentences
+        bucketing: Whether to pad each length bucket only to its own length
+
+    Returns:
+        List of decoded tasks, in the same order as requirements
+    """
+    if not requirements:
+        return []
+    tokenizer_inp, tokenizer_out = load_tokenizers()
+    model = get_model()
+
+    # Identical requirements are only predicted once
+    unique = list(dict.fromkeys(requirements))
+    sequences = tokenizer_inp.texts_to_sequences(unique)
+
+    fixed_len = fixed_input_length(model)
+    max_len = fixed_len or max_len
+    if bucketing and fixed_len is None:
+        buckets = sorted({min(length, max_len) for length in LENGTH_BUCKETS} | {max_len})
+    else:
+        buckets = [max_len]
+
+    decoded = [None] * len(unique)
+    for positions, input_sequences in bucket_inputs(sequences, max_len, buckets):
+        # verbose=0 keeps the progress bar out of the JSON written to stdout
+        output_sequences = model.predict([input_sequences, input_sequences], batch_size=batch_size, verbose=0)
+        ids = output_sequences.argmax(axis=-1)
+        words = output_words(tokenizer_out, output_sequences.shape[-1])
+        for position, task in zip(positions, decode_ids(ids, words)):
+            decoded[position] = task
+
+    tasks = dict(zip(unique, decoded))
+    return [tasks[requirement] for requirement in requirements]
+
+def check_bucketing(requirements):
+    """Compare bucketed predictions with predictions padded to max_len
+
+    Returns:
+        Dictionary with the number of requirements whose task differs
+    """
+    bucketed = predict_tasks(requirements, bucketing=True)
+    padded = predict_tasks(requirements, bucketing=False)
+    mismatches = [r for r, a, b in zip(requirements, bucketed, padded) if a != b]
+    return {"requirements": len(requirements), "mismatches": len(mismatches), "examples": mismatches[:5]}
+
+def read_requirements(stream):
+    # Accept a JSON list of sentences or an object with a "requirements" list
+    data = json.load(stream)
+    if isinstance(data, dict):
+        data = data.get('requirements', [])
+    if not isinstance(data, list) or not all(isinstance(item, str) for item in data):
+        raise ValueError('Expected a JSON list of requirement strings')
+    return data
+
+# Main method to run the script: requirements as arguments, or as JSON on stdin
+def main():
+    args = sys.argv[1:]
+    check = '--check-buckets' in args
+    args = [arg for arg in args if arg != '--check-buckets']
+    try:
+        requirements = args or read_requirements(sys.stdin)
+    except ValueError as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
 
-    # Predict task (development task)
-    output_sequence = model.predict([input_sequence, input_sequence])
+    if check:
+        print(json.dumps(check_bucketing(requirements)))
+        return
 
-    # Decode the output sequence (this will be the task)
-    output_text = decode_output(output_sequence.argmax(axis=-1), tokenizer_out)
-    print("Predicted Task:", output_text)
+    tasks = predict_tasks(requirements)
+    print(json.dumps({
+        "tasks": [{"requirement": requirement, "task": task} for requirement, task in zip(requirements, tasks)]
+    }))
 
 if __name__ == "__main__":
     main()
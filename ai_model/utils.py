@@ -1,43 +1,111 @@
 import sys
 import json
-from tensorflow.keras.preprocessing.text import Tokenizer
+import os
+import pickle
 from tensorflow.keras.preprocessing.sequence import pad_sequences
 
-# Example Tokenizer and max_len (you can modify this based on your actual tokenizer and max_len)
-tokenizer = Tokenizer()
+# Tokenizers fitted during training, shared with model.py; next to this script by default
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+TOKENIZER_INP_PATH = os.environ.get('TOKENIZER_INP_PATH', os.path.join(MODEL_DIR, 'tokenizer_inp.pkl'))
+TOKENIZER_OUT_PATH = os.environ.get('TOKENIZER_OUT_PATH', os.path.join(MODEL_DIR, 'tokenizer_out.pkl'))
+
 max_len = 100
 
+# Set UTILS_DEBUG=true to log every step to stderr
+DEBUG = os.environ.get('UTILS_DEBUG', 'false').lower() == 'true'
+
+_tokenizers = None
+
+def load_tokenizers():
+    """Load the fitted input and output tokenizers once per process
+
+    The vocabularies are frozen: texts are never fitted on, so the same text
+    always gets the same sequence and sequences decode with the training
+    vocabulary.
+
+    Returns:
+        Tuple of (input tokenizer, output tokenizer)
+    """
+    global _tokenizers
+    if _tokenizers is None:
+        with open(TOKENIZER_INP_PATH, 'rb') as f_inp, open(TOKENIZER_OUT_PATH, 'rb') as f_out:
+            _tokenizers = (pickle.load(f_inp), pickle.load(f_out))
+    return _tokenizers
+
 def preprocess_input(text, tokenizer, max_len):
-    # Fit the tokenizer on the text if it's not already fitted
-    tokenizer.fit_on_texts([text])
-    
     # Debugging statements should not be part of the JSON output
-    print(f"Original text: {text}", file=sys.stderr)  # Send to stderr for debugging purposes
-    
+    if DEBUG:
+        print(f"Original text: {text}", file=sys.stderr)  # Send to stderr for debugging purposes
+
     # Tokenize the input text
     sequence = tokenizer.texts_to_sequences([text])
-    print(f"Tokenized sequence: {sequence}", file=sys.stderr)  # Send to stderr
-    
+    if DEBUG:
+        print(f"Tokenized sequence: {sequence}", file=sys.stderr)  # Send to stderr
+
     # Pad the sequences to ensure consistent length
     padded_sequence = pad_sequences(sequence, maxlen=max_len, padding='post')
-    print(f"Padded sequence: {padded_sequence}", file=sys.stderr)  # Send to stderr
-    
+    if DEBUG:
+        print(f"Padded sequence: {padded_sequence}", file=sys.stderr)  # Send to stderr
+
     return padded_sequence  # This is the actual JSON output
 
+def pad_sequence(sequence, max_len):
+    # Same as one row of pad_sequences(maxlen=max_len, padding='post'): keep the last max_len tokens
+    sequence = sequence[-max_len:] if len(sequence) > max_len else sequence
+    return list(sequence) + [0] * (max_len - len(sequence))
+
 def postprocess_output(sequence, tokenizer):
     # Convert sequence back to text
     text = tokenizer.sequences_to_texts(sequence)
     return text
 
+def stream(action, lines, out):
+    """Answer one JSON line per input line, flushing after each
+
+    For preprocess every line is a text (plain, or a JSON string when it
+    contains newlines) and the answer is its padded sequence. For
+    postprocess every line is a JSON list of token indices and the answer
+    is its text.
+    """
+    tokenizer_inp, tokenizer_out = load_tokenizers()
+    for line in lines:
+        line = line.rstrip('\n')
+        try:
+            if action == "preprocess":
+                text = line
+                if line.startswith('"'):
+                    # A JSON string, unless it is plain text that happens to start with a quote
+                    try:
+                        text = json.loads(line)
+                    except ValueError:
+                        pass
+                sequence = tokenizer_inp.texts_to_sequences([text])[0]
+                result = pad_sequence(sequence, max_len)
+            else:
+                sequence = json.loads(line)
+                if not isinstance(sequence, list):
+                    raise ValueError('Expected a JSON list of token indices')
+                result = tokenizer_out.sequences_to_texts([sequence])[0]
+        except (TypeError, ValueError) as e:
+            result = {"error": str(e)}
+        out.write(json.dumps(result) + '\n')
+        out.flush()
+
 # Main code to handle input and call the functions
 if __name__ == "__main__":
-    action = sys.argv[1]
-    
-    if action == "preprocess":
+    action = sys.argv[1] if len(sys.argv) > 1 else None
+    if action not in ("preprocess", "postprocess"):
+        print("Usage: python utils.py preprocess|postprocess [input]  (one input per stdin line without one)",
+              file=sys.stderr)
+        sys.exit(1)
+
+    if len(sys.argv) < 3:
+        stream(action, sys.stdin, sys.stdout)
+    elif action == "preprocess":
         input_text = sys.argv[2]
-        result = preprocess_input(input_text, tokenizer, max_len)
+        result = preprocess_input(input_text, load_tokenizers()[0], max_len)
         print(json.dumps(result.tolist()))  # Return the result as JSON
     elif action == "postprocess":
         input_sequence = json.loads(sys.argv[2])
-        result = postprocess_output(input_sequence, tokenizer)
+        result = postprocess_output(input_sequence, load_tokenizers()[1])
         print(json.dumps(result))  # Return the result as JSON
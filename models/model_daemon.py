@@ -0,0 +1,716 @@
+import itertools
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import signal
+import socketserver
+import sys
+import threading
+import time
+
+# The services are flat scripts in these directories
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_PATHS = [os.path.join(BASE_DIR, 'risk'), os.path.join(os.path.dirname(BASE_DIR), 'ai_model')]
+
+# Services a worker can host. Requests are newline-delimited JSON objects on the socket, e.g.
+#   {"id": 1, "service": "estimator", "type": "predict", "input": {...}}
+#   {"id": 2, "service": "extractor", "pdf_path": "/tmp/upload.pdf"}
+#   {"id": 3, "service": "tasks", "requirements": ["The system shall ..."]}
+#   {"id": 4, "service": "daemon", "type": "stats"}
+# and every answer is one line with the same id and a result or an error.
+SERVICES = ('estimator', 'extractor', 'tasks')
+
+USAGE = ("Usage: python model_daemon.py [--socket path] [--workers n] [--services estimator,extractor,tasks] "
+         "[--queue-size n] [--reload-interval seconds]")
+
+# Daemon settings, overridable on the command line
+DAEMON_SOCKET = os.environ.get('MODEL_DAEMON_SOCKET', '/tmp/model_daemon.sock')
+DAEMON_WORKERS = int(os.environ.get('MODEL_DAEMON_WORKERS', '2'))
+DAEMON_SERVICES = os.environ.get('MODEL_DAEMON_SERVICES', ','.join(SERVICES))
+
+# Requests that can wait for a worker, and how long a request waits for room before it is refused
+DAEMON_QUEUE_SIZE = int(os.environ.get('MODEL_DAEMON_QUEUE_SIZE', '64'))
+DAEMON_QUEUE_TIMEOUT = float(os.environ.get('MODEL_DAEMON_QUEUE_TIMEOUT', '5'))
+
+# Longest time a request may take, and the longest time workers may take to load their models
+DAEMON_REQUEST_TIMEOUT = float(os.environ.get('MODEL_DAEMON_REQUEST_TIMEOUT', '900'))
+DAEMON_START_TIMEOUT = float(os.environ.get('MODEL_DAEMON_START_TIMEOUT', '600'))
+
+# Seconds between checks of the model artifacts (0 disables automatic reloads)
+DAEMON_RELOAD_INTERVAL = float(os.environ.get('MODEL_DAEMON_RELOAD_INTERVAL', '10'))
+
+# Shortest time between starts of the same worker, so a worker that cannot load does not spin
+WORKER_RESTART_DELAY = 5.0
+
+
+class ServerBusy(Exception):
+    """Raised when the request queue stays full for longer than the queue timeout"""
+
+
+def load_service(name):
+    """Import one service and load its models
+
+    Args:
+        name: 'estimator', 'extractor' or 'tasks'
+
+    Returns:
+        Tuple of (request handler, artifact paths to watch, close function)
+    """
+    if name == 'estimator':
+        import predict
+
+        models = predict.get_models()
+
+        def handle(request):
+            if request.get('type') == 'shutdown':
+                raise ValueError("Stop the daemon with a daemon shutdown request")
+            return predict.handle_request(request, models)
+
+        return handle, predict.model_artifact_paths(), predict.close_prediction_logs
+
+    if name == 'extractor':
+        import extract_requirements
+        from extraction_cache import ExtractionCache
+
+        cache = ExtractionCache(extract_requirements.EXTRACTION_CACHE_PATH,
+                                extract_requirements.EXTRACTION_CACHE_MAX_BYTES)
+
+        def handle(request):
+            request_type = request.get('type', 'extract')
+            if request_type == 'stats':
+                return cache.stats()
+            if request_type != 'extract':
+                raise ValueError(f"Unknown request type: {request_type}")
+            if 'pdf_path' not in request:
+                raise ValueError("Missing 'pdf_path' for extract request")
+            requirements, _ = extract_requirements.extract_pdf(
+                request['pdf_path'], None if request.get('no_cache') else cache)
+            return requirements
+
+        # Extraction has no model; the code version is part of its cache keys
+        return handle, [], cache.close
+
+    if name == 'tasks':
+        import model
+        import utils
+
+        model.get_model()
+        utils.load_tokenizers()
+
+        def handle(request):
+            request_type = request.get('type', 'predict')
+            if request_type != 'predict':
+                raise ValueError(f"Unknown request type: {request_type}")
+            requirements = request.get('requirements')
+            if not isinstance(requirements, list) or not all(isinstance(item, str) for item in requirements):
+                raise ValueError("Expected 'requirements' to be a list of strings")
+            tasks = model.predict_tasks(requirements)
+            return {'tasks': [{'requirement': requirement, 'task': task}
+                              for requirement, task in zip(requirements, tasks)]}
+
+        paths = [model.MODEL_PATH, utils.TOKENIZER_INP_PATH, utils.TOKENIZER_OUT_PATH]
+        return handle, [os.path.abspath(path) for path in paths], lambda: None
+
+    raise ValueError(f"Unknown service: {name}")
+
+
+def worker_main(conn, service_names):
+    """Load the services, then answer requests from the daemon until a None sentinel arrives
+
+    Every message to the daemon is a tuple: ('ready', artifact paths),
+    ('failed', load error) or ('done', request key, response).
+    """
+    for path in SERVICE_PATHS:
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    # Ctrl-C reaches the whole process group; only the daemon reacts to it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    handlers, closers, artifacts = {}, [], []
+    try:
+        for name in service_names:
+            handlers[name], paths, close = load_service(name)
+            artifacts.extend(paths)
+            closers.append(close)
+    except Exception as e:
+        conn.send(('failed', f"{name}: {type(e).__name__}: {e}"))
+        return
+    conn.send(('ready', artifacts))
+
+    try:
+        while True:
+            try:
+                task = conn.recv()
+            except EOFError:
+                break
+            if task is None:
+                break
+            key, service, request = task
+            try:
+                response = {'result': handlers[service](request)}
+            except Exception as e:
+                print(f"Failed to process {service} request: {e}", file=sys.stderr)
+                response = {'error': f"Failed to process input: {str(e)}"}
+            conn.send(('done', key, response))
+    finally:
+        # multiprocessing workers exit without running atexit handlers
+        for close in closers:
+            close()
+
+
+def artifact_signature(paths):
+    """Size and modification time of every artifact (None for missing files)"""
+    signature = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature[path] = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            signature[path] = None
+    return signature
+
+
+class PendingRequest:
+    """A queued request waiting for its response"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.response = None
+
+
+class Worker:
+    """One worker process and the pipe the daemon talks to it over
+
+    Each worker has its own pipe, so a worker that crashes only loses the
+    request it was answering.
+    """
+
+    def __init__(self, ctx, generation, index, service_names):
+        self.generation = generation
+        self.index = index
+        self.conn, child_conn = ctx.Pipe()
+        # Not a daemonic process: the estimator and extractor start their own pools
+        self.process = ctx.Process(target=worker_main, name=f'model-worker-{generation.number}-{index}',
+                                   args=(child_conn, service_names))
+        self.process.start()
+        child_conn.close()
+        self.started = time.time()
+        self.ready = False
+        self.task = None
+        self.retired = False
+        self.closed = False
+
+    def stop(self):
+        """Ask the worker to exit; it finishes its current request first"""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+
+
+class Generation:
+    """Workers loaded from the same model artifacts"""
+
+    def __init__(self, number, ctx, service_names, workers):
+        self.number = number
+        self.failed = None
+        self.artifacts = []
+        self.loaded = threading.Event()
+        self.workers = [Worker(ctx, self, index, service_names) for index in range(workers)]
+
+
+class WorkerPool:
+    """Model worker processes behind a bounded request queue
+
+    A dispatcher thread hands queued requests to idle workers of the current
+    generation. Reloading starts a new generation next to the current one
+    and switches to it once its models are loaded; the old workers finish
+    the request they are answering and exit.
+
+    Args:
+        service_names: Services every worker loads
+        workers: Worker processes
+        queue_size: Requests that can wait for a worker
+        queue_timeout: Seconds a request waits for room in the queue before ServerBusy
+        request_timeout: Seconds a request waits for its response
+        reload_interval: Seconds between artifact checks (0 disables automatic reloads)
+        start_timeout: Seconds workers may take to load their models
+    """
+
+    def __init__(self, service_names, workers=DAEMON_WORKERS, queue_size=DAEMON_QUEUE_SIZE,
+                 queue_timeout=DAEMON_QUEUE_TIMEOUT, request_timeout=DAEMON_REQUEST_TIMEOUT,
+                 reload_interval=DAEMON_RELOAD_INTERVAL, start_timeout=DAEMON_START_TIMEOUT):
+        for name in service_names:
+            if name not in SERVICES:
+                raise ValueError(f"Unknown service: {name}")
+        self.service_names = list(service_names)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.request_timeout = request_timeout
+        self.reload_interval = reload_interval
+        self.start_timeout = start_timeout
+
+        self._ctx = multiprocessing.get_context('spawn')
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._keys = itertools.count(1)
+        self._numbers = itertools.count(1)
+        self._pending = {}
+        # Guards the generations and the state of their workers
+        self._cond = threading.Condition()
+        self._reload_lock = threading.Lock()
+        self._generations = {}
+        self._accepting = True
+        self._stopping = threading.Event()
+        self.current = None
+        self._signature = {}
+
+        # Counters
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.reloads = 0
+
+        self._threads = [threading.Thread(target=target, name=f'model-daemon-{name}', daemon=True)
+                         for name, target in (('receiver', self._receive), ('dispatcher', self._dispatch),
+                                              ('monitor', self._watch))]
+
+    def start(self):
+        """Start the workers and wait until their models are loaded"""
+        self._threads[0].start()
+        self.current = self._start_generation()
+        self._signature = artifact_signature(self.current.artifacts)
+        for thread in self._threads[1:]:
+            thread.start()
+
+    def submit(self, service, request):
+        """Queue one request and wait for its response
+
+        Returns:
+            Dictionary with either 'result' or 'error'
+
+        Raises:
+            ServerBusy: If the queue stayed full for queue_timeout seconds
+            TimeoutError: If no response arrived within request_timeout seconds
+        """
+        if not self._accepting:
+            raise RuntimeError('Daemon is shutting down')
+        key = next(self._keys)
+        pending = PendingRequest()
+        self._pending[key] = pending
+        try:
+            try:
+                self._queue.put((key, service, request), timeout=self.queue_timeout)
+            except queue.Full:
+                self.rejected += 1
+                raise ServerBusy('Server busy, retry later') from None
+
+            if not pending.event.wait(self.request_timeout):
+                self.timeouts += 1
+                raise TimeoutError(f"No response within {self.request_timeout:g}s")
+            return pending.response
+        finally:
+            self._pending.pop(key, None)
+
+    def reload(self):
+        """Load a new generation of workers and switch to it once it is ready
+
+        If the new workers fail to load, the current ones keep serving.
+
+        Returns:
+            Dictionary with the new generation number
+        """
+        with self._reload_lock:
+            if self._stopping.is_set():
+                raise RuntimeError('Daemon is shutting down')
+            generation = self._start_generation()
+            with self._cond:
+                previous, self.current = self.current, generation
+                self._retire(previous)
+                self._cond.notify_all()
+            self._signature = artifact_signature(generation.artifacts)
+            self.reloads += 1
+            print(f"Model daemon reloaded (generation {generation.number})", file=sys.stderr)
+            return {'generation': generation.number}
+
+    def shutdown(self, timeout=30):
+        """Answer the requests already queued, then stop the workers"""
+        self._accepting = False
+        deadline = time.time() + timeout
+        if self._threads[1].is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+                self._threads[1].join(max(0, deadline - time.time()))
+            except queue.Full:
+                pass
+
+        with self._reload_lock, self._cond:
+            self._stopping.set()
+            for generation in self._generations.values():
+                self._retire(generation)
+            workers = [worker for generation in self._generations.values() for worker in generation.workers]
+        for worker in workers:
+            worker.process.join(max(0, deadline - time.time()))
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+    def stats(self):
+        """Queue, worker and request counters"""
+        generation = self.current
+        return {
+            'services': self.service_names,
+            'generation': generation.number if generation is not None else None,
+            'workers': [{'pid': worker.process.pid, 'alive': worker.process.is_alive(), 'busy': worker.task is not None}
+                        for worker in generation.workers] if generation is not None else [],
+            'queue_size': self.queue_size,
+            'queued': self._queue.qsize(),
+            'in_flight': len(self._pending),
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'restarts': self.restarts,
+            'reloads': self.reloads,
+            'artifacts': sorted(self._signature)
+        }
+
+    def _start_generation(self):
+        with self._cond:
+            generation = Generation(next(self._numbers), self._ctx, self.service_names, self.workers)
+            self._generations[generation.number] = generation
+        if not generation.loaded.wait(self.start_timeout):
+            generation.failed = generation.failed or f"Workers not ready within {self.start_timeout:g}s"
+        if generation.failed:
+            with self._cond:
+                self._generations.pop(generation.number, None)
+            for worker in generation.workers:
+                worker.process.terminate()
+                worker.conn.close()
+            raise RuntimeError(f"Failed to load models: {generation.failed}")
+        return generation
+
+    def _retire(self, generation):
+        # Idle workers exit now, busy ones once they have answered (see _receive)
+        for worker in generation.workers:
+            worker.retired = True
+            if worker.task is None and not worker.closed:
+                worker.stop()
+
+    def _idle_worker(self):
+        for worker in self.current.workers:
+            if worker.ready and worker.task is None and not worker.closed:
+                return worker
+        return None
+
+    def _dispatch(self):
+        """Hand queued requests to idle workers, oldest request first"""
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            with self._cond:
+                worker = self._idle_worker()
+                while worker is None:
+                    self._cond.wait()
+                    worker = self._idle_worker()
+                worker.task = task[0]
+            try:
+                worker.conn.send(task)
+            except (OSError, ValueError):
+                # The receiver notices the closed pipe and fails the request
+                pass
+
+    def _receive(self):
+        """Read worker messages and route responses to the requests waiting for them"""
+        while True:
+            with self._cond:
+                workers = {worker.conn: worker for generation in self._generations.values()
+                           for worker in generation.workers if not worker.closed}
+                if self._stopping.is_set() and not workers:
+                    break
+            for conn in multiprocessing.connection.wait(list(workers), timeout=0.5):
+                worker = workers[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    self._worker_exited(worker)
+                    continue
+                self._handle_message(worker, message)
+
+    def _handle_message(self, worker, message):
+        generation = worker.generation
+        kind = message[0]
+        with self._cond:
+            if kind == 'ready':
+                worker.ready = True
+                generation.artifacts = message[1]
+                if all(w.ready for w in generation.workers):
+                    generation.loaded.set()
+            elif kind == 'failed':
+                print(f"Model worker {generation.number}-{worker.index} failed to load: {message[1]}",
+                      file=sys.stderr)
+                generation.failed = message[1]
+                generation.loaded.set()
+            elif kind == 'done':
+                worker.task = None
+                if worker.retired:
+                    worker.stop()
+            self._cond.notify_all()
+
+        if kind == 'done':
+            _, key, response = message
+            if 'error' in response:
+                self.failed += 1
+            else:
+                self.completed += 1
+            self._deliver(key, response)
+
+    def _worker_exited(self, worker):
+        with self._cond:
+            worker.closed = True
+            worker.conn.close()
+            key, worker.task = worker.task, None
+            generation = worker.generation
+            if not generation.loaded.is_set():
+                generation.failed = generation.failed or f"worker {worker.index} exited while loading"
+                generation.loaded.set()
+            self._cond.notify_all()
+        if key is not None:
+            self.failed += 1
+            self._deliver(key, {'error': 'Model worker exited while processing the request'})
+
+    def _deliver(self, key, response):
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.response = response
+            pending.event.set()
+
+    def _watch(self):
+        """Replace crashed workers, drop retired generations and reload when the artifacts change"""
+        last_check = time.time()
+        while not self._stopping.wait(1.0):
+            with self._cond:
+                self._replace_dead_workers()
+                for number, generation in list(self._generations.items()):
+                    if generation is not self.current and all(worker.closed for worker in generation.workers):
+                        del self._generations[number]
+
+            if self.reload_interval > 0 and time.time() - last_check >= self.reload_interval:
+                last_check = time.time()
+                self._reload_if_changed()
+
+    def _replace_dead_workers(self):
+        generation = self.current
+        for worker in list(generation.workers):
+            if not worker.closed or worker.retired or time.time() - worker.started < WORKER_RESTART_DELAY:
+                continue
+            worker.process.join()
+            print(f"Model worker {generation.number}-{worker.index} exited with code {worker.process.exitcode}, "
+                  f"restarting", file=sys.stderr)
+            generation.workers[worker.index] = Worker(self._ctx, generation, worker.index, self.service_names)
+            self.restarts += 1
+
+    def _reload_if_changed(self):
+        signature = artifact_signature(self._signature)
+        if signature == self._signature:
+            return
+        # Wait for a copy in progress to finish before loading the new files
+        time.sleep(1.0)
+        if artifact_signature(self._signature) != signature:
+            return
+        print("Model artifacts changed, reloading", file=sys.stderr)
+        try:
+            self.reload()
+        except RuntimeError as e:
+            print(f"Reload failed, keeping the current models: {e}", file=sys.stderr)
+            # Do not retry until the artifacts change again
+            self._signature = signature
+
+
+def handle_daemon_request(request, pool):
+    """Handle a request addressed to the daemon itself
+
+    Supported request types:
+        ping: health check
+        stats: queue, worker and request counters
+        reload: load new workers from the current artifacts and switch to them
+        shutdown: finish queued requests and stop
+    """
+    request_type = request.get('type', 'ping')
+    if request_type == 'ping':
+        return {'status': 'ok'}
+    elif request_type == 'stats':
+        return pool.stats()
+    elif request_type == 'reload':
+        return pool.reload()
+    elif request_type == 'shutdown':
+        return {'status': 'shutting down'}
+    raise ValueError(f"Unknown request type: {request_type}")
+
+
+def handle_line(line, pool):
+    """Decode one NDJSON request line and build the response line
+
+    Returns:
+        Tuple of (response JSON string, whether the daemon should stop)
+    """
+    request_id = None
+    stop = False
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError('Request must be a JSON object')
+        request_id = request.get('id')
+        service = request.get('service', 'estimator')
+
+        if service == 'daemon':
+            response = {'result': handle_daemon_request(request, pool)}
+            stop = request.get('type') == 'shutdown'
+        elif service in pool.service_names:
+            response = pool.submit(service, request)
+        else:
+            raise ValueError(f"Service not loaded: {service}")
+    except ServerBusy as e:
+        response = {'error': str(e), 'busy': True}
+    except Exception as e:
+        print(f"Failed to process request: {e}", file=sys.stderr)
+        response = {'error': f"Failed to process input: {str(e)}"}
+
+    response = {'id': request_id, **response}
+    try:
+        return json.dumps(response), stop
+    except (TypeError, ValueError) as e:
+        return json.dumps({'id': request_id, 'error': f"Failed to serialize response: {e}"}), stop
+
+
+def is_shutdown_line(line):
+    """Whether a request line asks the daemon to shut down"""
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return False
+    return isinstance(request, dict) and request.get('service') == 'daemon' and request.get('type') == 'shutdown'
+
+
+def serve(socket_path, pool):
+    """Answer newline-delimited JSON requests on a Unix socket until shutdown
+
+    Every request line is answered in its own thread, so a slow request
+    does not hold up the ones after it, on the same connection or another.
+    Responses are written as they finish and are matched to requests by id.
+    """
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            write_lock = threading.Lock()
+            in_flight = []
+
+            def answer(line):
+                response, stop = handle_line(line, pool)
+                with write_lock:
+                    try:
+                        self.wfile.write((response + '\n').encode('utf-8'))
+                        self.wfile.flush()
+                    except OSError:
+                        # The client went away; its other requests still finish
+                        pass
+                if stop:
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+            for raw_line in self.rfile:
+                line = raw_line.decode('utf-8').strip()
+                if not line:
+                    continue
+
+                thread = threading.Thread(target=answer, args=(line,), daemon=True)
+                thread.start()
+                in_flight = [t for t in in_flight if t.is_alive()]
+                in_flight.append(thread)
+
+                if is_shutdown_line(line):
+                    break
+
+            # The connection is closed on return, so wait for the last responses
+            for thread in in_flight:
+                thread.join()
+
+    # Remove a stale socket left behind by a previous run
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    server = socketserver.ThreadingUnixStreamServer(socket_path, RequestHandler)
+    server.daemon_threads = True
+    # Only the user running the daemon may connect
+    os.chmod(socket_path, 0o600)
+
+    # serve_forever() runs in this thread, so shut down from another one
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"Model daemon listening on {socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def pop_option(args, name, default=None):
+    """Remove a '--name value' pair from an argument list and return the value"""
+    if name in args:
+        index = args.index(name)
+        if index + 1 >= len(args):
+            raise ValueError(f"Missing value for {name}")
+        value = args[index + 1]
+        del args[index:index + 2]
+        return value
+    return default
+
+
+def main():
+    args = sys.argv[1:]
+    try:
+        socket_path = pop_option(args, '--socket', DAEMON_SOCKET)
+        workers = int(pop_option(args, '--workers', DAEMON_WORKERS))
+        service_names = [name for name in pop_option(args, '--services', DAEMON_SERVICES).split(',') if name]
+        queue_size = int(pop_option(args, '--queue-size', DAEMON_QUEUE_SIZE))
+        reload_interval = float(pop_option(args, '--reload-interval', DAEMON_RELOAD_INTERVAL))
+        if args:
+            raise ValueError(f"Unknown arguments: {' '.join(args)}")
+        pool = WorkerPool(service_names, workers, queue_size, reload_interval=reload_interval)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        print(USAGE, file=sys.stderr)
+        sys.exit(1)
+
+    # Workers are spawned fresh and find the services through sys.path
+    for path in SERVICE_PATHS:
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    start_time = time.time()
+    try:
+        pool.start()
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        pool.shutdown(timeout=0)
+        sys.exit(1)
+    print(f"Model daemon ready ({time.time() - start_time:.2f}s, {workers} workers, "
+          f"services: {', '.join(service_names)})", file=sys.stderr)
+
+    try:
+        serve(socket_path, pool)
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import re
+
+import numpy as np
+
+
+def _sklearn_normalizes_tree_values():
+    """sklearn before 1.4 stored class counts in tree nodes and normalised them at predict time"""
+    import sklearn
+
+    match = re.match(r'(\d+)\.(\d+)', sklearn.__version__)
+    return match is not None and (int(match.group(1)), int(match.group(2))) < (1, 4)
+
+
+def flatten_forest(rf_model):
+    """Flatten a fitted sklearn random forest classifier into contiguous arrays
+
+    All trees are concatenated into one node table. Child indices are made
+    global, and leaves point to themselves so every sample can be walked for
+    max_depth steps without branching on leaf checks.
+
+    Args:
+        rf_model: Fitted sklearn RandomForestClassifier
+
+    Returns:
+        Dictionary of NumPy arrays describing the forest
+    """
+    if getattr(rf_model, 'n_outputs_', 1) != 1:
+        raise ValueError('Only single-output random forests can be flattened')
+
+    n_classes = len(rf_model.classes_)
+    normalize_values = _sklearn_normalizes_tree_values()
+    offsets = []
+    children_left = []
+    children_right = []
+    features = []
+    thresholds = []
+    values = []
+    max_depth = 0
+    offset = 0
+
+    for estimator in rf_model.estimators_:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count) + offset
+        is_leaf = tree.children_left < 0
+
+        left = np.where(is_leaf, node_ids, tree.children_left + offset)
+        right = np.where(is_leaf, node_ids, tree.children_right + offset)
+
+        # Per-node class probabilities exactly as DecisionTreeClassifier.predict_proba returns them
+        proba = np.array(tree.value[:, 0, :n_classes], dtype=np.float64)
+        if normalize_values:
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba /= normalizer
+
+        offsets.append(offset)
+        children_left.append(left)
+        children_right.append(right)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        values.append(proba)
+        max_depth = max(max_depth, int(tree.max_depth))
+        offset += tree.node_count
+
+    # Node indices and features fit in 32 bits, which halves their memory
+    index_dtype = np.int32 if offset < np.iinfo(np.int32).max else np.int64
+
+    return {
+        'tree_offsets': np.array(offsets, dtype=np.int64),
+        'children_left': np.concatenate(children_left).astype(index_dtype),
+        'children_right': np.concatenate(children_right).astype(index_dtype),
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'value': np.concatenate(values),
+        'classes': np.asarray(rf_model.classes_),
+        # Stored as a one-element array, memory-mapped .npy files cannot be 0-d
+        'max_depth': np.array([max_depth], dtype=np.int64)
+    }
+
+
+def sparse_feature_lookup(X):
+    """Build a (rows, features) -> value lookup over a sparse matrix without densifying it
+
+    Every stored entry gets the key row * n_features + column. With sorted
+    column indices the keys of a CSR matrix are globally sorted, so any
+    number of cells can be fetched with a single searchsorted call.
+    """
+    X = X.tocsr()
+    if not X.has_sorted_indices:
+        X = X.sorted_indices()
+
+    # sklearn evaluates trees on float32 copies of the input
+    data = np.asarray(X.data, dtype=np.float32)
+    n_features = X.shape[1]
+
+    if len(data) == 0:
+        return lambda rows, features: np.zeros(np.broadcast(rows, features).shape, dtype=np.float32)
+
+    row_ids = np.repeat(np.arange(X.shape[0], dtype=np.int64), np.diff(X.indptr))
+    keys = row_ids * n_features + X.indices
+    last = len(keys) - 1
+
+    def lookup(rows, features):
+        query = rows * n_features + features
+        positions = np.minimum(np.searchsorted(keys, query), last)
+        return np.where(keys[positions] == query, data[positions], np.float32(0.0))
+
+    return lookup
+
+
+class ArrayForest:
+    """Random forest evaluator over flattened node arrays
+
+    Gives the same predictions as the sklearn model it was flattened from,
+    evaluates sparse TF-IDF rows directly and works on read-only
+    memory-mapped arrays.
+    """
+
+    # Rows evaluated at once, bounds the per-step index arrays
+    ROWS_PER_STEP = 256
+
+    def __init__(self, arrays):
+        self.tree_offsets = arrays['tree_offsets']
+        self.children_left = arrays['children_left']
+        self.children_right = arrays['children_right']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.value = arrays['value']
+        self.classes_ = np.asarray(arrays['classes'])
+        self.max_depth = int(arrays['max_depth'][0])
+        self.n_estimators = len(self.tree_offsets)
+
+    @classmethod
+    def from_sklearn(cls, rf_model):
+        """Build an evaluator from a fitted in-memory sklearn random forest"""
+        return cls(flatten_forest(rf_model))
+
+    def nbytes(self):
+        """Memory held by the node arrays"""
+        return sum(np.asarray(array).nbytes for array in (
+            self.tree_offsets, self.children_left, self.children_right,
+            self.feature, self.threshold, self.value, self.classes_))
+
+    def apply(self, X):
+        """Return the global leaf index reached in every tree for each row of X"""
+        if hasattr(X, 'tocsr'):
+            lookup = sparse_feature_lookup(X)
+        else:
+            # sklearn compares float32 feature values against float64 thresholds
+            X = np.asarray(X, dtype=np.float32)
+            lookup = lambda rows, features: X[rows, features]
+        n_samples = X.shape[0]
+
+        nodes = np.tile(np.asarray(self.tree_offsets), (n_samples, 1))
+        rows = np.arange(n_samples, dtype=np.int64)[:, np.newaxis]
+        for _ in range(self.max_depth):
+            go_left = lookup(rows, self.feature[nodes]) <= self.threshold[nodes]
+            nodes = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        """Average the per-tree class probabilities, summing trees in order like sklearn"""
+        n_samples = X.shape[0]
+        proba = np.zeros((n_samples, len(self.classes_)), dtype=np.float64)
+
+        for start in range(0, n_samples, self.ROWS_PER_STEP):
+            leaves = self.apply(X[start:start + self.ROWS_PER_STEP])
+
+            block = proba[start:start + len(leaves)]
+            for tree_index in range(self.n_estimators):
+                block += self.value[leaves[:, tree_index]]
+
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        """Predict class labels for the rows of X"""
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
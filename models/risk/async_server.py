@@ -0,0 +1,504 @@
+import asyncio
+import itertools
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import REGISTRY
+
+# Interactive requests: executor threads, requests that may wait for one, and
+# the default deadline in seconds (0 for none)
+ASYNC_WORKERS = int(os.environ.get('ASYNC_WORKERS', '4'))
+ASYNC_QUEUE_SIZE = int(os.environ.get('ASYNC_QUEUE_SIZE', '256'))
+ASYNC_REQUEST_TIMEOUT = float(os.environ.get('ASYNC_REQUEST_TIMEOUT', '30'))
+
+# Background jobs: jobs run at a time, jobs that may wait to start, and how
+# long a finished job can still be polled, in seconds
+ASYNC_JOB_WORKERS = int(os.environ.get('ASYNC_JOB_WORKERS', '1'))
+ASYNC_JOB_QUEUE_SIZE = int(os.environ.get('ASYNC_JOB_QUEUE_SIZE', '16'))
+ASYNC_JOB_TTL = float(os.environ.get('ASYNC_JOB_TTL', '3600'))
+
+# Longest request line; batch requests can be large
+MAX_LINE_BYTES = 64 * 1024 * 1024
+
+# Request types answered on the event loop without queueing
+IMMEDIATE_TYPES = ('ping', 'stats', 'metrics')
+
+# Request types that run as background jobs by default
+JOB_TYPES = ('find_optimal',)
+
+# Request types that take the model lock per chunk rather than for their whole run
+CHUNK_LOCKED_TYPES = ('validate', 'find_optimal')
+
+OUTCOMES = REGISTRY.counter('async_requests_total', 'Async server requests by outcome')
+
+
+class ServerBusy(Exception):
+    """Raised when a request arrives while its queue is full"""
+
+
+class RequestCancelled(Exception):
+    """Raised inside a running validation once its request or job is cancelled"""
+
+
+class Cancellation:
+    """Cancellation flag shared with the thread running a request
+
+    It is passed to validate and find_optimal as their progress callback:
+    it records how many rows have been processed and raises
+    RequestCancelled once the request is cancelled or past its deadline,
+    so long validations stop at the next chunk.
+    """
+
+    def __init__(self, deadline=None):
+        self.deadline = deadline
+        self.rows = 0
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set() or (self.deadline is not None and time.monotonic() > self.deadline)
+
+    def __call__(self, rows):
+        self.rows = rows
+        if self.cancelled:
+            raise RequestCancelled('Request cancelled')
+
+
+class Job:
+    """A background request whose status and result are polled by id"""
+
+    def __init__(self, job_id, request, cancellation):
+        self.id = job_id
+        self.request = request
+        self.cancellation = cancellation
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def describe(self):
+        """Status, progress and, once finished, result or error"""
+        info = {
+            'job_id': self.id,
+            'type': self.request.get('type'),
+            'status': self.status,
+            'rows': self.cancellation.rows,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished
+        }
+        if self.started is not None:
+            info['elapsed_seconds'] = (self.finished or time.time()) - self.started
+        if self.status == 'done':
+            info['result'] = self.result
+        if self.error is not None:
+            info['error'] = self.error
+        return info
+
+
+class AsyncEstimatorServer:
+    """asyncio front-end for the estimator with deadlines, cancellation and background jobs
+
+    Interactive requests wait in a bounded queue for one of the executor
+    threads; when the queue is full they are rejected at once instead of
+    waiting. Every request has a deadline ('timeout' in seconds, default
+    request_timeout); a request still queued at its deadline or when it is
+    cancelled is never started, and a running validation stops at its next
+    chunk. find_optimal (and validate with "background": true) run as
+    background jobs on their own threads and are polled with job_status.
+
+    Inference is serialised under one model lock, as in the sync server.
+    Single-story predictions take it per micro-batch and validations per
+    chunk, so a long job only delays interactive requests by one chunk.
+
+    Extra request types:
+        cancel: {"request_id": ...} cancels a request of the same connection
+        job_status: {"job_id": ...} status, rows processed and, once done, the result
+        job_cancel: {"job_id": ...} cancel a queued or running job
+        jobs: status of every job
+
+    Args:
+        predict_module: The predict module
+        models: Dictionary containing loaded models
+    """
+
+    def __init__(self, predict_module, models, workers=ASYNC_WORKERS, queue_size=ASYNC_QUEUE_SIZE,
+                 request_timeout=ASYNC_REQUEST_TIMEOUT, job_workers=ASYNC_JOB_WORKERS,
+                 job_queue_size=ASYNC_JOB_QUEUE_SIZE, job_ttl=ASYNC_JOB_TTL):
+        self.predict = predict_module
+        self.models = models
+        self.workers = workers
+        self.queue_size = queue_size
+        self.request_timeout = request_timeout
+        self.job_workers = job_workers
+        self.job_queue_size = job_queue_size
+        self.job_ttl = job_ttl
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='estimator')
+        self._job_executor = ThreadPoolExecutor(max_workers=job_workers, thread_name_prefix='estimator-job')
+        # The models are not guaranteed to be thread-safe, so inference is serialised
+        self._lock = threading.Lock()
+        # Single-story predictions of concurrent requests are combined into batches
+        self._batcher = predict_module.make_micro_batcher(models, self._lock)
+        self._queue = None
+        self._runners = []
+        self._jobs = OrderedDict()
+        self._job_ids = itertools.count(1)
+        self._tasks = set()
+        self.stopping = None
+
+        # Counters
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+
+    async def start(self):
+        """Start the queue runners, one per executor thread"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self.stopping = asyncio.Event()
+        self._runners = [asyncio.create_task(self._run_queue()) for _ in range(self.workers)]
+
+    async def close(self):
+        """Cancel every request and job, then stop the executors"""
+        for job in self._jobs.values():
+            job.cancellation.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        for runner in self._runners:
+            runner.cancel()
+        await asyncio.gather(*self._tasks, *self._runners, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._job_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def handle_connection(self, reader, write, cancel_on_close=True):
+        """Answer the NDJSON requests of one connection
+
+        Each request is answered by its own task, so a slow request does not
+        hold up the ones after it and responses are matched by id.
+
+        Args:
+            reader: asyncio StreamReader of request lines
+            write: Function writing one response line
+            cancel_on_close: Whether to cancel unanswered requests at EOF
+                (the client went away) rather than finish them
+        """
+        in_flight = {}
+        tasks = set()
+        try:
+            while not self.stopping.is_set():
+                try:
+                    raw_line = await reader.readline()
+                except ValueError:
+                    write(json.dumps({'id': None, 'error': 'Request line too long'}))
+                    break
+                if not raw_line:
+                    break
+                line = raw_line.decode('utf-8').strip()
+                if not line:
+                    continue
+
+                task = asyncio.create_task(self._answer(line, write, in_flight))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            if cancel_on_close:
+                for _, cancellation in list(in_flight.values()):
+                    cancellation.cancel()
+                for task in list(tasks):
+                    task.cancel()
+            else:
+                await asyncio.gather(*list(tasks), return_exceptions=True)
+
+    def stats(self):
+        """Queue, job and request counters"""
+        statuses = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'cancelled': self.cancelled,
+            'jobs': statuses
+        }
+
+    async def _answer(self, line, write, in_flight):
+        request_id = None
+        request_type = 'invalid'
+        cancellation = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('Request must be a JSON object')
+            request_id = request.get('id')
+            request_type = request.get('type', 'predict')
+
+            timeout = request.get('timeout', self.request_timeout)
+            timeout = float(timeout) if timeout is not None else 0
+            deadline = time.monotonic() + timeout if timeout > 0 else None
+            cancellation = Cancellation(deadline)
+            if request_id is not None:
+                in_flight[request_id] = (asyncio.current_task(), cancellation)
+
+            if request_type == 'shutdown':
+                self.stopping.set()
+                response = {'id': request_id, 'result': {'status': 'shutting down'}}
+            else:
+                result = await self._dispatch(request, request_type, cancellation, in_flight)
+                response = {'id': request_id, 'result': result}
+            self.completed += 1
+            OUTCOMES.inc(outcome='completed')
+        except ServerBusy as e:
+            self.rejected += 1
+            OUTCOMES.inc(outcome='rejected')
+            response = {'id': request_id, 'error': str(e), 'busy': True}
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            OUTCOMES.inc(outcome='timed_out')
+            response = {'id': request_id, 'error': f"Request timed out after {timeout:g}s", 'timeout': True}
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            OUTCOMES.inc(outcome='cancelled')
+            if cancellation is not None:
+                cancellation.cancel()
+            response = {'id': request_id, 'error': 'Request cancelled', 'cancelled': True}
+        except Exception as e:
+            print(f"Failed to process request: {e}", file=sys.stderr)
+            self.predict.ERRORS.inc(type=request_type)
+            response = {'id': request_id, 'error': f"Failed to process input: {str(e)}"}
+        finally:
+            if request_id is not None and in_flight.get(request_id, (None,))[0] is asyncio.current_task():
+                del in_flight[request_id]
+
+        write(json.dumps(response))
+
+    async def _dispatch(self, request, request_type, cancellation, in_flight):
+        if request_type in IMMEDIATE_TYPES:
+            # No inference, so no model lock, which would block the event loop
+            result = self.predict.handle_request(request, self.models, self._batcher)
+            if request_type == 'stats':
+                result['async_server'] = self.stats()
+            return result
+        if request_type == 'cancel':
+            entry = in_flight.get(request.get('request_id'))
+            if entry is None:
+                return {'cancelled': False}
+            task, request_cancellation = entry
+            request_cancellation.cancel()
+            task.cancel()
+            return {'cancelled': True}
+        if request_type in ('job_status', 'job_cancel'):
+            job = self._jobs.get(request.get('job_id'))
+            if job is None:
+                raise ValueError(f"Unknown job: {request.get('job_id')}")
+            if request_type == 'job_cancel' and job.status in ('queued', 'running'):
+                job.cancellation.cancel()
+                if job.status == 'queued':
+                    job.status = 'cancelled'
+                    job.finished = time.time()
+            return job.describe()
+        if request_type == 'jobs':
+            self._prune_jobs()
+            return [job.describe() for job in self._jobs.values()]
+        if request.get('background', request_type in JOB_TYPES):
+            return self._start_job(request).describe()
+        return await self._submit(request, cancellation)
+
+    async def _submit(self, request, cancellation):
+        """Queue an interactive request and wait for its result until its deadline"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((request, future, cancellation))
+        except asyncio.QueueFull:
+            raise ServerBusy('Server busy, retry later') from None
+
+        if cancellation.deadline is None:
+            return await future
+        try:
+            return await asyncio.wait_for(future, max(0.0, cancellation.deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            cancellation.cancel()
+            raise
+
+    async def _run_queue(self):
+        """Run queued requests one at a time on the executor, skipping those already abandoned"""
+        loop = asyncio.get_running_loop()
+        while True:
+            request, future, cancellation = await self._queue.get()
+            if future.done() or cancellation.cancelled:
+                # Timed out or cancelled while it waited, so never started
+                continue
+            try:
+                result = await loop.run_in_executor(self._executor, self._handle, request, cancellation)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+    def _call(self, request, progress=None):
+        """handle_request on an executor thread, under the model lock"""
+        if (request.get('type') in CHUNK_LOCKED_TYPES
+                or self.predict.uses_micro_batcher(request, self._batcher)):
+            return self.predict.handle_request(request, self.models, self._batcher, progress, self._lock)
+        with self._lock:
+            return self.predict.handle_request(request, self.models, self._batcher, progress)
+
+    def _handle(self, request, cancellation):
+        result = self._call(request, cancellation)
+        if cancellation.cancelled and isinstance(result, dict) and 'error' in result:
+            # validate returns its errors; a cancelled one is not a validation error
+            raise RequestCancelled('Request cancelled')
+        return result
+
+    def _start_job(self, request):
+        self._prune_jobs()
+        waiting = sum(1 for job in self._jobs.values() if job.status == 'queued')
+        if waiting >= self.job_queue_size:
+            raise ServerBusy('Too many background jobs, retry later')
+
+        job_id = f"job-{next(self._job_ids)}"
+        timeout = request.get('timeout')
+        deadline = time.monotonic() + float(timeout) if timeout else None
+        job = Job(job_id, dict(request, background=False), Cancellation(deadline))
+        self._jobs[job_id] = job
+        self._job_executor.submit(self._run_job, job)
+        return job
+
+    def _run_job(self, job):
+        if job.cancellation.cancelled:
+            job.status = 'cancelled'
+            job.finished = job.finished or time.time()
+            return
+        job.status = 'running'
+        job.started = time.time()
+        try:
+            result = self._call(job.request, job.cancellation)
+            if job.cancellation.cancelled:
+                job.status = 'cancelled'
+            elif isinstance(result, dict) and 'error' in result:
+                job.status = 'failed'
+                job.error = result['error']
+            else:
+                job.status = 'done'
+                job.result = result
+        except Exception as e:
+            print(f"Background job {job.id} failed: {e}", file=sys.stderr)
+            job.status = 'failed'
+            job.error = str(e)
+        job.finished = time.time()
+
+    def _prune_jobs(self):
+        """Forget finished jobs older than job_ttl"""
+        cutoff = time.time() - self.job_ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.finished is not None and job.finished < cutoff:
+                del self._jobs[job_id]
+
+
+async def serve_unix_socket(server, socket_path):
+    """Answer NDJSON requests on a Unix socket until shutdown"""
+
+    async def handle(reader, writer):
+        def write(line):
+            if not writer.is_closing():
+                writer.write((line + '\n').encode('utf-8'))
+
+        try:
+            await server.handle_connection(reader, write)
+        except asyncio.CancelledError:
+            # Connections still open at shutdown are cancelled with the loop
+            pass
+        finally:
+            writer.close()
+
+    # Remove a stale socket left behind by a previous run
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    unix_server = await asyncio.start_unix_server(handle, socket_path, limit=MAX_LINE_BYTES)
+    print(f"Async estimator server listening on {socket_path}", file=sys.stderr)
+    try:
+        await server.stopping.wait()
+    finally:
+        unix_server.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+async def serve_stdio(server):
+    """Answer NDJSON requests on stdin until EOF or shutdown
+
+    Requests still running at EOF are finished, since their responses can
+    still be read from stdout.
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_LINE_BYTES)
+
+    # A thread feeds the reader, so stdin can be a pipe, a terminal or a file
+    def read_stdin():
+        for raw_line in sys.stdin.buffer:
+            loop.call_soon_threadsafe(reader.feed_data, raw_line)
+        loop.call_soon_threadsafe(reader.feed_eof)
+
+    threading.Thread(target=read_stdin, name='stdin-reader', daemon=True).start()
+
+    def write(line):
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+    # Announce readiness so clients know the models are loaded
+    write(json.dumps({'event': 'ready'}))
+    connection = asyncio.create_task(server.handle_connection(reader, write, cancel_on_close=False))
+    stopping = asyncio.create_task(server.stopping.wait())
+    await asyncio.wait([connection, stopping], return_when=asyncio.FIRST_COMPLETED)
+    # On shutdown the requests still running are cancelled by AsyncEstimatorServer.close()
+    connection.cancel()
+    stopping.cancel()
+
+
+async def run(predict_module, models, socket_path=None):
+    server = AsyncEstimatorServer(predict_module, models)
+    await server.start()
+
+    # Exit through the normal path on SIGTERM so queued prediction logs are flushed
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, server.stopping.set)
+    try:
+        if socket_path:
+            await serve_unix_socket(server, socket_path)
+        else:
+            await serve_stdio(server)
+    finally:
+        await server.close()
+
+
+def serve(predict_module, socket_path=None):
+    """Run the asyncio estimator server on a Unix socket, or on stdin/stdout without one
+
+    Args:
+        predict_module: The predict module
+        socket_path: Optional Unix socket path
+    """
+    start_time = time.time()
+    models = predict_module.get_models()
+    print(f"Async estimator server ready ({time.time() - start_time:.2f}s)", file=sys.stderr)
+    asyncio.run(run(predict_module, models, socket_path))
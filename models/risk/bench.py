@@ -0,0 +1,411 @@
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from array_forest import ArrayForest
+from frozen_vectorizer import FrozenTfidfVectorizer
+from model_bundle import bundle_exists
+
+# Default workload sizes
+DEFAULT_ITERATIONS = 1000
+DEFAULT_BATCH_SIZES = (1, 10, 100, 1000)
+DEFAULT_VALIDATION_ROWS = 20000
+
+# Shape of the stub models, roughly that of the trained estimator
+STUB_FEATURES = 200
+STUB_TREES = 100
+STUB_TREE_DEPTH = 10
+STUB_STORY_POINTS = (1, 2, 3, 5, 8, 13, 20, 40)
+
+# Python snippet run in a fresh interpreter to time a cold start
+COLD_START_PROBE = "import time; t0 = time.perf_counter(); import bench; bench.cold_start_probe(t0, {stub})"
+
+
+class StubDQN:
+    """Linear stand-in for the Keras DQN, enough to build the DQN table"""
+
+    def __init__(self, weights):
+        self.weights = weights
+
+    def predict(self, states, verbose=0):
+        return np.asarray(states, dtype=np.float32) @ self.weights
+
+
+def stub_vocabulary(n_features=STUB_FEATURES):
+    """Synthetic terms used by the stub vectorizer"""
+    return [f"term{index:04d}" for index in range(n_features)]
+
+
+def build_stub_forest(rng, n_features, n_classes, n_trees=STUB_TREES, depth=STUB_TREE_DEPTH):
+    """Random complete binary trees in the flattened ArrayForest layout"""
+    nodes_per_tree = 2 ** (depth + 1) - 1
+    n_internal = 2 ** depth - 1
+    local = np.arange(nodes_per_tree)
+    is_leaf = local >= n_internal
+
+    children_left = []
+    children_right = []
+    for tree_index in range(n_trees):
+        offset = tree_index * nodes_per_tree
+        children_left.append(np.where(is_leaf, local, 2 * local + 1) + offset)
+        children_right.append(np.where(is_leaf, local, 2 * local + 2) + offset)
+
+    n_nodes = n_trees * nodes_per_tree
+    leaf_mask = np.tile(is_leaf, n_trees)
+    return {
+        'tree_offsets': np.arange(n_trees, dtype=np.int64) * nodes_per_tree,
+        'children_left': np.concatenate(children_left).astype(np.int32),
+        'children_right': np.concatenate(children_right).astype(np.int32),
+        'feature': np.where(leaf_mask, 0, rng.integers(0, n_features, n_nodes)).astype(np.int32),
+        'threshold': np.where(leaf_mask, -2.0, rng.uniform(0.0, 0.3, n_nodes)),
+        'value': rng.dirichlet(np.ones(n_classes), n_nodes),
+        'classes': np.arange(n_classes, dtype=np.int64),
+        'max_depth': np.array([depth], dtype=np.int64)
+    }
+
+
+def build_stub_models(estimator, seed=0):
+    """Build random models with the same interfaces as the trained ones
+
+    Used when the real artifacts are not available, so the benchmark runs
+    offline without sklearn, TensorFlow or a download.
+
+    Args:
+        estimator: The predict module
+        seed: Random seed
+
+    Returns:
+        Tuple of (models dictionary, per-component build times in seconds)
+    """
+    rng = np.random.default_rng(seed)
+    timings = {}
+
+    start = time.perf_counter()
+    params = {
+        'analyzer': 'word', 'binary': False, 'decode_error': 'strict', 'dtype': 'float64',
+        'encoding': 'utf-8', 'input': 'content', 'lowercase': True, 'ngram_range': [1, 1],
+        'norm': 'l2', 'smooth_idf': True, 'stop_words': None, 'strip_accents': None,
+        'sublinear_tf': False, 'token_pattern': r'(?u)\b\w\w+\b', 'use_idf': True
+    }
+    vocabulary = stub_vocabulary()
+    tfidf = FrozenTfidfVectorizer(params, np.array(vocabulary), rng.uniform(1.0, 6.0, len(vocabulary)),
+                                  estimator.VECTORIZER_CACHE_SIZE)
+    timings['vectorizer'] = time.perf_counter() - start
+
+    n_classes = len(STUB_STORY_POINTS)
+    start = time.perf_counter()
+    rf_model = ArrayForest(build_stub_forest(rng, len(vocabulary), n_classes))
+    timings['rf_model'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    label_mapping = {point: index for index, point in enumerate(STUB_STORY_POINTS)}
+    inverse_mapping = {index: point for point, index in label_mapping.items()}
+    timings['label_mappings'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    weights = rng.normal(0.0, 1.0, (n_classes, 2 * n_classes + 1)).astype(np.float32)
+    dqn_table = estimator.build_dqn_table(StubDQN(weights), n_classes)
+    timings['dqn_table'] = time.perf_counter() - start
+
+    models = {
+        'version': f"stub-{seed}",
+        'rf_model': rf_model,
+        'tfidf': tfidf,
+        'dqn_model': None,
+        'dqn_table': dqn_table,
+        'label_mapping': label_mapping,
+        'inverse_mapping': inverse_mapping,
+        'class_story_points': estimator.class_story_points(inverse_mapping, n_classes)
+    }
+    return models, timings
+
+
+def artifacts_available(estimator):
+    """Whether real models can be loaded without downloading anything
+
+    The precomputed DQN table stands in for dqn_model.h5, as it does in load_models().
+    """
+    if bundle_exists(estimator.MODEL_BUNDLE_DIR):
+        return True
+    required = [os.path.join(estimator.MODEL_DIR, filename)
+                for filename in estimator.MODEL_FILE_IDS if filename != 'dqn_model.h5']
+    has_dqn = os.path.exists(estimator.dqn_model_path) or os.path.exists(estimator.dqn_table_path)
+    return has_dqn and all(os.path.exists(path) for path in required)
+
+
+def time_artifact_loads(estimator):
+    """Time loading each real artifact on its own
+
+    Returns:
+        Dictionary of artifact name -> load time in seconds
+    """
+    import joblib
+
+    timings = {}
+    if bundle_exists(estimator.MODEL_BUNDLE_DIR):
+        from model_bundle import read_bundle
+
+        start = time.perf_counter()
+        read_bundle(estimator.MODEL_BUNDLE_DIR, estimator.MODEL_BUNDLE_VERIFY)
+        timings['model_bundle'] = time.perf_counter() - start
+        return timings
+
+    for filename in ('rf_model.joblib', 'vectorizer.joblib', 'label_mapping.joblib', 'inverse_mapping.joblib'):
+        start = time.perf_counter()
+        joblib.load(os.path.join(estimator.MODEL_DIR, filename))
+        timings[filename] = time.perf_counter() - start
+
+    num_classes = len(joblib.load(estimator.label_mapping_path))
+    start = time.perf_counter()
+    dqn_table = estimator.load_dqn_table(estimator.dqn_table_path, estimator.dqn_model_path, num_classes)
+    timings['dqn_table.npz'] = time.perf_counter() - start
+    if dqn_table is None:
+        start = time.perf_counter()
+        estimator.load_dqn_model(estimator.dqn_model_path)
+        timings['dqn_model.h5'] = time.perf_counter() - start
+    return timings
+
+
+def vocabulary_terms(tfidf):
+    """Terms of a frozen or sklearn vectorizer"""
+    terms = getattr(tfidf, 'terms', None)
+    if terms is not None:
+        return np.asarray(terms).tolist()
+    return sorted(tfidf.vocabulary_)
+
+
+def synthetic_stories(vocabulary, count, seed=1):
+    """Generate stories from vocabulary terms mixed with unknown words
+
+    Returns:
+        List of dictionaries with 'title', 'description' and 'storypoint' keys
+    """
+    rng = np.random.default_rng(seed)
+    words = list(vocabulary) + [f"filler{index}" for index in range(50)]
+    stories = []
+    for _ in range(count):
+        title = ' '.join(rng.choice(words, rng.integers(3, 9)))
+        description = ' '.join(rng.choice(words, rng.integers(10, 61)))
+        stories.append({
+            'title': title,
+            'description': description,
+            'storypoint': int(rng.choice(STUB_STORY_POINTS))
+        })
+    return stories
+
+
+def latency_summary(samples):
+    """Percentiles of latency samples given in seconds, reported in milliseconds"""
+    samples_ms = np.asarray(samples) * 1000.0
+    return {
+        'iterations': len(samples),
+        'mean_ms': float(np.mean(samples_ms)),
+        'p50_ms': float(np.percentile(samples_ms, 50)),
+        'p95_ms': float(np.percentile(samples_ms, 95)),
+        'p99_ms': float(np.percentile(samples_ms, 99)),
+        'max_ms': float(np.max(samples_ms))
+    }
+
+
+def stage_breakdown(estimator):
+    """Count and mean latency of each pipeline stage since the last metrics reset"""
+    snapshot = estimator.REGISTRY.snapshot()[estimator.STAGE_SECONDS.name]
+    return {
+        series['labels']['stage']: {
+            'count': series['count'],
+            'total_seconds': series['sum'],
+            'mean_ms': series['mean'] * 1000.0
+        }
+        for series in snapshot['series']
+    }
+
+
+def peak_rss_mb(who='self'):
+    """Peak resident set size of this process or its children, in MB"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == 'self' else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0
+    return usage.ru_maxrss / scale
+
+
+@contextlib.contextmanager
+def vectorizer_memo_disabled(tfidf):
+    """Turn off and clear the frozen vectorizer's document memo, restoring its size afterwards"""
+    cache_size = getattr(tfidf, 'cache_size', None)
+    if cache_size is None:
+        yield
+        return
+    tfidf.cache_size = 0
+    tfidf._cache.clear()
+    try:
+        yield
+    finally:
+        tfidf.cache_size = cache_size
+
+
+def cold_start_probe(start, use_stub):
+    """Time import, model load and first prediction in a fresh interpreter
+
+    Run by measure_cold_start() in a subprocess. Prints the phase times as JSON.
+    """
+    import predict
+
+    imported = time.perf_counter()
+    if use_stub:
+        models, _ = build_stub_models(predict)
+    else:
+        models = predict.get_models()
+    loaded = time.perf_counter()
+
+    story = synthetic_stories(vocabulary_terms(models['tfidf']), 1)[0]
+    predict.predict(story['title'], story['description'], models, use_cache=False)
+    predicted = time.perf_counter()
+
+    print(json.dumps({
+        'import_seconds': imported - start,
+        'load_seconds': loaded - imported,
+        'first_prediction_seconds': predicted - loaded
+    }))
+
+
+def measure_cold_start(use_stub):
+    """Run cold_start_probe() in a new interpreter and time it end to end"""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-c', COLD_START_PROBE.format(stub=bool(use_stub))],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    total = time.perf_counter() - start
+
+    if completed.returncode != 0:
+        return {'error': f"Cold start probe exited with status {completed.returncode}"}
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['total_seconds'] = total
+    result['peak_rss_mb'] = peak_rss_mb('children')
+    return result
+
+
+def measure_validation(estimator, models, rows):
+    """Time validate_model() on a synthetic CSV"""
+    import pandas as pd
+
+    stories = synthetic_stories(vocabulary_terms(models['tfidf']), rows, seed=2)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'validation.csv')
+        pd.DataFrame(stories).to_csv(path, index=False)
+
+        start = time.perf_counter()
+        metrics = estimator.validate_model(path)
+        elapsed = time.perf_counter() - start
+
+    if 'error' in metrics:
+        return {'error': metrics['error']}
+    return {
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed
+    }
+
+
+def run_benchmark(estimator, use_stub=False, iterations=DEFAULT_ITERATIONS, batch_sizes=DEFAULT_BATCH_SIZES,
+                  validation_rows=DEFAULT_VALIDATION_ROWS):
+    """Run the benchmark suite
+
+    Args:
+        estimator: The predict module
+        use_stub: Force stub models even when the real artifacts exist
+        iterations: Number of single predictions to time
+        batch_sizes: Batch sizes to measure throughput at
+        validation_rows: Rows in the synthetic validation CSV
+
+    Returns:
+        Dictionary of results
+    """
+    use_stub = use_stub or not artifacts_available(estimator)
+    if use_stub:
+        print("Benchmarking with stub models", file=sys.stderr)
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'stub_models': use_stub,
+        'cold_start': measure_cold_start(use_stub)
+    }
+    print("Cold start measured", file=sys.stderr)
+
+    # Load the models in this process and make them the cached ones. The per-artifact
+    # timings load everything again, so they are measured outside the total.
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stderr(devnull):
+        start = time.perf_counter()
+        if use_stub:
+            models, artifact_timings = build_stub_models(estimator)
+        else:
+            models = estimator.load_models()
+        total_seconds = time.perf_counter() - start
+        if not use_stub:
+            artifact_timings = time_artifact_loads(estimator)
+    results['model_load'] = {
+        'total_seconds': total_seconds,
+        'artifacts': artifact_timings
+    }
+    results['model_version'] = models.get('version')
+    estimator._MODELS_CACHE = models
+
+    # The forest that actually runs: stub and bundled models are always ArrayForest
+    rf_model = estimator.get_rf_model(models)
+    results['rf_engine'] = 'array' if isinstance(rf_model, ArrayForest) else 'sklearn'
+    results['rf_model_type'] = type(rf_model).__name__
+
+    stories = synthetic_stories(vocabulary_terms(models['tfidf']), max(iterations, max(batch_sizes)))
+
+    # The pipeline logs to stderr on every call, keep that out of the timings. Repeated
+    # batches would be memo hits in the vectorizer, so every story is vectorized for real.
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stderr(devnull), \
+            vectorizer_memo_disabled(models['tfidf']):
+        estimator.REGISTRY.reset()
+        samples = []
+        for story in stories[:iterations]:
+            start = time.perf_counter()
+            estimator.predict(story['title'], story['description'], models, use_cache=False)
+            samples.append(time.perf_counter() - start)
+        results['single_prediction'] = latency_summary(samples)
+        results['single_prediction']['stages'] = stage_breakdown(estimator)
+        estimator.REGISTRY.reset()
+
+        results['batch_throughput'] = []
+        for batch_size in batch_sizes:
+            batch = stories[:batch_size]
+            repeats = max(1, min(100, 2000 // batch_size))
+            start = time.perf_counter()
+            for _ in range(repeats):
+                estimator.batch_predict(batch, models, use_cache=False, workers=1)
+            elapsed = time.perf_counter() - start
+            results['batch_throughput'].append({
+                'batch_size': batch_size,
+                'repeats': repeats,
+                'seconds': elapsed,
+                'stories_per_second': batch_size * repeats / elapsed
+            })
+        results['batch_stages'] = stage_breakdown(estimator)
+
+        results['validation'] = measure_validation(estimator, models, validation_rows)
+
+    results['metrics'] = estimator.export_metrics('json')
+    results['peak_rss_mb'] = peak_rss_mb('self')
+    return results
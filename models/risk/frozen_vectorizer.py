@@ -0,0 +1,306 @@
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from itertools import chain
+
+import numpy as np
+import scipy.sparse as sp
+
+# TF-IDF vectorizer settings that are kept as plain values
+VECTORIZER_PARAMS = (
+    'analyzer', 'binary', 'decode_error', 'encoding', 'input', 'lowercase', 'ngram_range',
+    'norm', 'smooth_idf', 'stop_words', 'strip_accents', 'sublinear_tf', 'token_pattern', 'use_idf'
+)
+
+
+def vectorizer_arrays(tfidf):
+    """Split a fitted TF-IDF vectorizer into arrays and plain settings
+
+    Accepts a FrozenTfidfVectorizer or a sklearn TfidfVectorizer in one of
+    the configurations FrozenTfidfVectorizer reproduces exactly.
+
+    Returns:
+        Tuple of (dictionary of arrays, dictionary of settings)
+    """
+    if isinstance(tfidf, FrozenTfidfVectorizer):
+        arrays = {'vocabulary': tfidf.terms}
+        if tfidf.idf_ is not None:
+            arrays['idf'] = tfidf.idf_
+        return arrays, dict(tfidf.params)
+
+    if callable(tfidf.analyzer) or tfidf.tokenizer is not None or tfidf.preprocessor is not None:
+        raise ValueError('Vectorizers with custom analyzer, tokenizer or preprocessor are not supported')
+    if tfidf.analyzer != 'word':
+        raise ValueError(f"Only word analyzers are supported, not {tfidf.analyzer!r}")
+    if tfidf.input != 'content':
+        raise ValueError(f"Only content input is supported, not {tfidf.input!r}")
+    if callable(tfidf.strip_accents):
+        raise ValueError('Custom strip_accents functions are not supported')
+
+    params = {name: getattr(tfidf, name) for name in VECTORIZER_PARAMS}
+    params['ngram_range'] = list(params['ngram_range'])
+    if params['stop_words'] is not None and not isinstance(params['stop_words'], str):
+        params['stop_words'] = sorted(params['stop_words'])
+    params['dtype'] = np.dtype(tfidf.dtype).name
+
+    # Terms ordered by their column index
+    terms = [None] * len(tfidf.vocabulary_)
+    for term, index in tfidf.vocabulary_.items():
+        terms[index] = term
+
+    arrays = {'vocabulary': np.array(terms, dtype=str)}
+    if tfidf.use_idf:
+        arrays['idf'] = np.asarray(tfidf.idf_)
+    return arrays, params
+
+
+def strip_accents_unicode(s):
+    """Same as sklearn.feature_extraction.text.strip_accents_unicode"""
+    try:
+        s.encode('ASCII', errors='strict')
+        return s
+    except UnicodeEncodeError:
+        normalized = unicodedata.normalize('NFKD', s)
+        return ''.join([c for c in normalized if not unicodedata.combining(c)])
+
+
+def strip_accents_ascii(s):
+    """Same as sklearn.feature_extraction.text.strip_accents_ascii"""
+    return unicodedata.normalize('NFKD', s).encode('ASCII', 'ignore').decode('ASCII')
+
+
+class FrozenTfidfVectorizer:
+    """Transform-only TF-IDF vectorizer over a frozen vocabulary
+
+    Produces exactly the matrices of the fitted sklearn TfidfVectorizer it
+    was built from. Documents are tokenised with one compiled regex, term
+    counts for a whole batch are built with a single np.unique over
+    (document, term) keys, and the CSR arrays are assembled directly. The
+    vectors of recently seen documents are memoised, so repeated stories
+    skip tokenisation entirely.
+    """
+
+    # Attributes read by callers that inspect sklearn vectorizers
+    analyzer = 'word'
+    preprocessor = None
+    tokenizer = None
+
+    def __init__(self, params, vocabulary, idf=None, cache_size=4096):
+        """
+        Args:
+            params: Settings as returned by vectorizer_arrays()
+            vocabulary: Array of terms ordered by column index
+            idf: Inverse document frequencies (required when use_idf is set)
+            cache_size: Number of document vectors to memoise (0 disables it)
+        """
+        if params['analyzer'] != 'word':
+            raise ValueError(f"Only word analyzers are supported, not {params['analyzer']!r}")
+
+        self.params = dict(params)
+        self.lowercase = params['lowercase']
+        self.binary = params['binary']
+        self.sublinear_tf = params['sublinear_tf']
+        self.norm = params['norm']
+        self.encoding = params['encoding']
+        self.decode_error = params['decode_error']
+        self.ngram_range = tuple(params['ngram_range'])
+        self.dtype = np.dtype(params['dtype'])
+
+        self.token_pattern = re.compile(params['token_pattern'])
+        if self.token_pattern.groups > 1:
+            raise ValueError('More than 1 capturing group in token pattern. Only a single group should be captured.')
+
+        strip_accents = params['strip_accents']
+        if strip_accents == 'ascii':
+            self.strip_accents = strip_accents_ascii
+        elif strip_accents == 'unicode':
+            self.strip_accents = strip_accents_unicode
+        elif strip_accents is None:
+            self.strip_accents = None
+        else:
+            raise ValueError(f"Invalid value for 'strip_accents': {strip_accents}")
+
+        stop_words = params['stop_words']
+        if stop_words == 'english':
+            from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+            stop_words = ENGLISH_STOP_WORDS
+        elif isinstance(stop_words, str):
+            raise ValueError(f"not a built-in stop list: {stop_words}")
+        self.stop_words = frozenset(stop_words) if stop_words is not None else None
+
+        # Frozen term -> column table
+        self.terms = np.asarray(vocabulary)
+        self.vocabulary = {term: index for index, term in enumerate(self.terms.tolist())}
+        self.n_features = len(self.terms)
+        self.index_dtype = np.int32 if self.n_features < np.iinfo(np.int32).max else np.int64
+
+        self.idf_ = np.asarray(idf) if params['use_idf'] else None
+        if params['use_idf'] and self.idf_ is None:
+            raise ValueError('idf is required when use_idf is set')
+
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_sklearn(cls, tfidf, cache_size=4096):
+        """Build a frozen vectorizer from a fitted sklearn TfidfVectorizer"""
+        arrays, params = vectorizer_arrays(tfidf)
+        return cls(params, arrays['vocabulary'], arrays.get('idf'), cache_size)
+
+    def decode(self, doc):
+        """Decode bytes and reject missing documents like sklearn does"""
+        if isinstance(doc, bytes):
+            doc = doc.decode(self.encoding, self.decode_error)
+        if doc is np.nan:
+            raise ValueError('np.nan is an invalid document, expected byte or unicode string.')
+        return doc
+
+    def analyze(self, doc):
+        """Split a decoded document into the terms sklearn's word analyzer produces"""
+        if self.lowercase:
+            doc = doc.lower()
+        if self.strip_accents is not None:
+            doc = self.strip_accents(doc)
+
+        tokens = self.token_pattern.findall(doc)
+        if self.stop_words is not None:
+            tokens = [w for w in tokens if w not in self.stop_words]
+
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+
+        original_tokens = tokens
+        n_original_tokens = len(original_tokens)
+        if min_n == 1:
+            tokens = list(original_tokens)
+            min_n += 1
+        else:
+            tokens = []
+        for n in range(min_n, min(max_n + 1, n_original_tokens + 1)):
+            for i in range(n_original_tokens - n + 1):
+                tokens.append(' '.join(original_tokens[i:i + n]))
+        return tokens
+
+    def transform(self, raw_documents):
+        """Transform documents to a TF-IDF CSR matrix
+
+        Args:
+            raw_documents: Iterable of str (or bytes) documents
+
+        Returns:
+            scipy.sparse.csr_matrix of shape (n_documents, n_features)
+        """
+        if isinstance(raw_documents, (str, bytes)):
+            raise ValueError('Iterable over raw text documents expected, string object received.')
+        docs = [self.decode(doc) for doc in raw_documents]
+
+        # Reuse memoised rows and vectorize each distinct new document once
+        rows = [None] * len(docs)
+        missing = {}
+        with self._lock:
+            for position, doc in enumerate(docs):
+                row = self._cache.get(doc)
+                if row is not None:
+                    self._cache.move_to_end(doc)
+                    rows[position] = row
+                else:
+                    missing.setdefault(doc, []).append(position)
+
+        if missing:
+            new_rows = self._vectorize(list(missing))
+            with self._lock:
+                for (doc, positions), row in zip(missing.items(), new_rows):
+                    for position in positions:
+                        rows[position] = row
+                    self._remember(doc, row)
+
+        return self._assemble(rows)
+
+    def cache_info(self):
+        """Size of the document vector memo"""
+        with self._lock:
+            return {'size': len(self._cache), 'max_size': self.cache_size}
+
+    def _remember(self, doc, row):
+        if self.cache_size <= 0:
+            return
+        self._cache[doc] = row
+        self._cache.move_to_end(doc)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _vectorize(self, docs):
+        """Vectorize distinct documents, returning one (indices, data) pair per document"""
+        n_docs = len(docs)
+        lookup = self.vocabulary.get
+
+        # Column index of every in-vocabulary term, document by document
+        term_lists = [[index for index in map(lookup, self.analyze(doc)) if index is not None] for doc in docs]
+        lengths = np.fromiter(map(len, term_lists), dtype=np.int64, count=n_docs)
+        terms = np.fromiter(chain.from_iterable(term_lists), dtype=np.int64, count=int(lengths.sum()))
+
+        # Count (document, term) pairs; unique keys come out sorted by document then column
+        keys = np.repeat(np.arange(n_docs, dtype=np.int64), lengths) * self.n_features + terms
+        keys, counts = np.unique(keys, return_counts=True)
+        doc_ids = keys // self.n_features
+        indices = (keys - doc_ids * self.n_features).astype(self.index_dtype)
+        indptr = np.zeros(n_docs + 1, dtype=np.int64)
+        np.cumsum(np.bincount(doc_ids, minlength=n_docs), out=indptr[1:])
+
+        data = counts.astype(self.dtype)
+        if self.binary:
+            data.fill(1)
+        if self.sublinear_tf:
+            np.log(data, data)
+            data += 1.0
+        if self.idf_ is not None:
+            data *= self.idf_[indices]
+        if self.norm is not None:
+            self._normalize(indptr, data)
+
+        return [(indices[indptr[i]:indptr[i + 1]].copy(), data[indptr[i]:indptr[i + 1]].copy())
+                for i in range(n_docs)]
+
+    def _normalize(self, indptr, data):
+        """Row-normalise data in place exactly like sklearn's CSR normalisation
+
+        sklearn sums each row sequentially in a double, so the rows are
+        accumulated one column position at a time to keep the same order.
+        """
+        if self.norm == 'l2':
+            terms = data * data
+        elif self.norm == 'l1':
+            terms = np.abs(data)
+        else:
+            raise ValueError(f"Unsupported norm: {self.norm}")
+
+        lengths = np.diff(indptr)
+        sums = np.zeros(len(lengths), dtype=np.float64)
+        for k in range(int(lengths.max()) if len(lengths) else 0):
+            row_ids = np.flatnonzero(lengths > k)
+            sums[row_ids] += terms[indptr[row_ids] + k]
+
+        norms = np.sqrt(sums) if self.norm == 'l2' else sums
+        scale = np.repeat(norms, lengths)
+        nonzero = scale != 0.0
+        data[nonzero] = data[nonzero].astype(np.float64) / scale[nonzero]
+
+    def _assemble(self, rows):
+        """Stack per-document (indices, data) pairs into a CSR matrix"""
+        lengths = np.fromiter((len(indices) for indices, _ in rows), dtype=np.int64, count=len(rows))
+        indptr = np.zeros(len(rows) + 1, dtype=self.index_dtype)
+        np.cumsum(lengths, out=indptr[1:])
+
+        if rows:
+            indices = np.concatenate([row[0] for row in rows]).astype(self.index_dtype, copy=False)
+            data = np.concatenate([row[1] for row in rows])
+        else:
+            indices = np.zeros(0, dtype=self.index_dtype)
+            data = np.zeros(0, dtype=self.dtype)
+
+        X = sp.csr_matrix((data, indices, indptr), shape=(len(rows), self.n_features))
+        X.has_sorted_indices = True
+        return X
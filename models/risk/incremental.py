@@ -0,0 +1,189 @@
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialised
+    fcntl = None
+
+# Bumped when the manifest layout or content hash changes; older manifests are recomputed
+MANIFEST_FORMAT = 2
+
+# Serialises read-modify-write cycles on manifest files within one process;
+# a lock file next to the manifest serialises them across processes
+_MANIFEST_LOCK = threading.Lock()
+LOCK_SUFFIX = '.lock'
+
+
+def story_content_hash(text):
+    """Hash of the text a story's prediction is made from
+
+    Args:
+        text: Story text as the pipeline builds it from title and description
+
+    Returns:
+        Hex SHA-256 digest of the text
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def empty_manifest(model_version, dqn_influence, use_dynamic_influence):
+    """Manifest with no stories for the given model version and parameters"""
+    return {
+        'format': MANIFEST_FORMAT,
+        'model_version': model_version,
+        'dqn_influence': round(float(dqn_influence), 6),
+        'dynamic': bool(use_dynamic_influence),
+        'updated': None,
+        'stories': {}
+    }
+
+
+def manifest_mismatch(manifest, model_version, dqn_influence, use_dynamic_influence):
+    """Why the results in a manifest cannot be reused, or None when they can
+
+    Returns:
+        None, or one of 'missing', 'format', 'model_version' and 'parameters'
+    """
+    if not manifest:
+        return 'missing'
+    if manifest.get('format') != MANIFEST_FORMAT or not isinstance(manifest.get('stories'), dict):
+        return 'format'
+    if model_version is None or manifest.get('model_version') != model_version:
+        return 'model_version'
+    if (manifest.get('dqn_influence') != round(float(dqn_influence), 6)
+            or manifest.get('dynamic') != bool(use_dynamic_influence)):
+        return 'parameters'
+    return None
+
+
+def load_manifest(path):
+    """Read a manifest file, or return None when there is none yet"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path):
+    """Write a manifest file atomically, so an interrupted run keeps the previous one"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.manifest-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextlib.contextmanager
+def locked_manifest(path):
+    """Hold an exclusive lock on a manifest, across threads and processes"""
+    with _MANIFEST_LOCK:
+        if fcntl is None:
+            yield
+            return
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path + LOCK_SUFFIX, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def incremental_predict(items, manifest, predict_batch, story_text, model_version, dqn_influence=0.3,
+                        use_dynamic_influence=False, id_field='id', prune=False):
+    """Predict a batch, reusing the manifest's results for unchanged stories
+
+    A story's result is reused when the manifest has an entry for its id with
+    the same content hash, and the manifest was built by the same model
+    version with the same DQN parameters; otherwise the story is predicted
+    again. Stories without an id are always predicted and not recorded.
+
+    Args:
+        items: List of dictionaries with id_field, 'title' and 'description' keys
+        manifest: Prior manifest, or None
+        predict_batch: Function(items) returning one result per item
+        story_text: Function(title, description) building the text that gets vectorized
+        model_version: Version string of the loaded model artifacts
+        dqn_influence: Weight of DQN adjustment (0.0-1.0)
+        use_dynamic_influence: Whether confidence-based dynamic influence is used
+        id_field: Key of the story id in each item
+        prune: Whether to drop manifest entries for stories missing from items
+
+    Returns:
+        Tuple of (results in the order of items, updated manifest, stats dictionary)
+    """
+    mismatch = manifest_mismatch(manifest, model_version, dqn_influence, use_dynamic_influence)
+    previous = manifest['stories'] if mismatch is None else {}
+    updated = empty_manifest(model_version, dqn_influence, use_dynamic_influence)
+    if not prune:
+        # Stories not in this batch keep their entries
+        updated['stories'] = dict(previous)
+
+    results = [None] * len(items)
+    stale = []
+    stats = {'stories': len(items), 'reused': 0, 'new': 0, 'changed': 0, 'unidentified': 0}
+    for i, item in enumerate(items):
+        story_id = item.get(id_field)
+        if story_id is None:
+            stats['unidentified'] += 1
+            stale.append((i, None, None))
+            continue
+
+        story_id = str(story_id)
+        content_hash = story_content_hash(story_text(item.get('title', ''), item.get('description', '')))
+        entry = previous.get(story_id)
+        if entry is not None and entry.get('hash') == content_hash:
+            stats['reused'] += 1
+            results[i] = entry['result']
+            updated['stories'][story_id] = entry
+            continue
+
+        stats['changed' if entry is not None else 'new'] += 1
+        stale.append((i, story_id, content_hash))
+
+    if stale:
+        computed = predict_batch([items[i] for i, _, _ in stale])
+        for (i, story_id, content_hash), result in zip(stale, computed):
+            results[i] = result
+            if story_id is not None:
+                updated['stories'][story_id] = {'hash': content_hash, 'result': result}
+
+    stats['computed'] = len(stale)
+    prior = manifest.get('stories') if isinstance(manifest, dict) else None
+    stats['removed'] = len(set(prior) - set(updated['stories'])) if isinstance(prior, dict) else 0
+    stats['invalidated'] = mismatch if mismatch != 'missing' else None
+    updated['updated'] = datetime.now().isoformat()
+    return results, updated, stats
+
+
+def incremental_predict_file(items, manifest_path, predict_batch, story_text, model_version, dqn_influence=0.3,
+                             use_dynamic_influence=False, id_field='id', prune=False):
+    """incremental_predict with the manifest read from and written back to a file
+
+    The manifest is locked for the whole run, so concurrent runs on the same
+    file, e.g. in different daemon workers, do not overwrite each other.
+
+    Returns:
+        Tuple of (results in the order of items, stats dictionary)
+    """
+    with locked_manifest(manifest_path):
+        manifest = load_manifest(manifest_path)
+        results, updated, stats = incremental_predict(items, manifest, predict_batch, story_text, model_version,
+                                                      dqn_influence, use_dynamic_influence, id_field, prune)
+        save_manifest(updated, manifest_path)
+    return results, stats
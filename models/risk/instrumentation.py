@@ -0,0 +1,230 @@
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# Metric names are prefixed so they group together on dashboards
+METRIC_PREFIX = 'story_points_'
+
+# Set METRICS_ENABLED=false to turn every timer and counter into a no-op
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+
+# Default histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def get_logger(name='story_points'):
+    """Logger writing to stderr, with the level taken from LOG_LEVEL (default WARNING)"""
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+        logger.setLevel(os.environ.get('LOG_LEVEL', 'WARNING').upper())
+    return logger
+
+
+def label_key(labels):
+    """Hashable, ordered form of a label dictionary"""
+    return tuple(sorted(labels.items()))
+
+
+def format_labels(key, extra=()):
+    """Prometheus label set for a label key"""
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def format_value(value):
+    """Prometheus sample value"""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count, one series per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, lock):
+        self.name = name
+        self.help_text = help_text
+        self._lock = lock
+        self._values = {}
+
+    def inc(self, value=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def samples(self):
+        return [(self.name, key, value) for key, value in self._values.items()]
+
+    def snapshot(self):
+        return [{'labels': dict(key), 'value': value} for key, value in self._values.items()]
+
+    def reset(self):
+        self._values.clear()
+
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. cache size"""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[label_key(labels)] = value
+
+
+class Histogram:
+    """Bucketed distribution of observations, one series per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, lock, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._bounds = np.asarray(self.buckets, dtype=np.float64)
+        self._lock = lock
+        self._series = {}
+
+    def _state(self, key):
+        state = self._series.get(key)
+        if state is None:
+            # Per-bucket (non-cumulative) counts, the last slot is +Inf
+            state = self._series[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+        return state
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        index = int(np.searchsorted(self._bounds, value, side='left'))
+        with self._lock:
+            state = self._state(label_key(labels))
+            state['counts'][index] += 1
+            state['sum'] += float(value)
+            state['count'] += 1
+
+    def observe_many(self, values, **labels):
+        """Observe every value of an array at once"""
+        if not METRICS_ENABLED:
+            return
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return
+        counts = np.bincount(np.searchsorted(self._bounds, values, side='left'), minlength=len(self.buckets) + 1)
+        with self._lock:
+            state = self._state(label_key(labels))
+            for index, count in enumerate(counts.tolist()):
+                state['counts'][index] += count
+            state['sum'] += float(values.sum())
+            state['count'] += len(values)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of a block in seconds"""
+        if not METRICS_ENABLED:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        for key, state in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state['counts']):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key + (('le', format_value(float(bound))),), cumulative))
+            samples.append((f"{self.name}_sum", key, state['sum']))
+            samples.append((f"{self.name}_count", key, state['count']))
+        return samples
+
+    def snapshot(self):
+        return [
+            {
+                'labels': dict(key),
+                'count': state['count'],
+                'sum': state['sum'],
+                'mean': state['sum'] / state['count'] if state['count'] else 0.0,
+                'buckets': {format_value(float(bound)): count
+                            for bound, count in zip(self.buckets + (float('inf'),), state['counts'])}
+            }
+            for key, state in self._series.items()
+        ]
+
+    def reset(self):
+        self._series.clear()
+
+
+class MetricsRegistry:
+    """Process-wide set of named metrics with Prometheus and JSON export"""
+
+    def __init__(self, prefix=METRIC_PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text):
+        return self._register(Counter(self.prefix + name, help_text, self._lock))
+
+    def gauge(self, name, help_text):
+        return self._register(Gauge(self.prefix + name, help_text, self._lock))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self.prefix + name, help_text, self._lock, buckets))
+
+    def to_prometheus(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for metric in self._metrics.values():
+                lines.append(f"# HELP {metric.name} {metric.help_text}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                for name, key, value in metric.samples():
+                    lines.append(f"{name}{format_labels(key)} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """JSON-serializable view of every metric"""
+        with self._lock:
+            return {
+                metric.name: {'type': metric.kind, 'help': metric.help_text, 'series': metric.snapshot()}
+                for metric in self._metrics.values()
+            }
+
+    def reset(self):
+        """Clear every series, e.g. between benchmark phases"""
+        with self._lock:
+            for metric in self._metrics.values():
+                metric.reset()
+
+
+# Global registry used by the estimator
+REGISTRY = MetricsRegistry()
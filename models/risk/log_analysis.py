@@ -0,0 +1,197 @@
+import gzip
+import json
+import os
+import re
+import sys
+from bisect import bisect_left
+from collections import Counter
+
+from prediction_log import LOG_FORMATS
+
+# Daily log files written by log_prediction, plain or gzip-compressed
+LOG_FILE_PATTERN = re.compile(r'^predictions_(\d{4}-\d{2}-\d{2})\.jsonl(\.gz)?$')
+
+# Upper edges of the confidence histogram bins
+CONFIDENCE_BINS = tuple(round(0.1 * i, 1) for i in range(1, 11))
+
+
+def list_log_files(log_dir):
+    """Daily log files in a directory, oldest first
+
+    Returns:
+        List of (date string, path) tuples
+    """
+    files = []
+    for name in os.listdir(log_dir):
+        match = LOG_FILE_PATTERN.match(name)
+        if match:
+            files.append((match.group(1), os.path.join(log_dir, name)))
+    return sorted(files)
+
+
+def iter_log_records(path):
+    """Yield (record, error) pairs from one log file without reading it all into memory"""
+    opener = gzip.open if path.endswith(LOG_FORMATS['jsonl.gz']) else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield None, True
+                continue
+            yield (record, False) if isinstance(record, dict) else (None, True)
+
+
+def distribution_distance(counts, reference):
+    """Total variation distance between two count distributions (0 = identical, 1 = disjoint)"""
+    total = sum(counts.values())
+    reference_total = sum(reference.values())
+    if not total or not reference_total:
+        return None
+    keys = set(counts) | set(reference)
+    return 0.5 * sum(abs(counts.get(k, 0) / total - reference.get(k, 0) / reference_total) for k in keys)
+
+
+class DailyLogStats:
+    """Running statistics for the predictions logged on one day"""
+
+    def __init__(self, date):
+        self.date = date
+        self.count = 0
+        self.changed = 0
+        self.rf_prediction = Counter()
+        self.adjusted_prediction = Counter()
+        self.applied_adjustment = Counter()
+        self.confidence_bins = [0] * len(CONFIDENCE_BINS)
+        self.confidence_sum = 0.0
+        self.confidence_min = None
+        self.confidence_max = None
+        self.hourly = Counter()
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    def update(self, record):
+        self.count += 1
+        rf_prediction = record.get('rf_prediction')
+        adjusted_prediction = record.get('adjusted_prediction')
+        self.rf_prediction[rf_prediction] += 1
+        self.adjusted_prediction[adjusted_prediction] += 1
+        self.applied_adjustment[record.get('applied_adjustment')] += 1
+        if rf_prediction != adjusted_prediction:
+            self.changed += 1
+
+        confidence = record.get('confidence')
+        if isinstance(confidence, (int, float)):
+            self.confidence_sum += confidence
+            self.confidence_min = confidence if self.confidence_min is None else min(self.confidence_min, confidence)
+            self.confidence_max = confidence if self.confidence_max is None else max(self.confidence_max, confidence)
+            # Values above the last edge are counted in the last bin
+            self.confidence_bins[min(bisect_left(CONFIDENCE_BINS, confidence), len(CONFIDENCE_BINS) - 1)] += 1
+
+        # ISO timestamps sort lexically, and characters 11-12 are the hour
+        timestamp = record.get('timestamp')
+        if isinstance(timestamp, str) and len(timestamp) >= 13:
+            self.hourly[timestamp[11:13]] += 1
+            if self.first_timestamp is None or timestamp < self.first_timestamp:
+                self.first_timestamp = timestamp
+            if self.last_timestamp is None or timestamp > self.last_timestamp:
+                self.last_timestamp = timestamp
+
+    def summary(self, reference=None):
+        """Compact JSON-serializable summary of the day"""
+        confidence_count = sum(self.confidence_bins)
+        peak_hour = max(self.hourly.items(), key=lambda item: item[1]) if self.hourly else None
+        return {
+            'date': self.date,
+            'predictions': self.count,
+            'dqn_changed_share': self.changed / self.count if self.count else 0.0,
+            'rf_prediction': counter_summary(self.rf_prediction),
+            'adjusted_prediction': counter_summary(self.adjusted_prediction),
+            'applied_adjustment': counter_summary(self.applied_adjustment),
+            'confidence': {
+                'mean': self.confidence_sum / confidence_count if confidence_count else None,
+                'min': self.confidence_min,
+                'max': self.confidence_max,
+                'histogram': dict(zip((str(edge) for edge in CONFIDENCE_BINS), self.confidence_bins))
+            },
+            'throughput': {
+                'first': self.first_timestamp,
+                'last': self.last_timestamp,
+                'per_hour': dict(sorted(self.hourly.items())),
+                'peak_hour': {'hour': peak_hour[0], 'predictions': peak_hour[1]} if peak_hour else None
+            },
+            # Drift of the final answers against the whole period
+            'adjusted_prediction_drift': distribution_distance(self.adjusted_prediction, reference)
+            if reference is not None else None
+        }
+
+
+def value_sort_key(value):
+    """Sort numbers numerically before anything else (e.g. missing values)"""
+    if isinstance(value, (int, float)):
+        return (0, value, '')
+    return (1, 0, str(value))
+
+
+def counter_summary(counter):
+    """Counts keyed by value, in value order, with JSON-safe keys"""
+    return {str(key): counter[key] for key in sorted(counter, key=value_sort_key)}
+
+
+def analyze_logs(log_dir, since=None, until=None):
+    """Summarise prediction logs day by day
+
+    Files are streamed line by line, so memory stays bounded by the number
+    of days rather than the number of logged predictions.
+
+    Args:
+        log_dir: Directory with predictions_YYYY-MM-DD.jsonl[.gz] files
+        since: Optional first date to include (YYYY-MM-DD)
+        until: Optional last date to include (YYYY-MM-DD)
+
+    Returns:
+        Dictionary with per-day summaries and totals
+    """
+    if not os.path.isdir(log_dir):
+        raise ValueError(f"Log directory not found: {log_dir}")
+
+    days = {}
+    overall_adjusted = Counter()
+    files = 0
+    malformed = 0
+
+    for file_date, path in list_log_files(log_dir):
+        if (since and file_date < since) or (until and file_date > until):
+            continue
+        files += 1
+        for record, error in iter_log_records(path):
+            if error:
+                malformed += 1
+                continue
+            # Group by the record's own date, falling back to the file's
+            timestamp = record.get('timestamp')
+            date = timestamp[:10] if isinstance(timestamp, str) and len(timestamp) >= 10 else file_date
+            stats = days.get(date)
+            if stats is None:
+                stats = days[date] = DailyLogStats(date)
+            stats.update(record)
+            overall_adjusted[record.get('adjusted_prediction')] += 1
+        print(f"Analyzed {path}", file=sys.stderr)
+
+    total = sum(stats.count for stats in days.values())
+    changed = sum(stats.changed for stats in days.values())
+    return {
+        'log_dir': log_dir,
+        'files': files,
+        'days': [days[date].summary(overall_adjusted) for date in sorted(days)],
+        'totals': {
+            'predictions': total,
+            'malformed_lines': malformed,
+            'dqn_changed_share': changed / total if total else 0.0,
+            'adjusted_prediction': counter_summary(overall_adjusted),
+            'predictions_per_day': total / len(days) if days else 0.0
+        }
+    }
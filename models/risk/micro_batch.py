@@ -0,0 +1,150 @@
+import threading
+import time
+
+
+class _Batch:
+    """Requests collected for one run and, once it has run, their results"""
+
+    def __init__(self):
+        self.requests = []
+        self.results = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """Combine concurrent single requests into batches
+
+    The first request to arrive opens a batch and becomes its leader. The
+    batch takes more requests for up to window seconds, or until max_size
+    have joined, and stays open while the previous batch is still running,
+    so batches grow with the load. The window is skipped when the previous
+    batch held a single request, so a lone request on an idle server is not
+    delayed. The leader runs the batch under lock, calling process_batch
+    once per distinct params, and every caller gets its own result back.
+
+    Args:
+        process_batch: Function(params, items) returning one result per item
+        window: Seconds a batch waits for more requests
+        max_size: Most requests in one batch
+        lock: Lock held while a batch runs, shared with other users of the models
+    """
+
+    def __init__(self, process_batch, window=0.005, max_size=64, lock=None):
+        self.process_batch = process_batch
+        self.window = window
+        self.max_size = max_size
+        self._lock = lock if lock is not None else threading.Lock()
+        self._cond = threading.Condition()
+        self._open = None
+        self._last_size = 1
+
+        # Counters
+        self.requests = 0
+        self.batches = 0
+        self.fallbacks = 0
+
+    def submit(self, params, item):
+        """Run one request as part of a batch and return its result
+
+        Args:
+            params: Hashable parameters; only requests with equal params share a process_batch call
+            item: Input of the request
+
+        Returns:
+            The result process_batch returned for item
+
+        Raises:
+            The exception process_batch raised for item
+        """
+        with self._cond:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            position = len(batch.requests)
+            batch.requests.append((params, item))
+            self.requests += 1
+            if len(batch.requests) >= self.max_size:
+                self._open = None
+                self._cond.notify_all()
+
+        if leader:
+            self._lead(batch)
+        else:
+            batch.done.wait()
+
+        result, error = batch.results[position]
+        if error is not None:
+            raise error
+        return result
+
+    def stats(self):
+        """Request and batch counters"""
+        return {
+            'window_ms': self.window * 1000,
+            'max_size': self.max_size,
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'fallbacks': self.fallbacks
+        }
+
+    def _lead(self, batch):
+        """Wait for the batch to fill, then run it"""
+        with self._cond:
+            if self._last_size > 1:
+                deadline = time.monotonic() + self.window
+                while self._open is batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+        with self._lock:
+            with self._cond:
+                if self._open is batch:
+                    self._open = None
+                self._last_size = len(batch.requests)
+            self.batches += 1
+            try:
+                batch.results = self._run(batch.requests)
+            except BaseException as e:
+                batch.results = [(None, e)] * len(batch.requests)
+                raise
+            finally:
+                batch.done.set()
+
+    def _run(self, requests):
+        """Process every group of requests with equal params
+
+        Returns:
+            List of (result, exception) pairs, in the order of requests
+        """
+        groups = {}
+        for position, (params, _) in enumerate(requests):
+            groups.setdefault(params, []).append(position)
+
+        results = [None] * len(requests)
+        for params, positions in groups.items():
+            items = [requests[position][1] for position in positions]
+            try:
+                outputs = list(self.process_batch(params, items))
+                if len(outputs) != len(items):
+                    raise ValueError(f"Expected {len(items)} results, got {len(outputs)}")
+            except Exception as e:
+                if len(items) == 1:
+                    results[positions[0]] = (None, e)
+                    continue
+                # One bad request must not fail the others, so run them one at a time
+                self.fallbacks += 1
+                outputs = None
+
+            for i, position in enumerate(positions):
+                if outputs is not None:
+                    results[position] = (outputs[i], None)
+                    continue
+                try:
+                    results[position] = (self.process_batch(params, [items[i]])[0], None)
+                except Exception as e:
+                    results[position] = (None, e)
+        return results
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from array_forest import ArrayForest, flatten_forest
+from frozen_vectorizer import FrozenTfidfVectorizer, vectorizer_arrays
+
+# Bundle layout identifiers, bump the version when the layout changes
+BUNDLE_FORMAT = 'story-point-estimator-bundle'
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILENAME = 'manifest.json'
+
+
+def file_sha256(path):
+    """SHA-256 hex digest of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def to_json_value(value):
+    """Convert NumPy scalars to plain Python values for the manifest"""
+    return value.item() if hasattr(value, 'item') else value
+
+
+def build_bundle(models, bundle_dir):
+    """Write loaded models into a single versioned artifact bundle
+
+    The bundle is a directory holding one .npy file per array plus a manifest
+    with checksums. Arrays are stored uncompressed so they can be memory-mapped.
+
+    Args:
+        models: Dictionary of loaded models as returned by load_models()
+        bundle_dir: Directory to write the bundle to (replaced if it exists)
+
+    Returns:
+        The manifest dictionary
+    """
+    arrays = {}
+    for name, array in flatten_forest(models['rf_model']).items():
+        arrays[f"rf_{name}"] = array
+
+    tfidf_arrays, tfidf_params = vectorizer_arrays(models['tfidf'])
+    for name, array in tfidf_arrays.items():
+        arrays[f"tfidf_{name}"] = array
+
+    for name, array in models['dqn_table'].items():
+        arrays[f"dqn_table_{name}"] = np.asarray(array)
+
+    # Write to a temporary directory first so readers never see a partial bundle
+    tmp_dir = f"{bundle_dir}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    array_entries = {}
+    for name, array in sorted(arrays.items()):
+        filename = f"{name}.npy"
+        path = os.path.join(tmp_dir, filename)
+        np.save(path, np.ascontiguousarray(array), allow_pickle=False)
+        array_entries[name] = {
+            'file': filename,
+            'sha256': file_sha256(path),
+            'dtype': np.asarray(array).dtype.str,
+            'shape': list(np.shape(array))
+        }
+
+    bundle_digest = hashlib.sha256()
+    for name, entry in sorted(array_entries.items()):
+        bundle_digest.update(f"{name}:{entry['sha256']};".encode('utf-8'))
+
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'bundle_id': bundle_digest.hexdigest()[:16],
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'source_version': models.get('version'),
+        'vectorizer': tfidf_params,
+        'label_mapping': [[to_json_value(k), to_json_value(v)] for k, v in models['label_mapping'].items()],
+        'inverse_mapping': [[to_json_value(k), to_json_value(v)] for k, v in models['inverse_mapping'].items()],
+        'arrays': array_entries
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the new bundle into place
+    old_dir = f"{bundle_dir}.old-{os.getpid()}"
+    if os.path.exists(bundle_dir):
+        os.rename(bundle_dir, old_dir)
+    os.rename(tmp_dir, bundle_dir)
+    if os.path.exists(old_dir):
+        shutil.rmtree(old_dir)
+
+    return manifest
+
+
+def bundle_exists(bundle_dir):
+    """Check whether a bundle manifest is present"""
+    return os.path.exists(os.path.join(bundle_dir, MANIFEST_FILENAME))
+
+
+def read_bundle(bundle_dir, verify=True):
+    """Read a bundle manifest and memory-map its arrays read-only
+
+    Mapped arrays are backed by the page cache, so concurrent worker
+    processes share one copy of the model instead of each unpickling its own.
+    Shapes and dtypes are always checked against the manifest, which only
+    reads the file headers; checksums read every page, so they are optional.
+
+    Args:
+        bundle_dir: Bundle directory
+        verify: Whether to check every array file against its manifest checksum
+
+    Returns:
+        Tuple of (manifest dictionary, dictionary of memory-mapped arrays)
+    """
+    with open(os.path.join(bundle_dir, MANIFEST_FILENAME)) as f:
+        manifest = json.load(f)
+
+    if manifest.get('format') != BUNDLE_FORMAT:
+        raise ValueError(f"{bundle_dir} is not a {BUNDLE_FORMAT}")
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format version: {manifest.get('format_version')}")
+
+    arrays = {}
+    for name, entry in manifest['arrays'].items():
+        path = os.path.join(bundle_dir, entry['file'])
+        if verify and file_sha256(path) != entry['sha256']:
+            raise ValueError(f"Checksum mismatch for {entry['file']}")
+        array = np.load(path, mmap_mode='r', allow_pickle=False)
+        if list(array.shape) != entry['shape'] or array.dtype.str != entry['dtype']:
+            raise ValueError(f"Shape or dtype mismatch for {entry['file']}")
+        arrays[name] = array
+
+    return manifest, arrays
+
+
+def prefixed_arrays(arrays, prefix):
+    """Arrays whose name starts with prefix, keyed by the rest of the name"""
+    return {name[len(prefix):]: array for name, array in arrays.items() if name.startswith(prefix)}
+
+
+def load_bundle(bundle_dir, verify=True, vectorizer_cache_size=4096):
+    """Load the estimator models from an artifact bundle
+
+    Neither sklearn nor TensorFlow is imported: the forest and the TF-IDF
+    vectorizer are evaluated directly from the mapped arrays.
+
+    Args:
+        bundle_dir: Bundle directory
+        verify: Whether to check every array file against its manifest checksum
+        vectorizer_cache_size: Document vectors memoised by the vectorizer
+
+    Returns:
+        Dictionary of models in the same shape as load_models()
+    """
+    manifest, arrays = read_bundle(bundle_dir, verify)
+
+    tfidf_arrays = prefixed_arrays(arrays, 'tfidf_')
+    tfidf = FrozenTfidfVectorizer(manifest['vectorizer'], tfidf_arrays['vocabulary'], tfidf_arrays.get('idf'),
+                                  vectorizer_cache_size)
+
+    label_mapping = {key: value for key, value in manifest['label_mapping']}
+    inverse_mapping = {key: value for key, value in manifest['inverse_mapping']}
+
+    return {
+        'version': manifest['bundle_id'],
+        'rf_model': ArrayForest(prefixed_arrays(arrays, 'rf_')),
+        'tfidf': tfidf,
+        'dqn_model': None,
+        'dqn_table': prefixed_arrays(arrays, 'dqn_table_'),
+        'label_mapping': label_mapping,
+        'inverse_mapping': inverse_mapping,
+        'bundle_manifest': manifest
+    }
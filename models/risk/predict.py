@@ -1,16 +1,23 @@
 import sys
 import json
+import contextlib
 import os
+import hashlib
 import joblib
 import numpy as np
-import tensorflow as tf
-from tensorflow import keras
-import pandas as pd
-from sklearn.metrics import mean_absolute_error, accuracy_score
 import time
 from datetime import datetime
-import gdown
-import os
+from prediction_cache import PredictionCache, make_cache_key
+from model_bundle import MANIFEST_FILENAME, build_bundle, bundle_exists, load_bundle, read_bundle
+from array_forest import ArrayForest
+from frozen_vectorizer import FrozenTfidfVectorizer
+from instrumentation import REGISTRY, SIZE_BUCKETS, get_logger
+from prediction_log import PredictionLogWriter
+from micro_batch import MicroBatcher
+from incremental import incremental_predict, incremental_predict_file
+
+# TensorFlow, pandas, sklearn.metrics and gdown are imported lazily where they
+# are needed, so a plain prediction does not pay for importing them
 
 
 # Path to models
@@ -19,19 +26,48 @@ MODEL_DIR = os.path.dirname(__file__)
 
 os.makedirs(MODEL_DIR, exist_ok=True)
 
+# Google Drive ids of the model artifacts
+MODEL_FILE_IDS = {
+    "dqn_model.h5": "1Xx74nw9jcfzkzay-KkTExsmSqNr00XXn",
+    "inverse_mapping.joblib": "1yTNdV-87QiqSE1iZWtHLwnb7fto9g6zt",
+    "label_mapping.joblib": "1FECF3ep_HhuqOvz0IS4IjbZjMfRncD7p",
+    "rf_model.joblib": "1lIFVepRPT_IH7s1ljzktDKtlt6M-B30w",
+    "vectorizer.joblib": "1pWNiODIW8NdZwgQkXuLQQPP_j8qcXg4R",
+}
+
 def download_if_not_exists(file_id, filename):
     dest_path = os.path.join(MODEL_DIR, filename)
     if not os.path.exists(dest_path):
+        import gdown
         url = f"https://drive.google.com/uc?id={file_id}"
         gdown.download(url, dest_path, quiet=False)
     return dest_path
 
-# Example usage
-dqn_model_path = download_if_not_exists("1Xx74nw9jcfzkzay-KkTExsmSqNr00XXn", "dqn_model.h5")
-inverse_mapping_path = download_if_not_exists("1yTNdV-87QiqSE1iZWtHLwnb7fto9g6zt", "inverse_mapping.joblib")
-label_mapping_path = download_if_not_exists("1FECF3ep_HhuqOvz0IS4IjbZjMfRncD7p", "label_mapping.joblib")
-rf_model_path = download_if_not_exists("1lIFVepRPT_IH7s1ljzktDKtlt6M-B30w", "rf_model.joblib")
-vectorizer_path = download_if_not_exists("1pWNiODIW8NdZwgQkXuLQQPP_j8qcXg4R", "vectorizer.joblib")
+def model_file_path(filename):
+    """Path to a model artifact, downloading it first if it is missing"""
+    return download_if_not_exists(MODEL_FILE_IDS[filename], filename)
+
+# Artifact paths (downloaded on first load if missing)
+dqn_model_path = os.path.join(MODEL_DIR, "dqn_model.h5")
+inverse_mapping_path = os.path.join(MODEL_DIR, "inverse_mapping.joblib")
+label_mapping_path = os.path.join(MODEL_DIR, "label_mapping.joblib")
+rf_model_path = os.path.join(MODEL_DIR, "rf_model.joblib")
+vectorizer_path = os.path.join(MODEL_DIR, "vectorizer.joblib")
+
+# Precomputed DQN outputs, generated next to dqn_model.h5 on first load
+dqn_table_path = os.path.join(MODEL_DIR, "dqn_table.npz")
+
+# Memory-mappable artifact bundle built with --build-bundle. When present it is
+# loaded instead of the separate joblib/h5 files. Checksums are verified when the
+# bundle is built; MODEL_BUNDLE_VERIFY=true also verifies them on every load,
+# which reads every page of the mapped arrays.
+MODEL_BUNDLE_DIR = os.environ.get('MODEL_BUNDLE_DIR', os.path.join(MODEL_DIR, "model_bundle"))
+MODEL_BUNDLE_VERIFY = os.environ.get('MODEL_BUNDLE_VERIFY', 'false').lower() == 'true'
+
+# Frozen TF-IDF vectorizer settings: whether to replace the sklearn vectorizer
+# with the exact frozen one, and how many document vectors it memoises
+FROZEN_VECTORIZER = os.environ.get('FROZEN_VECTORIZER', 'true').lower() == 'true'
+VECTORIZER_CACHE_SIZE = int(os.environ.get('VECTORIZER_CACHE_SIZE', '4096'))
 
 # Valid story point values in Fibonacci sequence used in Agile
 VALID_STORY_POINTS = [0.5, 1, 2, 3, 5, 8, 13, 20, 40, 100]
@@ -39,6 +75,57 @@ VALID_STORY_POINTS = [0.5, 1, 2, 3, 5, 8, 13, 20, 40, 100]
 # Global models cache to avoid reloading models
 _MODELS_CACHE = None
 
+# Prediction cache settings: in-process LRU size (0 disables it) and an
+# optional SQLite file shared across processes and restarts
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', '10000'))
+PREDICTION_CACHE_PATH = os.environ.get('PREDICTION_CACHE_PATH') or None
+
+# Global prediction cache, created on first use
+_PREDICTION_CACHE = None
+
+# Parallel batch settings: worker processes (0 uses every CPU core), stories
+# per shard, and the batch size below which batches stay in-process
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', '0')) or os.cpu_count() or 1
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', '1000'))
+PARALLEL_BATCH_THRESHOLD = int(os.environ.get('PARALLEL_BATCH_THRESHOLD', '2000'))
+
+# Server micro-batching: concurrent single-story requests that arrive within
+# the window (0 disables it) are predicted together, up to the maximum size
+MICRO_BATCH_WINDOW_MS = float(os.environ.get('MICRO_BATCH_WINDOW_MS', '5'))
+MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE', '64'))
+
+# Random forest engine: 'sklearn' uses the pickled estimator, 'array' the
+# flattened NumPy evaluator (bundles always use the array engine)
+RF_ENGINES = ('sklearn', 'array')
+RF_ENGINE = os.environ.get('RF_ENGINE', 'sklearn')
+
+# Global worker pool for parallel batches, created on first use
+_BATCH_POOL = None
+_BATCH_POOL_WORKERS = 0
+
+# Prediction log settings: file format ('jsonl' or 'jsonl.gz'), records that
+# can wait for the writer thread, and the longest time between flushes
+PREDICTION_LOG_FORMAT = os.environ.get('PREDICTION_LOG_FORMAT', 'jsonl')
+PREDICTION_LOG_QUEUE_SIZE = int(os.environ.get('PREDICTION_LOG_QUEUE_SIZE', '10000'))
+PREDICTION_LOG_FLUSH_INTERVAL = float(os.environ.get('PREDICTION_LOG_FLUSH_INTERVAL', '1.0'))
+
+# Background prediction log writers by log directory
+_PREDICTION_LOG_WRITERS = {}
+
+# Debug output of the prediction pipeline, enabled with LOG_LEVEL=DEBUG
+logger = get_logger()
+
+# Pipeline metrics, exported by the server's metrics request and by --bench
+STAGE_SECONDS = REGISTRY.histogram('stage_seconds', 'Time spent in each prediction stage')
+PREDICTIONS = REGISTRY.counter('predictions_total', 'Stories predicted')
+CACHE_LOOKUPS = REGISTRY.counter('prediction_cache_lookups_total', 'Prediction cache lookups by result')
+CACHE_ENTRIES = REGISTRY.gauge('prediction_cache_entries', 'Results held in the in-process prediction cache')
+ERRORS = REGISTRY.counter('errors_total', 'Failed requests by request type')
+BATCH_SIZE = REGISTRY.histogram('batch_size', 'Stories per batch prediction', SIZE_BUCKETS)
+CONFIDENCE = REGISTRY.histogram('confidence', 'Normalised DQN confidence of predictions',
+                                [round(0.1 * i, 1) for i in range(1, 11)])
+ADJUSTMENT = REGISTRY.histogram('applied_adjustment', 'Applied DQN adjustment in class steps', range(-5, 6))
+
 # Helper function to convert numpy types to standard Python types
 def convert_to_serializable(obj):
     """Convert numpy types to standard Python types for JSON serialization"""
@@ -55,48 +142,220 @@ def convert_to_serializable(obj):
     else:
         return obj
 
-# Define a custom MSE loss function 
-def mse(y_true, y_pred):
-    return tf.reduce_mean(tf.square(y_true - y_pred))
-
-# Register the MSE function with Keras
-keras.utils.get_custom_objects().update({'mse': mse})
+def load_dqn_model(path):
+    """Load the Keras DQN model, importing TensorFlow on first use"""
+    import tensorflow as tf
+    from tensorflow import keras
+    
+    # Define a custom MSE loss function 
+    def mse(y_true, y_pred):
+        return tf.reduce_mean(tf.square(y_true - y_pred))
+    
+    # Register the MSE function with Keras
+    keras.utils.get_custom_objects().update({'mse': mse})
+    
+    dqn_model = keras.models.load_model(path, compile=False)
+    dqn_model.compile(optimizer='adam', loss='mse')
+    return dqn_model
 
+class ModelLoadError(RuntimeError):
+    """Raised when the model artifacts cannot be loaded"""
 
 def load_models():
-    """Load all required models"""
+    """Load all required models, from the artifact bundle when one exists
+    
+    Raises:
+        ModelLoadError: If an artifact is missing or cannot be loaded
+    """
     # Use stderr for logging instead of stdout
     print("Loading models...", file=sys.stderr)
     start_time = time.time()
     try:
-        # Load Random Forest model
-        rf_model = joblib.load(rf_model_path)
-        print(f"RF model loaded successfully ({time.time() - start_time:.2f}s)", file=sys.stderr)
-        
-        # Load TF-IDF vectorizer
-        tfidf = joblib.load(vectorizer_path)
-        print(f"TF-IDF vectorizer loaded successfully ({time.time() - start_time:.2f}s)", file=sys.stderr)
+        if bundle_exists(MODEL_BUNDLE_DIR):
+            models = load_bundle(MODEL_BUNDLE_DIR, verify=MODEL_BUNDLE_VERIFY,
+                                 vectorizer_cache_size=VECTORIZER_CACHE_SIZE)
+            models['class_story_points'] = class_story_points(models['inverse_mapping'],
+                                                              len(models['label_mapping']))
+            print(f"Model bundle {models['version']} loaded successfully ({time.time() - start_time:.2f}s)",
+                  file=sys.stderr)
+            return models
         
-        # Load DQN model
-        dqn_model = keras.models.load_model(dqn_model_path, compile=False)
-        dqn_model.compile(optimizer='adam', loss='mse')
+        return load_artifact_models(start_time)
+    except Exception as e:
+        print(f"Error loading models: {e}", file=sys.stderr)
+        raise ModelLoadError(f"Error loading models: {e}") from e
+
+def load_artifact_models(start_time=None):
+    """Load the models from the separate joblib/h5 artifact files"""
+    if start_time is None:
+        start_time = time.time()
+    
+    # Load Random Forest model
+    rf_model = joblib.load(model_file_path('rf_model.joblib'))
+    print(f"RF model loaded successfully ({time.time() - start_time:.2f}s)", file=sys.stderr)
+    
+    # Load TF-IDF vectorizer
+    tfidf = joblib.load(model_file_path('vectorizer.joblib'))
+    print(f"TF-IDF vectorizer loaded successfully ({time.time() - start_time:.2f}s)", file=sys.stderr)
+    
+    # Swap in the frozen vectorizer, which gives identical matrices for less CPU
+    if FROZEN_VECTORIZER:
+        try:
+            tfidf = FrozenTfidfVectorizer.from_sklearn(tfidf, VECTORIZER_CACHE_SIZE)
+        except ValueError as e:
+            print(f"Keeping the sklearn vectorizer: {e}", file=sys.stderr)
+    
+    # Load label mappings
+    label_mapping = joblib.load(model_file_path('label_mapping.joblib'))
+    inverse_mapping = joblib.load(model_file_path('inverse_mapping.joblib'))
+    num_classes = len(label_mapping)
+    print(f"Label mappings loaded successfully ({time.time() - start_time:.2f}s)", file=sys.stderr)
+    
+    # Load the precomputed DQN table, or build it from the DQN model.
+    # TensorFlow is only imported when the table has to be (re)built.
+    dqn_model = None
+    dqn_table = load_dqn_table(dqn_table_path, dqn_model_path, num_classes)
+    if dqn_table is None:
+        dqn_model = load_dqn_model(model_file_path('dqn_model.h5'))
         print(f"DQN model loaded successfully ({time.time() - start_time:.2f}s)", file=sys.stderr)
         
-        # Load label mappings
-        label_mapping = joblib.load(label_mapping_path)
-        inverse_mapping = joblib.load(inverse_mapping_path)
-        print(f"Label mappings loaded successfully ({time.time() - start_time:.2f}s)", file=sys.stderr)
-        
-        return {
-            'rf_model': rf_model,
-            'tfidf': tfidf,
-            'dqn_model': dqn_model,
-            'label_mapping': label_mapping,
-            'inverse_mapping': inverse_mapping
-        }
+        dqn_table = build_dqn_table(dqn_model, num_classes)
+        save_dqn_table(dqn_table, dqn_table_path)
+    print(f"DQN table ready ({time.time() - start_time:.2f}s)", file=sys.stderr)
+    
+    # Fingerprint the artifacts so cached predictions from other models are never reused
+    version = compute_model_version([rf_model_path, vectorizer_path, label_mapping_path,
+                                     inverse_mapping_path, dqn_model_path, dqn_table_path])
+    
+    return {
+        'version': version,
+        'rf_model': rf_model,
+        'tfidf': tfidf,
+        'dqn_model': dqn_model,
+        'dqn_table': dqn_table,
+        'label_mapping': label_mapping,
+        'inverse_mapping': inverse_mapping,
+        'class_story_points': class_story_points(inverse_mapping, num_classes)
+    }
+
+def build_dqn_table(dqn_model, num_classes):
+    """Precompute the DQN output for every possible RF class
+    
+    The DQN state is always the one-hot vector of the RF class, so there are
+    only num_classes distinct inputs. Running them all once lets inference
+    look up Q-values instead of calling the DQN.
+    
+    Returns:
+        Dictionary of arrays indexed by RF class
+    """
+    q_values = np.asarray(dqn_model.predict(np.eye(num_classes), verbose=0))
+    action = np.argmax(q_values, axis=1)
+    
+    return {
+        'q_values': q_values,
+        'raw_confidence': np.max(q_values, axis=1).astype(float),
+        'confidence': normalize_confidence_batch(q_values),
+        'action': action,
+        'full_adjustment': action - num_classes
+    }
+
+def save_dqn_table(dqn_table, path):
+    """Save the precomputed DQN table so later loads can skip the DQN"""
+    try:
+        np.savez(path, **dqn_table)
     except Exception as e:
-        print(f"Error loading models: {e}", file=sys.stderr)
-        sys.exit(1)
+        print(f"Error saving DQN table: {e}", file=sys.stderr)
+
+def load_dqn_table(path, dqn_model_path, num_classes):
+    """Load the precomputed DQN table if it is up to date with the DQN model
+    
+    Returns:
+        Dictionary of arrays indexed by RF class, or None if it must be rebuilt
+    """
+    if not os.path.exists(path):
+        return None
+    
+    # Rebuild when the DQN model was replaced after the table was written
+    if os.path.exists(dqn_model_path) and os.path.getmtime(dqn_model_path) > os.path.getmtime(path):
+        return None
+    
+    with np.load(path) as data:
+        dqn_table = {key: data[key] for key in data.files}
+    
+    if len(dqn_table.get('q_values', [])) != num_classes:
+        return None
+    return dqn_table
+
+def model_artifact_paths():
+    """Files that determine the loaded models, e.g. to reload when one changes"""
+    return [rf_model_path, vectorizer_path, label_mapping_path, inverse_mapping_path, dqn_model_path,
+            dqn_table_path, os.path.join(MODEL_BUNDLE_DIR, MANIFEST_FILENAME)]
+
+def compute_model_version(paths):
+    """Fingerprint model artifacts from their names, sizes and modification times"""
+    digest = hashlib.sha256()
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def get_prediction_cache():
+    """Get the prediction cache, or None when caching is disabled"""
+    global _PREDICTION_CACHE
+    if _PREDICTION_CACHE is None:
+        if PREDICTION_CACHE_SIZE <= 0 and not PREDICTION_CACHE_PATH:
+            return None
+        _PREDICTION_CACHE = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_PATH)
+    return _PREDICTION_CACHE
+
+def build_model_bundle(bundle_dir=None):
+    """Convert the separate artifact files into a memory-mappable bundle
+    
+    Args:
+        bundle_dir: Output directory (MODEL_BUNDLE_DIR if None)
+    
+    Returns:
+        Dictionary describing the written bundle
+    """
+    bundle_dir = bundle_dir or MODEL_BUNDLE_DIR
+    models = load_artifact_models()
+    
+    manifest = build_bundle(models, bundle_dir)
+    # Check the written files once here, so loads can skip the checksums
+    read_bundle(bundle_dir, verify=True)
+    size_bytes = sum(os.path.getsize(os.path.join(bundle_dir, entry['file']))
+                     for entry in manifest['arrays'].values())
+    print(f"Model bundle {manifest['bundle_id']} written to {bundle_dir}", file=sys.stderr)
+    
+    return {
+        'bundle_dir': bundle_dir,
+        'bundle_id': manifest['bundle_id'],
+        'arrays': len(manifest['arrays']),
+        'size_bytes': size_bytes
+    }
+
+def get_rf_model(models, engine=None):
+    """Get the random forest evaluator for an engine
+    
+    Args:
+        models: Dictionary containing loaded models
+        engine: 'sklearn' or 'array' (None uses RF_ENGINE)
+    
+    Returns:
+        Object with a predict(X) method
+    """
+    engine = engine or RF_ENGINE
+    if engine not in RF_ENGINES:
+        raise ValueError(f"Unknown RF engine: {engine} (expected one of {', '.join(RF_ENGINES)})")
+    
+    rf_model = models['rf_model']
+    if engine == 'array' and not isinstance(rf_model, ArrayForest):
+        # Flatten the sklearn forest once and keep it next to the models
+        if models.get('rf_array') is None:
+            models['rf_array'] = ArrayForest.from_sklearn(rf_model)
+        return models['rf_array']
+    return rf_model
 
 def get_models():
     """Get models from cache or load them if not cached"""
@@ -124,6 +383,34 @@ def preprocess_batch(texts, tfidf):
     X = tfidf.transform(cleaned_texts)
     return X
 
+def story_text(title, description):
+    """Combine title and description into the text that gets vectorized"""
+    return f"{title} {description}"
+
+def normalize_story_text(text, tfidf):
+    """Normalise story text for cache keys without changing what the vectorizer sees
+    
+    Whitespace runs are collapsed and case is folded only when the
+    vectorizer's own preprocessing would ignore those differences anyway.
+    """
+    analyzer = getattr(tfidf, 'analyzer', None)
+    if analyzer not in ('word', 'char_wb'):
+        return text
+    if getattr(tfidf, 'preprocessor', None) is not None or getattr(tfidf, 'tokenizer', None) is not None:
+        return text
+    
+    text = ' '.join(text.split())
+    if getattr(tfidf, 'lowercase', False):
+        text = text.lower()
+    return text
+
+def prediction_cache_key(text, models, dqn_influence, use_dynamic_influence):
+    """Cache key for a story, or None when predictions should not be cached"""
+    if models.get('version') is None:
+        return None
+    return make_cache_key(normalize_story_text(text, models['tfidf']), models['version'],
+                          dqn_influence, use_dynamic_influence)
+
 def map_to_valid_story_point(value):
     """Map any value to the closest valid story point"""
     if value in VALID_STORY_POINTS:
@@ -174,7 +461,89 @@ def calculate_dynamic_influence(confidence, base_influence=0.3):
     # Linear interpolation for values in between
     return base_influence
 
-def predict(title, description, models=None, dqn_influence=0.3, use_dynamic_influence=False):
+def normalize_confidence_batch(q_values):
+    """Vectorized normalize_confidence over each row of a Q-value matrix"""
+    q_min = np.min(q_values, axis=1)
+    q_max = np.max(q_values, axis=1)
+    
+    # Same boosting as normalize_confidence, applied to every row at once
+    q_range = q_max - q_min
+    relative_strength = q_range / (np.max(np.abs(q_values), axis=1) + 1e-10)
+    boosted_confidence = 0.5 + (relative_strength * 0.45)
+    separated_confidence = boosted_confidence + (relative_strength - 0.5) * 0.2
+    boosted_confidence = np.where(
+        relative_strength > 0.5,
+        np.minimum(0.95, separated_confidence.astype(float)),
+        boosted_confidence.astype(float)
+    )
+    
+    # Rows of identical values get the moderate-high default
+    return np.where(q_max == q_min, 0.7, boosted_confidence)
+
+def calculate_dynamic_influence_batch(confidence, base_influence=0.3):
+    """Vectorized calculate_dynamic_influence over an array of confidences"""
+    influence = np.full(np.shape(confidence), float(base_influence))
+    influence = np.where(confidence > 0.8, min(0.7, base_influence * 1.5), influence)
+    influence = np.where(confidence < 0.4, max(0.1, base_influence * 0.5), influence)
+    return influence
+
+def class_story_points(inverse_mapping, num_classes):
+    """Valid story point for every class index, as an integer array"""
+    return np.array([int(map_to_valid_story_point(inverse_mapping[i])) for i in range(num_classes)])
+
+def refine_predictions(rf_indices, models, dqn_influence=0.3, use_dynamic_influence=False):
+    """Apply the DQN adjustment to a batch of RF predictions using array operations
+    
+    Args:
+        rf_indices: Array of RF class indices, one per item
+        models: Dictionary containing loaded models
+        dqn_influence: Weight of DQN adjustment (0.0-1.0)
+        use_dynamic_influence: Whether to use confidence-based dynamic influence
+    
+    Returns:
+        Dictionary of per-item arrays with the same fields as predict(),
+        plus the adjusted class index
+    """
+    rf_indices = np.asarray(rf_indices, dtype=int)
+    dqn_table = models['dqn_table']
+    num_classes = len(models['label_mapping'])
+    
+    # Look up the DQN output for each RF class
+    raw_confidence = dqn_table['raw_confidence'][rf_indices]
+    normalized_confidence = dqn_table['confidence'][rf_indices]
+    full_adjustment = dqn_table['full_adjustment'][rf_indices]
+    
+    # Apply dynamic influence if enabled
+    if use_dynamic_influence:
+        influence = calculate_dynamic_influence_batch(normalized_confidence, dqn_influence)
+    else:
+        influence = np.full(len(rf_indices), float(dqn_influence))
+    
+    # Scale the adjustment by the influence factor (truncating like int())
+    actual_adjustment = np.where(
+        influence < 1.0,
+        np.trunc(full_adjustment * influence),
+        full_adjustment
+    ).astype(int)
+    
+    adjusted_indices = np.clip(rf_indices + actual_adjustment, 0, num_classes - 1)
+    
+    # Convert to valid story point values
+    story_points = models['class_story_points']
+    
+    return {
+        'rf_prediction': story_points[rf_indices],
+        'adjusted_prediction': story_points[adjusted_indices],
+        'confidence': normalized_confidence.astype(float),
+        'raw_confidence': raw_confidence.astype(float),
+        'full_adjustment': full_adjustment.astype(int),
+        'applied_adjustment': actual_adjustment,
+        'dqn_influence': influence.astype(float),
+        'adjusted_index': adjusted_indices
+    }
+
+def predict(title, description, models=None, dqn_influence=0.3, use_dynamic_influence=False, use_cache=True,
+            engine=None):
     """Make story point prediction with controlled DQN influence
     
     Args:
@@ -183,6 +552,8 @@ def predict(title, description, models=None, dqn_influence=0.3, use_dynamic_infl
         models: Dictionary containing loaded models (or None to use cached)
         dqn_influence: Weight of DQN adjustment (0.0-1.0)
         use_dynamic_influence: Whether to use confidence-based dynamic influence
+        use_cache: Whether to reuse cached results for identical stories
+        engine: Random forest engine, 'sklearn' or 'array' (None uses RF_ENGINE)
     
     Returns:
         Dictionary with prediction results
@@ -192,75 +563,96 @@ def predict(title, description, models=None, dqn_influence=0.3, use_dynamic_infl
         models = get_models()
     
     # Combine title and description
-    text = f"{title} {description}"
+    text = story_text(title, description)
+    
+    # Reuse the result of an identical earlier prediction
+    cache = get_prediction_cache() if use_cache else None
+    cache_key = prediction_cache_key(text, models, dqn_influence, use_dynamic_influence) if cache else None
+    if cache_key is not None:
+        cached = cache.get(cache_key)
+        CACHE_LOOKUPS.inc(result='hit' if cached is not None else 'miss')
+        if cached is not None:
+            return cached
     
     # Preprocess text
-    X = preprocess_text(text, models['tfidf'])
+    with STAGE_SECONDS.time(stage='vectorize'):
+        X = preprocess_text(text, models['tfidf'])
     
     # Initial prediction from Random Forest
-    rf_prediction = models['rf_model'].predict(X)[0]
-    rf_index = int(rf_prediction)
-    
-    # Refine prediction using DQN
-    num_classes = len(models['label_mapping'])
-    state = np.zeros(num_classes)
-    state[rf_index] = 1
+    with STAGE_SECONDS.time(stage='rf'):
+        rf_prediction = get_rf_model(models, engine).predict(X)[0]
+        rf_index = int(rf_prediction)
     
-    # Get Q-values
-    q_values = models['dqn_model'].predict(state.reshape(1, -1), verbose=0)[0]
+    # Refine prediction using the precomputed DQN table
+    with STAGE_SECONDS.time(stage='dqn'):
+        refined = refine_predictions([rf_index], models, dqn_influence, use_dynamic_influence)
     
-    # Calculate normalized confidence (0-1 scale)
-    raw_confidence = float(np.max(q_values))
-    normalized_confidence = normalize_confidence(q_values)
-    
-    # Choose best action
-    action = np.argmax(q_values)
-    
-    # Convert action to adjustment
-    full_adjustment = action - num_classes
+    with STAGE_SECONDS.time(stage='postprocess'):
+        rf_story_point = int(refined['rf_prediction'][0])
+        hybrid_story_point = int(refined['adjusted_prediction'][0])
+        normalized_confidence = float(refined['confidence'][0])
+        raw_confidence = float(refined['raw_confidence'][0])
+        full_adjustment = int(refined['full_adjustment'][0])
+        actual_adjustment = int(refined['applied_adjustment'][0])
+        adjusted_index = int(refined['adjusted_index'][0])
+        dqn_influence = float(refined['dqn_influence'][0])
+        
+        # Make sure everything is regular Python types, not numpy types
+        result = {
+            'rf_prediction': rf_story_point,
+            'adjusted_prediction': hybrid_story_point,
+            'confidence': normalized_confidence,
+            'raw_confidence': raw_confidence,
+            'full_adjustment': full_adjustment,
+            'applied_adjustment': actual_adjustment,
+            'dqn_influence': dqn_influence
+        }
+        record_predictions(refined, 'single')
     
-    # Apply dynamic influence if enabled
+    # Log predictions for debugging
+    logger.debug("RF index: %s, Story point: %s", rf_index, rf_story_point)
+    logger.debug("Adjusted index: %s, Story point: %s", adjusted_index, hybrid_story_point)
+    logger.debug("Adjustment: %s (full: %s)", actual_adjustment, full_adjustment)
+    logger.debug("Confidence: %.4f (raw: %.4f)", normalized_confidence, raw_confidence)
     if use_dynamic_influence:
-        dqn_influence = calculate_dynamic_influence(normalized_confidence, dqn_influence)
+        logger.debug("Dynamic influence: %.4f", dqn_influence)
     
-    # Apply controlled adjustment based on influence factor
-    if dqn_influence < 1.0:
-        # Scale the adjustment based on influence factor
-        actual_adjustment = int(full_adjustment * dqn_influence)
-    else:
-        actual_adjustment = full_adjustment
+    if cache_key is not None:
+        cache.put(cache_key, result)
     
-    adjusted_index = rf_index + actual_adjustment
-    adjusted_index = max(0, min(num_classes - 1, adjusted_index))
+    return result
+
+def predict_rf_indices(items, models, engine=None):
+    """Vectorize a batch of stories and return the RF class index for each
     
-    # Convert to original story point values
-    rf_story_point = models['inverse_mapping'][rf_index]
-    hybrid_story_point = models['inverse_mapping'][adjusted_index]
+    Args:
+        items: List of dictionaries with 'title' and 'description' keys
+        models: Dictionary containing loaded models
+        engine: Random forest engine, 'sklearn' or 'array' (None uses RF_ENGINE)
     
-    # Handle -1 values or other invalid story points
-    rf_story_point = map_to_valid_story_point(rf_story_point)
-    hybrid_story_point = map_to_valid_story_point(hybrid_story_point)
+    Returns:
+        Integer array of RF class indices
+    """
+    # Combine titles and descriptions
+    texts = [story_text(item.get('title', ''), item.get('description', '')) for item in items]
     
-    # Log predictions for debugging
-    print(f"RF index: {rf_index}, Story point: {rf_story_point}", file=sys.stderr)
-    print(f"Adjusted index: {adjusted_index}, Story point: {hybrid_story_point}", file=sys.stderr)
-    print(f"Adjustment: {actual_adjustment} (full: {full_adjustment})", file=sys.stderr)
-    print(f"Confidence: {normalized_confidence:.4f} (raw: {raw_confidence:.4f})", file=sys.stderr)
-    if use_dynamic_influence:
-        print(f"Dynamic influence: {dqn_influence:.4f}", file=sys.stderr)
+    # Vectorize all texts at once
+    with STAGE_SECONDS.time(stage='vectorize'):
+        X_batch = preprocess_batch(texts, models['tfidf'])
     
-    # Make sure everything is regular Python types, not numpy types
-    return {
-        'rf_prediction': int(rf_story_point),
-        'adjusted_prediction': int(hybrid_story_point),
-        'confidence': float(normalized_confidence),
-        'raw_confidence': float(raw_confidence),
-        'full_adjustment': int(full_adjustment),
-        'applied_adjustment': int(actual_adjustment),
-        'dqn_influence': float(dqn_influence)
-    }
+    # Make RF predictions for all items
+    with STAGE_SECONDS.time(stage='rf'):
+        rf_predictions = get_rf_model(models, engine).predict(X_batch)
+    return np.asarray(rf_predictions).astype(int)
+
+def record_predictions(refined, mode):
+    """Count refined predictions and record their confidence and adjustment"""
+    PREDICTIONS.inc(len(refined['confidence']), mode=mode)
+    CONFIDENCE.observe_many(refined['confidence'])
+    ADJUSTMENT.observe_many(refined['applied_adjustment'])
 
-def batch_predict(items, models=None, dqn_influence=0.3, use_dynamic_influence=False):
+def batch_predict(items, models=None, dqn_influence=0.3, use_dynamic_influence=False, use_cache=True,
+                  workers=None, engine=None):
     """Process multiple predictions in batch for efficiency
     
     Args:
@@ -268,6 +660,9 @@ def batch_predict(items, models=None, dqn_influence=0.3, use_dynamic_influence=F
         models: Dictionary containing loaded models (or None to use cached)
         dqn_influence: Weight of DQN adjustment (0.0-1.0)
         use_dynamic_influence: Whether to use confidence-based dynamic influence
+        use_cache: Whether to reuse cached results for identical stories
+        workers: Worker processes for large batches (None uses BATCH_WORKERS, 1 disables)
+        engine: Random forest engine, 'sklearn' or 'array' (None uses RF_ENGINE)
     
     Returns:
         List of prediction results
@@ -276,206 +671,374 @@ def batch_predict(items, models=None, dqn_influence=0.3, use_dynamic_influence=F
     if models is None:
         models = get_models()
     
-    # Extract titles and descriptions
-    titles = [item.get('title', '') for item in items]
-    descriptions = [item.get('description', '') for item in items]
+    if len(items) == 0:
+        return []
+    BATCH_SIZE.observe(len(items))
     
-    # Combine titles and descriptions
-    texts = [f"{title} {desc}" for title, desc in zip(titles, descriptions)]
+    cache = get_prediction_cache() if use_cache else None
+    if cache is None or models.get('version') is None:
+        return compute_predictions(items, models, dqn_influence, use_dynamic_influence, workers, engine)
     
-    # Vectorize all texts at once
-    X_batch = preprocess_batch(texts, models['tfidf'])
+    # Look every story up in the cache and group the misses by key, so
+    # stories repeated within the batch are only predicted once
+    results = [None] * len(items)
+    missing = {}
+    for i, item in enumerate(items):
+        text = story_text(item.get('title', ''), item.get('description', ''))
+        cache_key = prediction_cache_key(text, models, dqn_influence, use_dynamic_influence)
+        cached = cache.get(cache_key)
+        CACHE_LOOKUPS.inc(result='hit' if cached is not None else 'miss')
+        if cached is not None:
+            results[i] = cached
+        else:
+            missing.setdefault(cache_key, []).append(i)
     
-    # Make RF predictions for all items
-    rf_predictions = models['rf_model'].predict(X_batch)
+    if missing:
+        miss_items = [items[positions[0]] for positions in missing.values()]
+        miss_results = compute_predictions(miss_items, models, dqn_influence, use_dynamic_influence,
+                                           workers, engine)
+        for (cache_key, positions), result in zip(missing.items(), miss_results):
+            cache.put(cache_key, result)
+            for position in positions:
+                results[position] = dict(result)
     
+    return results
+
+def compute_predictions(items, models, dqn_influence=0.3, use_dynamic_influence=False, workers=None,
+                        engine=None):
+    """Run the pipeline on a batch, sharding it across worker processes when it is large"""
+    if workers is None:
+        workers = BATCH_WORKERS
+    
+    if workers > 1 and len(items) >= PARALLEL_BATCH_THRESHOLD:
+        return parallel_batch_predict(items, dqn_influence, use_dynamic_influence, workers, engine=engine)
+    return compute_batch_predictions(items, models, dqn_influence, use_dynamic_influence, engine)
+
+def init_batch_worker():
+    """Load the models once in each worker process"""
+    get_models()
+
+def predict_shard(items, dqn_influence, use_dynamic_influence, engine=None):
+    """Predict one shard of a parallel batch inside a worker process"""
+    return compute_batch_predictions(items, get_models(), dqn_influence, use_dynamic_influence, engine)
+
+def get_batch_pool(workers):
+    """Get the worker pool for parallel batches, recreating it if the size changed"""
+    global _BATCH_POOL, _BATCH_POOL_WORKERS
+    if _BATCH_POOL is None or _BATCH_POOL_WORKERS != workers:
+        from concurrent.futures import ProcessPoolExecutor
+        
+        if _BATCH_POOL is not None:
+            _BATCH_POOL.shutdown()
+        _BATCH_POOL = ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker)
+        _BATCH_POOL_WORKERS = workers
+    return _BATCH_POOL
+
+def parallel_batch_predict(items, dqn_influence=0.3, use_dynamic_influence=False, workers=None,
+                           chunk_size=None, engine=None):
+    """Predict a large batch by sharding it across a pool of worker processes
+    
+    Each worker loads the models once through get_models() and predicts
+    whole shards with the batch pipeline. Results come back in input order.
+    
+    Args:
+        items: List of dictionaries with 'title' and 'description' keys
+        dqn_influence: Weight of DQN adjustment (0.0-1.0)
+        use_dynamic_influence: Whether to use confidence-based dynamic influence
+        workers: Number of worker processes (None uses BATCH_WORKERS)
+        chunk_size: Stories per shard (None uses BATCH_CHUNK_SIZE)
+        engine: Random forest engine, 'sklearn' or 'array' (None uses RF_ENGINE)
+    
+    Returns:
+        List of prediction results
+    """
+    workers = workers or BATCH_WORKERS
+    chunk_size = chunk_size or BATCH_CHUNK_SIZE
+    
+    # Never make shards so large that some workers sit idle
+    chunk_size = max(1, min(chunk_size, -(-len(items) // workers)))
+    shards = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    
+    start_time = time.time()
+    pool = get_batch_pool(workers)
     results = []
-    for i, (rf_pred, title, desc) in enumerate(zip(rf_predictions, titles, descriptions)):
-        # Process each prediction individually using the RF prediction
-        rf_index = int(rf_pred)
+    for shard_results in pool.map(predict_shard, shards,
+                                  [dqn_influence] * len(shards),
+                                  [use_dynamic_influence] * len(shards),
+                                  [engine] * len(shards)):
+        results.extend(shard_results)
+    
+    # Workers keep their own metrics, so record the merged batch here
+    elapsed = time.time() - start_time
+    STAGE_SECONDS.observe(elapsed, stage='parallel_batch')
+    PREDICTIONS.inc(len(results), mode='parallel')
+    CONFIDENCE.observe_many([result['confidence'] for result in results])
+    ADJUSTMENT.observe_many([result['applied_adjustment'] for result in results])
+    
+    print(f"Processed {len(results)} items in {len(shards)} shards on {workers} workers "
+          f"({elapsed:.2f}s)", file=sys.stderr)
+    return results
+
+def compute_batch_predictions(items, models, dqn_influence=0.3, use_dynamic_influence=False, engine=None):
+    """Run the full prediction pipeline on a non-empty batch, bypassing the cache"""
+    # Initial class predictions from Random Forest
+    rf_indices = predict_rf_indices(items, models, engine)
+    
+    # Refine all predictions with the precomputed DQN table
+    with STAGE_SECONDS.time(stage='dqn'):
+        refined = refine_predictions(rf_indices, models, dqn_influence, use_dynamic_influence)
+    
+    # Create result objects
+    postprocess_start = time.perf_counter()
+    results = [
+        {
+            'rf_prediction': rf_point,
+            'adjusted_prediction': hybrid_point,
+            'confidence': confidence,
+            'raw_confidence': raw_confidence,
+            'full_adjustment': full_adjustment,
+            'applied_adjustment': applied_adjustment,
+            'dqn_influence': influence
+        }
+        for rf_point, hybrid_point, confidence, raw_confidence, full_adjustment, applied_adjustment, influence
+        in zip(refined['rf_prediction'].tolist(),
+               refined['adjusted_prediction'].tolist(),
+               refined['confidence'].tolist(),
+               refined['raw_confidence'].tolist(),
+               refined['full_adjustment'].tolist(),
+               refined['applied_adjustment'].tolist(),
+               refined['dqn_influence'].tolist())
+    ]
+    record_predictions(refined, 'batch')
+    STAGE_SECONDS.observe(time.perf_counter() - postprocess_start, stage='postprocess')
+    
+    logger.debug("Processed %s items", len(results))
+    
+    return results
+
+# Number of CSV rows validated per batch, keeps memory bounded on large files
+DEFAULT_VALIDATION_CHUNK_SIZE = 10000
+
+def iter_validation_chunks(test_data_path, chunk_size=DEFAULT_VALIDATION_CHUNK_SIZE):
+    """Stream labelled stories for validation in fixed-size chunks
+    
+    Args:
+        test_data_path: Path to CSV with 'title', 'storypoint' and optional 'description' columns
+        chunk_size: Number of rows to read per chunk
+    
+    Yields:
+        Tuple of (list of story dictionaries, array of actual story points) per chunk
+    """
+    import pandas as pd
+    
+    for test_data in pd.read_csv(test_data_path, chunksize=chunk_size):
+        # Prepare batch inputs
+        titles = test_data['title'].tolist()
+        if 'description' in test_data:
+            descriptions = test_data['description'].tolist()
+        else:
+            descriptions = [''] * len(titles)
+        items = [{'title': title, 'description': desc} for title, desc in zip(titles, descriptions)]
         
-        # Refine prediction using DQN (same as in predict function)
-        num_classes = len(models['label_mapping'])
-        state = np.zeros(num_classes)
-        state[rf_index] = 1
+        # Get actual story points
+        actual_points = np.array([map_to_valid_story_point(p) for p in test_data['storypoint']])
         
-        # Get Q-values
-        q_values = models['dqn_model'].predict(state.reshape(1, -1), verbose=0)[0]
+        yield items, actual_points
+
+class ValidationAccumulator:
+    """Validation metrics accumulated incrementally over batches of predictions
+    
+    Only running counts and sums are kept, so memory does not grow with the
+    number of validated stories.
+    """
+    
+    def __init__(self, dqn_influence=0.3, use_dynamic_influence=False):
+        self.dqn_influence = dqn_influence
+        self.use_dynamic_influence = use_dynamic_influence
         
-        # Calculate normalized confidence
-        raw_confidence = float(np.max(q_values))
-        normalized_confidence = normalize_confidence(q_values)
+        self.total = 0
+        self.rf_correct = 0
+        self.hybrid_correct = 0
+        self.rf_error_sum = 0.0
+        self.hybrid_error_sum = 0.0
+        self.rf_within_1 = 0
+        self.hybrid_within_1 = 0
+        self.rf_within_2 = 0
+        self.hybrid_within_2 = 0
+        self.improved = 0
+        self.worsened = 0
+        self.unchanged = 0
+        self.confidence_sum = 0.0
+        self.full_adjustment_sum = 0
+        self.applied_adjustment_sum = 0
+        self.influence_sum = 0.0
+        self.influence_min = None
+        self.influence_max = None
+    
+    def update(self, actual_points, refined):
+        """Add a batch of refined predictions and their actual story points"""
+        if len(actual_points) == 0:
+            return
         
-        # Choose best action
-        action = np.argmax(q_values)
+        rf_predictions = refined['rf_prediction']
+        hybrid_predictions = refined['adjusted_prediction']
         
-        # Convert action to adjustment
-        full_adjustment = action - num_classes
+        rf_errors = np.abs(rf_predictions - actual_points)
+        hybrid_errors = np.abs(hybrid_predictions - actual_points)
         
-        # Apply dynamic influence if enabled
-        current_influence = dqn_influence
-        if use_dynamic_influence:
-            current_influence = calculate_dynamic_influence(normalized_confidence, dqn_influence)
+        self.total += len(actual_points)
+        self.rf_correct += int(np.count_nonzero(rf_predictions == actual_points))
+        self.hybrid_correct += int(np.count_nonzero(hybrid_predictions == actual_points))
+        self.rf_error_sum += float(np.sum(rf_errors))
+        self.hybrid_error_sum += float(np.sum(hybrid_errors))
         
-        # Apply controlled adjustment based on influence factor
-        if current_influence < 1.0:
-            actual_adjustment = int(full_adjustment * current_influence)
-        else:
-            actual_adjustment = full_adjustment
+        # Accuracy within 1 and 2 points
+        self.rf_within_1 += int(np.count_nonzero(rf_errors <= 1))
+        self.hybrid_within_1 += int(np.count_nonzero(hybrid_errors <= 1))
+        self.rf_within_2 += int(np.count_nonzero(rf_errors <= 2))
+        self.hybrid_within_2 += int(np.count_nonzero(hybrid_errors <= 2))
         
-        adjusted_index = rf_index + actual_adjustment
-        adjusted_index = max(0, min(num_classes - 1, adjusted_index))
+        # Improvements and worsening
+        self.improved += int(np.count_nonzero(hybrid_errors < rf_errors))
+        self.worsened += int(np.count_nonzero(hybrid_errors > rf_errors))
+        self.unchanged += int(np.count_nonzero(hybrid_errors == rf_errors))
         
-        # Convert to original story point values
-        rf_story_point = models['inverse_mapping'][rf_index]
-        hybrid_story_point = models['inverse_mapping'][adjusted_index]
+        self.confidence_sum += float(np.sum(refined['confidence']))
+        self.full_adjustment_sum += int(np.sum(np.abs(refined['full_adjustment'])))
+        self.applied_adjustment_sum += int(np.sum(np.abs(refined['applied_adjustment'])))
         
-        # Handle -1 values or other invalid story points
-        rf_story_point = map_to_valid_story_point(rf_story_point)
-        hybrid_story_point = map_to_valid_story_point(hybrid_story_point)
+        influence_values = refined['dqn_influence']
+        self.influence_sum += float(np.sum(influence_values))
+        batch_min = float(np.min(influence_values))
+        batch_max = float(np.max(influence_values))
+        self.influence_min = batch_min if self.influence_min is None else min(self.influence_min, batch_min)
+        self.influence_max = batch_max if self.influence_max is None else max(self.influence_max, batch_max)
+    
+    def metrics(self):
+        """Build the validation metrics dictionary from the accumulated totals"""
+        total = self.total
+        if total == 0:
+            raise ValueError('No test data to validate')
         
-        # Create result object
-        result = {
-            'rf_prediction': int(rf_story_point),
-            'adjusted_prediction': int(hybrid_story_point),
-            'confidence': float(normalized_confidence),
-            'raw_confidence': float(raw_confidence),
-            'full_adjustment': int(full_adjustment),
-            'applied_adjustment': int(actual_adjustment),
-            'dqn_influence': float(current_influence)
+        rf_accuracy = self.rf_correct / total
+        hybrid_accuracy = self.hybrid_correct / total
+        rf_mae = self.rf_error_sum / total
+        hybrid_mae = self.hybrid_error_sum / total
+        
+        metrics = {
+            'rf_accuracy': float(rf_accuracy),
+            'hybrid_accuracy': float(hybrid_accuracy),
+            'accuracy_improvement': float(hybrid_accuracy - rf_accuracy),
+            'accuracy_improvement_percentage': float((hybrid_accuracy - rf_accuracy) / rf_accuracy * 100 if rf_accuracy > 0 else 0),
+            'rf_mae': float(rf_mae),
+            'hybrid_mae': float(hybrid_mae),
+            'mae_improvement': float(rf_mae - hybrid_mae),
+            'mae_improvement_percentage': float((rf_mae - hybrid_mae) / rf_mae * 100 if rf_mae > 0 else 0),
+            'rf_within_1': float(self.rf_within_1 / total),
+            'hybrid_within_1': float(self.hybrid_within_1 / total),
+            'rf_within_2': float(self.rf_within_2 / total),
+            'hybrid_within_2': float(self.hybrid_within_2 / total),
+            'stories_improved': int(self.improved),
+            'stories_worsened': int(self.worsened),
+            'stories_unchanged': int(self.unchanged),
+            'improvement_rate': float(self.improved / total),
+            'worsening_rate': float(self.worsened / total),
+            'total_stories': int(total),
+            'avg_confidence': float(self.confidence_sum / total),
+            'avg_full_adjustment': float(self.full_adjustment_sum / total),
+            'avg_applied_adjustment': float(self.applied_adjustment_sum / total),
+            'base_dqn_influence': float(self.dqn_influence),
+            'used_dynamic_influence': bool(self.use_dynamic_influence),
+            'dynamic_influence_used': bool(self.use_dynamic_influence)
         }
         
-        results.append(result)
+        if self.use_dynamic_influence:
+            metrics['avg_dynamic_influence'] = float(self.influence_sum / total)
+            metrics['min_dynamic_influence'] = float(self.influence_min)
+            metrics['max_dynamic_influence'] = float(self.influence_max)
         
-        # Log progress for large batches
-        if (i + 1) % 100 == 0:
-            print(f"Processed {i + 1} / {len(items)} items", file=sys.stderr)
-    
-    return results
+        return metrics
 
-def validate_model(test_data_path, dqn_influence=0.3, use_dynamic_influence=False):
+def validate_model(test_data_path, dqn_influence=0.3, use_dynamic_influence=False,
+                   chunk_size=DEFAULT_VALIDATION_CHUNK_SIZE, progress=None, lock=None):
     """Validate model accuracy on test data
     
+    The CSV is streamed in chunks of chunk_size rows. Each chunk is predicted
+    in batch and folded into running totals, so memory stays bounded
+    regardless of dataset size.
+    
     Args:
         test_data_path: Path to CSV with test data
         dqn_influence: Weight of DQN adjustment (0.0-1.0)
         use_dynamic_influence: Whether to use confidence-based dynamic influence
+        chunk_size: Number of rows to read and predict at a time
+        progress: Optional callback(rows) called after every chunk; raising from it stops the validation
+        lock: Optional model lock held while each chunk is predicted, but not while it is read
     
     Returns:
         Dictionary with validation metrics
     """
+    lock = lock if lock is not None else contextlib.nullcontext()
     try:
         start_time = time.time()
-        # Load test data
-        test_data = pd.read_csv(test_data_path)
-        print(f"Loaded test data with {len(test_data)} rows", file=sys.stderr)
         
         # Load models
         models = get_models()
         
-        # Track predictions and actual values
-        rf_predictions = []
-        hybrid_predictions = []
-        actual_points = []
-        confidence_values = []
-        full_adjustments = []
-        applied_adjustments = []
-        influence_values = [] # Track dynamic influence values if used
-        
-        # Prepare batch inputs
-        items = [
-            {'title': row['title'], 'description': row.get('description', '')}
-            for _, row in test_data.iterrows()
-        ]
-        
-        # Get actual story points
-        actual_points = [map_to_valid_story_point(p) for p in test_data['storypoint']]
-        
-        # Perform batch prediction
-        batch_results = batch_predict(items, models, dqn_influence, use_dynamic_influence)
-        
-        # Extract prediction results
-        for result in batch_results:
-            rf_predictions.append(result['rf_prediction'])
-            hybrid_predictions.append(result['adjusted_prediction'])
-            confidence_values.append(result['confidence'])
-            full_adjustments.append(result['full_adjustment'])
-            applied_adjustments.append(result['applied_adjustment'])
-            influence_values.append(result['dqn_influence'])
-        
-        # Calculate metrics
-        rf_accuracy = accuracy_score(actual_points, rf_predictions)
-        hybrid_accuracy = accuracy_score(actual_points, hybrid_predictions)
-        
-        rf_mae = mean_absolute_error(actual_points, rf_predictions)
-        hybrid_mae = mean_absolute_error(actual_points, hybrid_predictions)
-        
-        # Calculate accuracy within 1 and 2 points
-        rf_within_1 = sum(abs(p - a) <= 1 for p, a in zip(rf_predictions, actual_points)) / len(actual_points)
-        hybrid_within_1 = sum(abs(p - a) <= 1 for p, a in zip(hybrid_predictions, actual_points)) / len(actual_points)
-        
-        rf_within_2 = sum(abs(p - a) <= 2 for p, a in zip(rf_predictions, actual_points)) / len(actual_points)
-        hybrid_within_2 = sum(abs(p - a) <= 2 for p, a in zip(hybrid_predictions, actual_points)) / len(actual_points)
-        
-        # Count improvements and worsening
-        improved = sum(1 for rf, hyb, act in zip(rf_predictions, hybrid_predictions, actual_points) 
-                      if abs(hyb - act) < abs(rf - act))
-        worsened = sum(1 for rf, hyb, act in zip(rf_predictions, hybrid_predictions, actual_points) 
-                      if abs(hyb - act) > abs(rf - act))
-        unchanged = sum(1 for rf, hyb, act in zip(rf_predictions, hybrid_predictions, actual_points) 
-                       if abs(hyb - act) == abs(rf - act))
-        
-        # Metrics to return
-        metrics = {
-            'rf_accuracy': float(rf_accuracy),
-            'hybrid_accuracy': float(hybrid_accuracy),
-            'accuracy_improvement': float(hybrid_accuracy - rf_accuracy),
-            'accuracy_improvement_percentage': float((hybrid_accuracy - rf_accuracy) / rf_accuracy * 100 if rf_accuracy > 0 else 0),
-            'rf_mae': float(rf_mae),
-            'hybrid_mae': float(hybrid_mae),
-            'mae_improvement': float(rf_mae - hybrid_mae),
-            'mae_improvement_percentage': float((rf_mae - hybrid_mae) / rf_mae * 100 if rf_mae > 0 else 0),
-            'rf_within_1': float(rf_within_1),
-            'hybrid_within_1': float(hybrid_within_1),
-            'rf_within_2': float(rf_within_2),
-            'hybrid_within_2': float(hybrid_within_2),
-            'stories_improved': int(improved),
-            'stories_worsened': int(worsened),
-            'stories_unchanged': int(unchanged),
-            'improvement_rate': float(improved / len(actual_points)),
-            'worsening_rate': float(worsened / len(actual_points)),
-            'total_stories': int(len(actual_points)),
-            'avg_confidence': float(sum(confidence_values) / len(confidence_values)),
-            'avg_full_adjustment': float(sum(abs(adj) for adj in full_adjustments) / len(full_adjustments)),
-            'avg_applied_adjustment': float(sum(abs(adj) for adj in applied_adjustments) / len(applied_adjustments)),
-            'base_dqn_influence': float(dqn_influence),
-            'used_dynamic_influence': bool(use_dynamic_influence),
-            'dynamic_influence_used': bool(use_dynamic_influence),
-            'execution_time_seconds': float(time.time() - start_time)
-        }
-        
-        if use_dynamic_influence:
-            metrics['avg_dynamic_influence'] = float(sum(influence_values) / len(influence_values))
-            metrics['min_dynamic_influence'] = float(min(influence_values))
-            metrics['max_dynamic_influence'] = float(max(influence_values))
+        accumulator = ValidationAccumulator(dqn_influence, use_dynamic_influence)
+        for items, actual_points in iter_validation_chunks(test_data_path, chunk_size):
+            # Perform batch prediction on the chunk
+            with lock:
+                rf_indices = predict_rf_indices(items, models)
+                refined = refine_predictions(rf_indices, models, dqn_influence, use_dynamic_influence)
+            accumulator.update(actual_points, refined)
+            print(f"Validated {accumulator.total} rows", file=sys.stderr)
+            if progress is not None:
+                progress(accumulator.total)
         
+        metrics = accumulator.metrics()
+        metrics['execution_time_seconds'] = float(time.time() - start_time)
         return metrics
         
     except Exception as e:
         print(f"Validation error: {e}", file=sys.stderr)
         return {'error': str(e)}
 
-def find_optimal_influence(test_data_path, influence_values=None, use_dynamic_influence=False):
+def parse_influence_values(spec):
+    """Parse influence values given as 'a,b,c' or as an inclusive 'start:stop:step' grid"""
+    if ':' in spec:
+        start, stop, step = (float(part) for part in spec.split(':'))
+        if step <= 0:
+            raise ValueError('Influence grid step must be positive')
+        if start > stop:
+            raise ValueError('Influence grid start must not be greater than its stop')
+        # Never step past the inclusive stop; the epsilon keeps e.g. 0:1:0.1 at 11 values
+        count = int(np.floor((stop - start) / step + 1e-9)) + 1
+        # Round to hide floating point noise such as 0.30000000000000004
+        return [round(start + i * step, 10) for i in range(count)]
+    return [float(val) for val in spec.split(',')]
+
+def find_optimal_influence(test_data_path, influence_values=None, use_dynamic_influence=False,
+                           chunk_size=DEFAULT_VALIDATION_CHUNK_SIZE, progress=None, lock=None):
     """Find the optimal DQN influence value
     
+    The test data is streamed once and each chunk is run through the RF and
+    the DQN table only once. Every candidate influence then only re-applies
+    the adjustment scaling to the chunk, so a fine-grained grid costs about
+    as much as a single validation.
+    
     Args:
         test_data_path: Path to CSV with test data
         influence_values: List of influence values to test (default set of values if None)
         use_dynamic_influence: Whether to use confidence-based dynamic influence
+        chunk_size: Number of rows to read and predict at a time
+        progress: Optional callback(rows) called after every chunk; raising from it stops the search
+        lock: Optional model lock held while each chunk is predicted, but not while it is read
     
     Returns:
         Dictionary with optimal influence results
     """
+    lock = lock if lock is not None else contextlib.nullcontext()
     if influence_values is None:
         influence_values = [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.7, 1.0]
     
@@ -486,10 +1049,37 @@ def find_optimal_influence(test_data_path, influence_values=None, use_dynamic_in
     print("\nFinding optimal DQN influence value...", file=sys.stderr)
     overall_start = time.time()
     
-    for influence in influence_values:
-        print(f"\nTesting DQN influence: {influence:.1f}", file=sys.stderr)
-        test_start = time.time()
-        metrics = validate_model(test_data_path, influence, use_dynamic_influence)
+    accumulators = [ValidationAccumulator(influence, use_dynamic_influence) for influence in influence_values]
+    try:
+        if not influence_values:
+            raise ValueError('No influence values to compare')
+        
+        # Shared work: stream the data and run the RF once for every influence value
+        models = get_models()
+        total_rows = 0
+        for items, actual_points in iter_validation_chunks(test_data_path, chunk_size):
+            with lock:
+                rf_indices = predict_rf_indices(items, models)
+                refined_by_influence = [refine_predictions(rf_indices, models, influence, use_dynamic_influence)
+                                        for influence in influence_values]
+            for accumulator, refined in zip(accumulators, refined_by_influence):
+                accumulator.update(actual_points, refined)
+            total_rows += len(items)
+            print(f"Evaluated {total_rows} rows", file=sys.stderr)
+            if progress is not None:
+                progress(total_rows)
+        
+        if total_rows == 0:
+            raise ValueError('No test data to validate')
+    except Exception as e:
+        print(f"Validation error: {e}", file=sys.stderr)
+        return {'error': str(e)}
+    
+    # All influence values share one pass over the data, so there is no per-value run to time
+    shared_pass_time = time.time() - overall_start
+    
+    for influence, accumulator in zip(influence_values, accumulators):
+        metrics = accumulator.metrics()
         
         result = {
             'influence': influence,
@@ -499,23 +1089,20 @@ def find_optimal_influence(test_data_path, influence_values=None, use_dynamic_in
             'improvement_percentage': metrics['accuracy_improvement_percentage'],
             'improved_stories': metrics['stories_improved'],
             'worsened_stories': metrics['stories_worsened'],
-            'unchanged_stories': metrics['stories_unchanged'],
-            'execution_time_seconds': metrics['execution_time_seconds']
+            'unchanged_stories': metrics['stories_unchanged']
         }
         results.append(result)
         
-        print(f"DQN Influence: {influence:.1f}", file=sys.stderr)
-        print(f"Hybrid Accuracy: {metrics['hybrid_accuracy']:.4f}", file=sys.stderr)
-        print(f"RF Accuracy: {metrics['rf_accuracy']:.4f}", file=sys.stderr)
-        print(f"Improvement: {metrics['accuracy_improvement']:.4f} ({metrics['accuracy_improvement_percentage']:.2f}%)", file=sys.stderr)
-        print(f"Time taken: {time.time() - test_start:.2f} seconds", file=sys.stderr)
+        print(f"DQN Influence: {influence:.2f} | Hybrid Accuracy: {metrics['hybrid_accuracy']:.4f} | "
+              f"Improvement: {metrics['accuracy_improvement']:.4f} ({metrics['accuracy_improvement_percentage']:.2f}%)",
+              file=sys.stderr)
         
         if metrics['hybrid_accuracy'] > best_accuracy:
             best_accuracy = metrics['hybrid_accuracy']
             best_influence = influence
     
     total_time = time.time() - overall_start
-    print(f"\nBest DQN influence: {best_influence:.1f} with accuracy: {best_accuracy:.4f}", file=sys.stderr)
+    print(f"\nBest DQN influence: {best_influence:.2f} with accuracy: {best_accuracy:.4f}", file=sys.stderr)
     print(f"Total optimization time: {total_time:.2f} seconds", file=sys.stderr)
     
     return {
@@ -523,37 +1110,523 @@ def find_optimal_influence(test_data_path, influence_values=None, use_dynamic_in
         'best_accuracy': float(best_accuracy),
         'results': results,
         'dynamic_influence_used': bool(use_dynamic_influence),
-        'total_execution_time_seconds': float(total_time)
+        'total_execution_time_seconds': float(total_time),
+        'shared_pass_seconds': float(shared_pass_time),
+        'amortized_seconds_per_influence': float(shared_pass_time / len(influence_values))
     }
 
+def get_prediction_log_writer(log_dir="prediction_logs"):
+    """Get the background log writer for a log directory, starting it on first use"""
+    writer = _PREDICTION_LOG_WRITERS.get(log_dir)
+    if writer is None:
+        writer = PredictionLogWriter(log_dir, PREDICTION_LOG_FORMAT, PREDICTION_LOG_QUEUE_SIZE,
+                                     flush_interval=PREDICTION_LOG_FLUSH_INTERVAL)
+        _PREDICTION_LOG_WRITERS[log_dir] = writer
+    return writer
+
+def close_prediction_logs():
+    """Drain and close every prediction log writer
+
+    atexit does this for scripts; processes that end without running atexit
+    handlers (such as multiprocessing workers) call it before exiting.
+    """
+    for writer in list(_PREDICTION_LOG_WRITERS.values()):
+        writer.close()
+
 def log_prediction(prediction_data, log_dir="prediction_logs"):
-    """Log predictions to a file for monitoring model performance over time"""
+    """Log predictions to a file for monitoring model performance over time
+    
+    The record is timestamped and queued; a background thread appends it to
+    the daily log file, so logging does not add file I/O to the prediction.
+    """
     try:
-        # Create log directory if it doesn't exist
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
+        get_prediction_log_writer(log_dir).write(prediction_data)
+    except Exception as e:
+        print(f"Error logging prediction: {e}", file=sys.stderr)
+
+def prediction_logging_enabled():
+    """Check whether predictions should be logged for monitoring"""
+    return os.environ.get('ENABLE_PREDICTION_LOGGING', 'false').lower() == 'true'
+
+def run_prediction(input_json, models=None, dqn_influence=0.3, use_dynamic_influence=False, workers=None,
+                   engine=None, batcher=None):
+    """Run a single or batch prediction and return serializable results
+    
+    Args:
+        input_json: Dictionary with 'title'/'description' or a list of them
+        models: Dictionary containing loaded models (or None to use cached)
+        dqn_influence: Weight of DQN adjustment (0.0-1.0)
+        use_dynamic_influence: Whether to use confidence-based dynamic influence
+        workers: Worker processes for large batches (None uses BATCH_WORKERS)
+        engine: Random forest engine, 'sklearn' or 'array' (None uses RF_ENGINE)
+        batcher: Optional MicroBatcher that single predictions are combined by
+    
+    Returns:
+        Prediction result dictionary, or a list of them for batch input
+    """
+    if models is None:
+        models = get_models()
+    
+    if isinstance(input_json, list):
+        # Batch prediction
+        results = batch_predict(input_json, models, dqn_influence, use_dynamic_influence, workers=workers,
+                                engine=engine)
         
-        # Create log filename based on date
-        date_str = datetime.now().strftime("%Y-%m-%d")
-        log_file = os.path.join(log_dir, f"predictions_{date_str}.jsonl")
+        # Convert to serializable format and log predictions
+        serializable_results = []
+        for result in results:
+            # Log prediction for monitoring
+            if prediction_logging_enabled():
+                log_prediction(result)
+            
+            # Convert to serializable format
+            serializable_result = convert_to_serializable(result)
+            serializable_results.append(serializable_result)
         
-        # Add timestamp to prediction data
-        prediction_data['timestamp'] = datetime.now().isoformat()
+        return serializable_results
+    
+    # Single prediction
+    title = input_json.get('title', '')
+    description = input_json.get('description', '')
+    if batcher is not None:
+        # Predicted in one batch with the single predictions of concurrent requests
+        result = batcher.submit((dqn_influence, use_dynamic_influence, engine),
+                                {'title': title, 'description': description})
+    else:
+        result = predict(title, description, models, dqn_influence, use_dynamic_influence, engine=engine)
+    
+    # Log prediction for monitoring
+    if prediction_logging_enabled():
+        log_prediction({
+            'title': title,
+            'description': description,
+            **result
+        })
+    
+    # Convert to serializable format
+    return convert_to_serializable(result)
+
+def run_incremental_prediction(input_json, manifest=None, manifest_path=None, models=None, dqn_influence=0.3,
+                               use_dynamic_influence=False, workers=None, engine=None, id_field='id', prune=False):
+    """Run a batch prediction that only recomputes new or changed stories
+    
+    Results are reused from a prior manifest keyed by story id and content
+    hash, as long as it was built by the same model version with the same
+    DQN parameters.
+    
+    Args:
+        input_json: List of dictionaries with id_field, 'title' and 'description'
+        manifest: Prior manifest returned by an earlier run (ignored with manifest_path)
+        manifest_path: Manifest file to read and update in place
+        models: Dictionary containing loaded models (or None to use cached)
+        dqn_influence: Weight of DQN adjustment (0.0-1.0)
+        use_dynamic_influence: Whether to use confidence-based dynamic influence
+        workers: Worker processes for large batches (None uses BATCH_WORKERS)
+        engine: Random forest engine, 'sklearn' or 'array' (None uses RF_ENGINE)
+        id_field: Key of the story id in each item
+        prune: Whether to drop manifest entries for stories missing from the input
+    
+    Returns:
+        Dictionary with the merged 'results', 'stats' and, without manifest_path,
+        the updated 'manifest'
+    """
+    if models is None:
+        models = get_models()
+    if not isinstance(input_json, list):
+        raise ValueError("Incremental prediction expects a list of stories")
+    
+    def predict_changed(items):
+        # Only the recomputed stories are logged, reused ones were logged when first predicted
+        return run_prediction(items, models, dqn_influence, use_dynamic_influence, workers, engine)
+    
+    if manifest_path:
+        results, stats = incremental_predict_file(input_json, manifest_path, predict_changed, story_text,
+                                                  models.get('version'), dqn_influence, use_dynamic_influence,
+                                                  id_field, prune)
+        return {'results': results, 'stats': stats}
+    
+    results, manifest, stats = incremental_predict(input_json, manifest, predict_changed, story_text,
+                                                   models.get('version'), dqn_influence, use_dynamic_influence,
+                                                   id_field, prune)
+    return {'results': results, 'stats': stats, 'manifest': manifest}
+
+def export_metrics(fmt='json'):
+    """Export the pipeline metrics
+    
+    Args:
+        fmt: 'json' for a snapshot dictionary or 'prometheus' for the text format
+    
+    Returns:
+        Snapshot dictionary, or a dictionary with the Prometheus text
+    """
+    cache = get_prediction_cache()
+    if cache is not None:
+        CACHE_ENTRIES.set(cache.stats()['size'])
+    
+    if fmt == 'prometheus':
+        return {'content_type': 'text/plain; version=0.0.4', 'text': REGISTRY.to_prometheus()}
+    if fmt == 'json':
+        return REGISTRY.snapshot()
+    raise ValueError(f"Unknown metrics format: {fmt}")
+
+class ServerShutdown(Exception):
+    """Raised by handle_request when a client asks the server to stop"""
+
+def make_micro_batcher(models, lock=None):
+    """Micro-batcher for the server's single-story predictions, or None when disabled
+    
+    Args:
+        models: Dictionary containing loaded models
+        lock: Lock held while a batch runs, shared with the server's other requests
+    """
+    if MICRO_BATCH_WINDOW_MS <= 0 or MICRO_BATCH_MAX_SIZE <= 1:
+        return None
+    
+    def predict_micro_batch(params, items):
+        dqn_influence, use_dynamic_influence, engine = params
+        if len(items) == 1:
+            # A request that found no company takes the single-story path
+            return [predict(items[0]['title'], items[0]['description'], models, dqn_influence,
+                            use_dynamic_influence, engine=engine)]
+        return batch_predict(items, models, dqn_influence, use_dynamic_influence, workers=1, engine=engine)
+    
+    return MicroBatcher(predict_micro_batch, MICRO_BATCH_WINDOW_MS / 1000, MICRO_BATCH_MAX_SIZE, lock)
+
+def uses_micro_batcher(request, batcher):
+    """Whether a request is a single-story prediction that the micro-batcher handles"""
+    return (batcher is not None and request.get('type', 'predict') in ('predict', 'batch')
+            and isinstance(request.get('input'), dict))
+
+def handle_request(request, models=None, batcher=None, progress=None, lock=None):
+    """Handle one server request
+    
+    Supported request types:
+        predict/batch: {"input": {...} or [...], "dqn_influence": 0.3, "dynamic": false, "workers": 4,
+                        "engine": "array"}
+        incremental: {"input": [...], "manifest": {...} or "manifest_path": "...", "id_field": "id",
+                      "prune": false, "dqn_influence": 0.3, "dynamic": false}
+        validate: {"test_data_path": "...", "dqn_influence": 0.3, "dynamic": false, "chunk_size": 10000}
+        find_optimal: {"test_data_path": "...", "influence_values": [...] or "0:1:0.01", "dynamic": false, "chunk_size": 10000}
+        ping: health check
+        stats: model version and prediction cache hit/miss counters
+        metrics: pipeline metrics, {"format": "json"} (default) or {"format": "prometheus"}
+        shutdown: stop the server
+    
+    Single-story predictions go through batcher when one is given, and
+    progress and lock are passed on to validate and find_optimal, which
+    hold the lock around each chunk's inference.
+    
+    Returns:
+        JSON-serializable result for the request
+    """
+    if models is None:
+        models = get_models()
+    
+    request_type = request.get('type', 'predict')
+    dqn_influence = float(request.get('dqn_influence', 0.3))
+    use_dynamic_influence = bool(request.get('dynamic', False))
+    
+    if request_type in ('predict', 'batch'):
+        if 'input' not in request:
+            raise ValueError("Missing 'input' for prediction request")
+        workers = request.get('workers')
+        return run_prediction(request['input'], models, dqn_influence, use_dynamic_influence,
+                              int(workers) if workers is not None else None, request.get('engine'), batcher)
+    elif request_type == 'incremental':
+        if 'input' not in request:
+            raise ValueError("Missing 'input' for incremental request")
+        workers = request.get('workers')
+        return run_incremental_prediction(request['input'], request.get('manifest'), request.get('manifest_path'),
+                                          models, dqn_influence, use_dynamic_influence,
+                                          int(workers) if workers is not None else None, request.get('engine'),
+                                          request.get('id_field', 'id'), bool(request.get('prune', False)))
+    elif request_type == 'validate':
+        chunk_size = int(request.get('chunk_size', DEFAULT_VALIDATION_CHUNK_SIZE))
+        metrics = validate_model(request['test_data_path'], dqn_influence, use_dynamic_influence, chunk_size,
+                                 progress, lock)
+        return convert_to_serializable(metrics)
+    elif request_type == 'find_optimal':
+        influence_values = request.get('influence_values')
+        if isinstance(influence_values, str):
+            influence_values = parse_influence_values(influence_values)
+        chunk_size = int(request.get('chunk_size', DEFAULT_VALIDATION_CHUNK_SIZE))
+        optimal = find_optimal_influence(request['test_data_path'], influence_values, use_dynamic_influence, chunk_size,
+                                         progress, lock)
+        return convert_to_serializable(optimal)
+    elif request_type == 'ping':
+        return {'status': 'ok'}
+    elif request_type == 'stats':
+        cache = get_prediction_cache()
+        return {'model_version': models.get('version'),
+                'prediction_cache': cache.stats() if cache is not None else None,
+                'prediction_logs': [writer.stats() for writer in _PREDICTION_LOG_WRITERS.values()],
+                'micro_batching': batcher.stats() if batcher is not None else None}
+    elif request_type == 'metrics':
+        return export_metrics(request.get('format', 'json'))
+    elif request_type == 'shutdown':
+        raise ServerShutdown()
+    
+    raise ValueError(f"Unknown request type: {request_type}")
+
+def handle_request_line(line, models, lock=None, batcher=None):
+    """Decode one NDJSON request line and build the response line
+    
+    Single-story predictions go through batcher, which takes the lock itself
+    while it runs a batch; every other request is handled under the lock.
+    
+    Returns:
+        Tuple of (response JSON string, whether the server should stop)
+    """
+    request_id = None
+    request_type = 'invalid'
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError('Request must be a JSON object')
+        request_id = request.get('id')
+        request_type = request.get('type', 'predict')
         
-        # Append to log file
-        with open(log_file, 'a') as f:
-            f.write(json.dumps(prediction_data) + '\n')
-            
+        if lock is not None and not uses_micro_batcher(request, batcher):
+            with lock:
+                result = handle_request(request, models, batcher)
+        else:
+            result = handle_request(request, models, batcher)
+        
+        response = {'id': request_id, 'result': result}
+        stop = False
+    except ServerShutdown:
+        response = {'id': request_id, 'result': {'status': 'shutting down'}}
+        stop = True
     except Exception as e:
-        print(f"Error logging prediction: {e}", file=sys.stderr)
+        print(f"Failed to process request: {e}", file=sys.stderr)
+        ERRORS.inc(type=request_type)
+        response = {'id': request_id, 'error': f"Failed to process input: {str(e)}"}
+        stop = False
+    
+    with STAGE_SECONDS.time(stage='serialize'):
+        response_line = json.dumps(response)
+    return response_line, stop
+
+def serve_stream(instream, outstream, models):
+    """Answer newline-delimited JSON requests until EOF or shutdown
+    
+    With micro-batching enabled, single-story predictions are answered by a
+    thread pool so that requests written back to back can share a batch;
+    their responses can overtake each other and are matched by id. Other
+    requests are answered one at a time as they are read.
+    """
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    
+    lock = threading.Lock()
+    batcher = make_micro_batcher(models, lock)
+    if batcher is None:
+        for line in instream:
+            line = line.strip()
+            if not line:
+                continue
+            
+            response, stop = handle_request_line(line, models)
+            outstream.write(response + '\n')
+            outstream.flush()
+            
+            if stop:
+                break
+        return
+    
+    write_lock = threading.Lock()
+    
+    def answer(line):
+        response, stop = handle_request_line(line, models, lock, batcher)
+        with write_lock:
+            outstream.write(response + '\n')
+            outstream.flush()
+        return stop
+    
+    with ThreadPoolExecutor(max_workers=MICRO_BATCH_MAX_SIZE) as executor:
+        for line in instream:
+            line = line.strip()
+            if not line:
+                continue
+            
+            try:
+                request = json.loads(line)
+            except ValueError:
+                request = None
+            if isinstance(request, dict) and uses_micro_batcher(request, batcher):
+                executor.submit(answer, line)
+            elif answer(line):
+                break
+
+def serve_unix_socket(socket_path, models):
+    """Answer newline-delimited JSON requests on a Unix domain socket"""
+    import socketserver
+    import threading
+    
+    # Model inference is not guaranteed to be thread-safe, so requests
+    # from concurrent connections are answered one at a time, except that
+    # concurrent single-story predictions are combined into one batch
+    lock = threading.Lock()
+    batcher = make_micro_batcher(models, lock)
+    
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw_line in self.rfile:
+                line = raw_line.decode('utf-8').strip()
+                if not line:
+                    continue
+                
+                response, stop = handle_request_line(line, models, lock, batcher)
+                self.wfile.write((response + '\n').encode('utf-8'))
+                self.wfile.flush()
+                
+                if stop:
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    break
+    
+    # Remove a stale socket left behind by a previous run
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    
+    server = socketserver.ThreadingUnixStreamServer(socket_path, RequestHandler)
+    server.daemon_threads = True
+    print(f"Estimator server listening on {socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+def serve(socket_path=None):
+    """Run the persistent estimation server
+    
+    Models are loaded once at startup and reused for every request. Requests
+    are read as newline-delimited JSON from stdin (or a Unix socket when
+    socket_path is given) and each response is written as one JSON line.
+    """
+    import signal
+    
+    # Exit normally on SIGTERM so atexit handlers flush queued prediction logs
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
+    start_time = time.time()
+    models = get_models()
+    print(f"Estimator server ready ({time.time() - start_time:.2f}s)", file=sys.stderr)
+    
+    if socket_path:
+        serve_unix_socket(socket_path, models)
+        return
+    
+    # Announce readiness so clients know the models are loaded
+    sys.stdout.write(json.dumps({'event': 'ready'}) + '\n')
+    sys.stdout.flush()
+    serve_stream(sys.stdin, sys.stdout, models)
+
+def pop_option(args, name, default=None):
+    """Remove a '--name value' pair from an argument list and return the value"""
+    if name in args:
+        index = args.index(name)
+        if index + 1 >= len(args):
+            raise ValueError(f"Missing value for {name}")
+        value = args[index + 1]
+        del args[index:index + 2]
+        return value
+    return default
 
 def main():
     """Main function to handle input and output"""
+    global RF_ENGINE
+    
+    try:
+        # Optional chunk size for --validate and --find-optimal
+        chunk_size = int(pop_option(sys.argv, '--chunk-size', DEFAULT_VALIDATION_CHUNK_SIZE))
+        
+        # Optional worker process count for large batches
+        workers = pop_option(sys.argv, '--workers')
+        workers = int(workers) if workers is not None else None
+        
+        # Optional random forest engine for every mode
+        RF_ENGINE = pop_option(sys.argv, '--engine', RF_ENGINE)
+    except ValueError as e:
+        # Bad option values get the same JSON error as every other failure
+        print(f"Failed to process input: {str(e)}", file=sys.stderr)
+        print(json.dumps({
+            'error': f"Failed to process input: {str(e)}"
+        }))
+        sys.exit(1)
+    
     # Parse command line arguments
     if len(sys.argv) > 1:
         try:
             # Check if it's a special command
-            if sys.argv[1] == '--validate' and len(sys.argv) > 2:
+            if sys.argv[1] == '--serve':
+                # Persistent server mode, optionally on a Unix socket
+                socket_path = None
+                if len(sys.argv) > 3 and sys.argv[2] == '--socket':
+                    socket_path = sys.argv[3]
+                serve(socket_path)
+                return
+            
+            elif sys.argv[1] == '--serve-async':
+                # asyncio server with deadlines, cancellation and background jobs
+                import async_server
+                socket_path = None
+                if len(sys.argv) > 3 and sys.argv[2] == '--socket':
+                    socket_path = sys.argv[3]
+                async_server.serve(sys.modules[__name__], socket_path)
+                return
+            
+            elif sys.argv[1] == '--build-bundle':
+                # Convert the separate artifacts into a single bundle
+                bundle_dir = sys.argv[2] if len(sys.argv) > 2 else None
+                print(json.dumps(build_model_bundle(bundle_dir)))
+                return
+            
+            elif sys.argv[1] == '--bench':
+                # Benchmark suite, uses stub models when the artifacts are missing
+                import bench
+                iterations = int(pop_option(sys.argv, '--iterations', bench.DEFAULT_ITERATIONS))
+                use_stub = len(sys.argv) > 2 and sys.argv[2].lower() == 'stub'
+                results = bench.run_benchmark(sys.modules[__name__], use_stub, iterations)
+                print(json.dumps(convert_to_serializable(results)))
+                return
+            
+            elif sys.argv[1] == '--analyze-logs' and len(sys.argv) > 2:
+                # Offline per-day summary of the prediction logs
+                from log_analysis import analyze_logs
+                since = sys.argv[3] if len(sys.argv) > 3 else None
+                until = sys.argv[4] if len(sys.argv) > 4 else None
+                print(json.dumps(analyze_logs(sys.argv[2], since, until)))
+                return
+            
+            elif sys.argv[1] == '--incremental' and len(sys.argv) > 3:
+                # Batch prediction that reuses the manifest's results for unchanged stories
+                id_field = pop_option(sys.argv, '--id-field', 'id')
+                prune = '--prune' in sys.argv
+                if prune:
+                    sys.argv.remove('--prune')
+                manifest_path = sys.argv[2]
+                input_json = json.loads(sys.argv[3])
+                
+                # Optional DQN influence parameter
+                dqn_influence = 0.3
+                if len(sys.argv) > 4:
+                    dqn_influence = float(sys.argv[4])
+                
+                # Optional dynamic influence flag
+                use_dynamic_influence = False
+                if len(sys.argv) > 5 and sys.argv[5].lower() == 'dynamic':
+                    use_dynamic_influence = True
+                
+                result = run_incremental_prediction(input_json, manifest_path=manifest_path,
+                                                    dqn_influence=dqn_influence,
+                                                    use_dynamic_influence=use_dynamic_influence,
+                                                    workers=workers, id_field=id_field, prune=prune)
+                print(json.dumps(result))
+                return
+            
+            elif sys.argv[1] == '--validate' and len(sys.argv) > 2:
                 # Validation mode
                 test_data_path = sys.argv[2]
                 
@@ -568,7 +1641,7 @@ def main():
                     use_dynamic_influence = True
                 
                 # Run validation
-                metrics = validate_model(test_data_path, dqn_influence, use_dynamic_influence)
+                metrics = validate_model(test_data_path, dqn_influence, use_dynamic_influence, chunk_size)
                 # Convert to serializable format
                 metrics = convert_to_serializable(metrics)
                 print(json.dumps(metrics))
@@ -581,7 +1654,7 @@ def main():
                 # Optional influence values
                 influence_values = None
                 if len(sys.argv) > 3:
-                    influence_values = [float(val) for val in sys.argv[3].split(',')]
+                    influence_values = parse_influence_values(sys.argv[3])
                 
                 # Optional dynamic influence flag
                 use_dynamic_influence = False
@@ -589,7 +1662,7 @@ def main():
                     use_dynamic_influence = True
                 
                 # Find optimal influence
-                optimal = find_optimal_influence(test_data_path, influence_values, use_dynamic_influence)
+                optimal = find_optimal_influence(test_data_path, influence_values, use_dynamic_influence, chunk_size)
                 # Convert to serializable format
                 optimal = convert_to_serializable(optimal)
                 print(json.dumps(optimal))
@@ -612,42 +1685,12 @@ def main():
             models = get_models()
             
             # Handle single prediction or batch predictions
-            if isinstance(input_json, list):
-                # Batch prediction
-                results = batch_predict(input_json, models, dqn_influence, use_dynamic_influence)
-                
-                # Convert to serializable format and log predictions
-                serializable_results = []
-                for result in results:
-                    # Log prediction for monitoring
-                    if os.environ.get('ENABLE_PREDICTION_LOGGING', 'false').lower() == 'true':
-                        log_prediction(result)
-                    
-                    # Convert to serializable format
-                    serializable_result = convert_to_serializable(result)
-                    serializable_results.append(serializable_result)
-                
-                # Print ONLY json to stdout
-                print(json.dumps(serializable_results))
-            else:
-                # Single prediction
-                title = input_json.get('title', '')
-                description = input_json.get('description', '')
-                result = predict(title, description, models, dqn_influence, use_dynamic_influence)
-                
-                # Log prediction for monitoring
-                if os.environ.get('ENABLE_PREDICTION_LOGGING', 'false').lower() == 'true':
-                    log_prediction({
-                        'title': title,
-                        'description': description,
-                        **result
-                    })
-                
-                # Convert to serializable format
-                result = convert_to_serializable(result)
-                
-                # Print ONLY json to stdout
-                print(json.dumps(result))
+            result = run_prediction(input_json, models, dqn_influence, use_dynamic_influence, workers)
+            
+            # Print ONLY json to stdout
+            with STAGE_SECONDS.time(stage='serialize'):
+                output = json.dumps(result)
+            print(output)
                 
         except Exception as e:
             print(f"Failed to process input: {str(e)}", file=sys.stderr)
@@ -658,7 +1701,7 @@ def main():
             sys.exit(1)
     else:
         print(json.dumps({
-            'error': 'No input provided. Usage: python predict.py <json_input> [dqn_influence] [dynamic] or python predict.py --validate <test_data_path> [dqn_influence] [dynamic]'
+            'error': 'No input provided. Usage: python predict.py <json_input> [dqn_influence] [dynamic] [--workers <n>] [--engine sklearn|array] or python predict.py --incremental <manifest_path> <json_list> [dqn_influence] [dynamic] [--id-field <name>] [--prune] or python predict.py --validate <test_data_path> [dqn_influence] [dynamic] [--chunk-size <rows>] or python predict.py --serve [--socket <path>] or python predict.py --serve-async [--socket <path>] or python predict.py --build-bundle [bundle_dir] or python predict.py --bench [stub] [--iterations <n>] or python predict.py --analyze-logs <log_dir> [since] [until]'
         }))
         sys.exit(1)
 
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_cache_key(text, model_version, dqn_influence, use_dynamic_influence):
+    """Build a content-addressed key for one prediction
+
+    Args:
+        text: Normalised story text (title and description)
+        model_version: Version string of the loaded model artifacts
+        dqn_influence: Weight of DQN adjustment (0.0-1.0)
+        use_dynamic_influence: Whether confidence-based dynamic influence is used
+
+    Returns:
+        Hex SHA-256 digest identifying the prediction
+    """
+    payload = json.dumps([text, model_version, round(float(dqn_influence), 6), bool(use_dynamic_influence)])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PredictionCache:
+    """LRU cache of prediction results with an optional SQLite tier
+
+    The in-process tier holds up to max_size results. When a disk path is
+    given, results are also written to SQLite so they survive restarts and
+    can be shared between processes; disk hits are promoted back into memory.
+    """
+
+    def __init__(self, max_size=10000, disk_path=None, max_disk_entries=1000000):
+        self.max_size = max_size
+        self.disk_path = disk_path
+        self.max_disk_entries = max_disk_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_writes = 0
+
+        # Hit/miss counters
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if disk_path:
+            self._open_disk(disk_path)
+
+    def _open_disk(self, path):
+        """Open (or create) the SQLite tier"""
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS predictions '
+                '(key TEXT PRIMARY KEY, result TEXT NOT NULL, accessed REAL NOT NULL)'
+            )
+        except sqlite3.Error as e:
+            print(f"Error opening prediction cache database: {e}", file=sys.stderr)
+            self._db = None
+
+    def get(self, key):
+        """Return a copy of the cached result for key, or None"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(result)
+
+            result = self._disk_get(key)
+            if result is not None:
+                self._memory_put(key, result)
+                self.hits += 1
+                self.disk_hits += 1
+                return dict(result)
+
+            self.misses += 1
+            return None
+
+    def put(self, key, result):
+        """Store a copy of a prediction result"""
+        with self._lock:
+            result = dict(result)
+            self._memory_put(key, result)
+            self._disk_put(key, result)
+
+    def _memory_put(self, key, result):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, key):
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute('SELECT result FROM predictions WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE predictions SET accessed = ? WHERE key = ?', (time.time(), key))
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            print(f"Error reading prediction cache: {e}", file=sys.stderr)
+            return None
+
+    def _disk_put(self, key, result):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                'INSERT OR REPLACE INTO predictions (key, result, accessed) VALUES (?, ?, ?)',
+                (key, json.dumps(result), time.time())
+            )
+
+            # Trim the least recently used rows now and then
+            self._disk_writes += 1
+            if self._disk_writes % 1000 == 0:
+                self._db.execute(
+                    'DELETE FROM predictions WHERE key IN ('
+                    'SELECT key FROM predictions ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                    (self.max_disk_entries,)
+                )
+        except sqlite3.Error as e:
+            print(f"Error writing prediction cache: {e}", file=sys.stderr)
+
+    def clear(self):
+        """Drop every cached result and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM predictions')
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'disk_path': self.disk_path,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
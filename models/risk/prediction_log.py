@@ -0,0 +1,190 @@
+import atexit
+import gzip
+import json
+import os
+import queue
+import sys
+import threading
+from datetime import datetime
+
+# Supported on-disk formats and their file extensions
+LOG_FORMATS = {
+    'jsonl': '.jsonl',
+    'jsonl.gz': '.jsonl.gz'
+}
+
+# Queue marker telling the writer thread to finish
+_CLOSE = object()
+
+
+def log_file_name(date_str, log_format='jsonl'):
+    """Name of the daily prediction log file"""
+    return f"predictions_{date_str}{LOG_FORMATS[log_format]}"
+
+
+def encode_lines(lines, log_format='jsonl'):
+    """Encode a batch of log lines for appending to a daily file
+
+    Gzip logs get one complete gzip member per batch. Readers decompress
+    concatenated members as one stream, so the file stays readable while
+    it is still being appended to.
+    """
+    data = ''.join(lines).encode('utf-8')
+    if log_format == 'jsonl.gz':
+        return gzip.compress(data)
+    return data
+
+
+class PredictionLogWriter:
+    """Append prediction records to daily log files from a background thread
+
+    write() only timestamps the record and puts it on a bounded queue. The
+    writer thread serialises records in batches, keeps the current day's
+    file open, rotates to a new file when the date changes and flushes at
+    least every flush_interval seconds. When the queue is full, write()
+    blocks until there is room instead of dropping records, and close()
+    (registered with atexit) drains everything still queued.
+    """
+
+    def __init__(self, log_dir='prediction_logs', log_format='jsonl', max_queue=10000, batch_size=500,
+                 flush_interval=1.0):
+        if log_format not in LOG_FORMATS:
+            raise ValueError(f"Unknown prediction log format: {log_format}")
+
+        self.log_dir = log_dir
+        self.log_format = log_format
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._file = None
+        self._file_date = None
+
+        # Counters
+        self.written = 0
+        self.errors = 0
+
+        self._thread = threading.Thread(target=self._run, name='prediction-log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, record):
+        """Queue one record, adding a timestamp to it
+
+        Args:
+            record: Dictionary of prediction data (its 'timestamp' key is set)
+        """
+        now = datetime.now()
+        record['timestamp'] = now.isoformat()
+        entry = (now.strftime('%Y-%m-%d'), dict(record))
+
+        with self._lock:
+            if not self._closed:
+                self._queue.put(entry)
+                return
+
+            # Nothing is draining the queue any more, so write directly
+            self._write_batch([entry])
+            self._close_file()
+
+    def flush(self):
+        """Block until every queued record has been written and flushed"""
+        if self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Drain the queue, stop the writer thread and close the log file"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._thread.is_alive():
+                self._queue.put(_CLOSE)
+                self._thread.join()
+            self._close_file()
+
+    def stats(self):
+        """Writer counters"""
+        return {
+            'log_dir': self.log_dir,
+            'format': self.log_format,
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'errors': self.errors
+        }
+
+    def _run(self):
+        closing = False
+        while not closing:
+            pending = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                pending.append(item)
+                # Take whatever else is already queued, up to one batch
+                while len(pending) < self.batch_size:
+                    pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            if any(item is _CLOSE for item in pending):
+                closing = True
+            entries = [item for item in pending if item is not _CLOSE]
+
+            if entries:
+                self._write_batch(entries)
+            self._flush_file()
+            for _ in pending:
+                self._queue.task_done()
+
+        self._close_file()
+
+    def _write_batch(self, entries):
+        """Serialise a batch of (date, record) entries into the daily files"""
+        try:
+            lines = []
+            for date_str, record in entries:
+                if date_str != self._file_date and lines:
+                    self._append(lines)
+                    lines = []
+                self._rotate(date_str)
+                lines.append(json.dumps(record) + '\n')
+            if lines:
+                self._append(lines)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error logging prediction: {e}", file=sys.stderr)
+
+    def _append(self, lines):
+        self._file.write(encode_lines(lines, self.log_format))
+        self.written += len(lines)
+
+    def _rotate(self, date_str):
+        """Switch to the log file for date_str if it is not the open one"""
+        if self._file is not None and self._file_date == date_str:
+            return
+        self._close_file()
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._file = open(os.path.join(self.log_dir, log_file_name(date_str, self.log_format)), 'ab')
+        self._file_date = date_str
+
+    def _flush_file(self):
+        if self._file is None:
+            return
+        try:
+            self._file.flush()
+        except Exception as e:
+            self.errors += 1
+            print(f"Error flushing prediction log: {e}", file=sys.stderr)
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        try:
+            self._file.close()
+        except Exception as e:
+            self.errors += 1
+            print(f"Error closing prediction log: {e}", file=sys.stderr)
+        self._file = None
+        self._file_date = None
@@ -1,13 +1,65 @@
 import { AppError, HttpStatus } from '@helpers/errorHandler'
+import { getModelDaemon } from '@helpers/modelDaemon'
 import { Request, Response, RequestHandler, NextFunction } from 'express'
 import fs from 'fs'
-import { exec } from 'child_process'
+import path from 'path'
+import { exec, execFile } from 'child_process'
 import axios from 'axios'
 
 type FileUploadReq = {
   file: File
 }
 
+// Predict one task per requirement with a single batched run of the local model
+const predictTasksLocally = async (requirements: string[]) => {
+  const daemon = getModelDaemon()
+  if (daemon) {
+    const result = await daemon.request<{ tasks: { task: string }[] }>('tasks', 'predict', { requirements })
+    return result.tasks.map((item) => item.task)
+  }
+  return new Promise<string[]>((resolve, reject) => {
+    const child = execFile(
+      'python',
+      ['ai_model/model.py'],
+      { maxBuffer: 64 * 1024 * 1024 },
+      (error, stdout, stderr) => {
+        if (error) {
+          console.error(`Python error: ${stderr}`)
+          return reject(error)
+        }
+        try {
+          resolve(JSON.parse(stdout).tasks.map((item: { task: string }) => item.task))
+        } catch (err) {
+          reject(err)
+        }
+      }
+    )
+    child.stdin?.end(JSON.stringify({ requirements }))
+  })
+}
+
+// Extract the requirements of a PDF, on the model daemon when one is configured
+const extractRequirements = (pdfPath: string) => {
+  const daemon = getModelDaemon()
+  if (daemon) {
+    // The daemon runs in its own working directory
+    return daemon.request<Record<string, string[]>>('extractor', 'extract', { pdf_path: path.resolve(pdfPath) })
+  }
+  return new Promise<Record<string, string[]>>((resolve, reject) => {
+    exec(`python ai_model/extract_requirements.py ${pdfPath}`, (error, stdout, stderr) => {
+      if (error) {
+        console.error(`Python error: ${stderr}`)
+        return reject(error)
+      }
+      try {
+        resolve(JSON.parse(stdout))
+      } catch (err) {
+        reject(err)
+      }
+    })
+  })
+}
+
 const uploadFile: RequestHandler = (
   req: Request<{}, {}, FileUploadReq>,
   res: Response,
@@ -18,19 +70,10 @@ const uploadFile: RequestHandler = (
   }
 
   const pdfPath = req.file.path
-  const pythonScript = 'ai_model/extract_requirements.py'
-
-  return new Promise<void>((resolve, _reject) => {
-    exec(`python ${pythonScript} ${pdfPath}`, async (error, stdout, stderr) => {
-      if (error) {
-        console.error(`Python error: ${stderr}`)
-        res.status(500).json({ error: 'Failed to extract requirements' })
-        return resolve()
-      }
 
+  return extractRequirements(pdfPath).then(
+    async (parsedRequirements) => {
       try {
-        const parsedRequirements = JSON.parse(stdout)
-
         const { functional_requirements, non_functional_requirements } = parsedRequirements
 
         const splitToRequirements = (text: string | string[]) => {
@@ -52,27 +95,33 @@ const uploadFile: RequestHandler = (
           ...splitToRequirements(non_functional_requirements)
         ]
         const tasks = []
-        for (let i = 0; i < requirements.length; i++) {
-          const requirement = requirements[i]
-          const response = await axios.get(
-            `https://python.ugg-roleplay.com/taskapp/api/v1/predict?text=${encodeURIComponent(
-              requirement ?? ''
-            )}`
-          )
-          tasks.push({ requirement, tasks: response.data?.tasks?.map((task: any) => task.task) })
+        if (process.env.LOCAL_TASK_MODEL === 'true') {
+          const predicted = await predictTasksLocally(requirements)
+          tasks.push(...requirements.map((requirement, i) => ({ requirement, tasks: [predicted[i]] })))
+        } else {
+          for (let i = 0; i < requirements.length; i++) {
+            const requirement = requirements[i]
+            const response = await axios.get(
+              `https://python.ugg-roleplay.com/taskapp/api/v1/predict?text=${encodeURIComponent(
+                requirement ?? ''
+              )}`
+            )
+            tasks.push({ requirement, tasks: response.data?.tasks?.map((task: any) => task.task) })
+          }
         }
 
         res.json({ tasks })
-        resolve()
       } catch (err) {
         res.status(500).json({ error: 'Model prediction failed', err: err })
-        resolve()
       } finally {
         // Clean up uploaded file
         fs.unlinkSync(pdfPath)
       }
-    })
-  })
+    },
+    () => {
+      res.status(500).json({ error: 'Failed to extract requirements' })
+    }
+  )
 }
 
 export default uploadFile
@@ -0,0 +1,98 @@
+// services/estimatorServer.ts
+import { PythonShell } from 'python-shell'
+
+interface PendingRequest {
+  resolve: (value: any) => void
+  reject: (reason: Error) => void
+}
+
+/**
+ * Client for the long-lived `predict.py --serve` process.
+ *
+ * The Python process loads the models once and then answers newline-delimited
+ * JSON requests, so each estimation only pays for inference instead of the
+ * interpreter start-up and model load.
+ */
+export class EstimatorServer {
+  private shell: PythonShell | null = null
+  private nextId = 1
+  private pending = new Map<number, PendingRequest>()
+
+  constructor(private scriptPath: string, private pythonPath = 'python') {}
+
+  /**
+   * Send a request to the estimator server, starting it if needed
+   * @param type Request type (predict, batch, validate, find_optimal, ping, stats, metrics)
+   * @param payload Request fields
+   * @returns The `result` field of the server response
+   */
+  request<T = any>(type: string, payload: Record<string, unknown> = {}): Promise<T> {
+    const shell = this.start()
+    const id = this.nextId
+    this.nextId += 1
+
+    return new Promise<T>((resolve, reject) => {
+      this.pending.set(id, { resolve, reject })
+      shell.send({ ...payload, id, type })
+    })
+  }
+
+  /**
+   * Stop the server process, failing any requests still in flight
+   */
+  stop() {
+    if (this.shell) {
+      this.shell.kill()
+      this.shell = null
+    }
+  }
+
+  private start(): PythonShell {
+    if (this.shell) {
+      return this.shell
+    }
+
+    const shell = new PythonShell(this.scriptPath, {
+      mode: 'json',
+      pythonPath: this.pythonPath,
+      args: ['--serve']
+    })
+
+    shell.on('message', (message: any) => {
+      // Ignore lifecycle events such as the ready notification
+      if (!message || message.id === undefined || message.id === null) {
+        return
+      }
+
+      const request = this.pending.get(message.id)
+      if (!request) {
+        return
+      }
+      this.pending.delete(message.id)
+
+      if (message.error) {
+        request.reject(new Error(message.error))
+      } else {
+        request.resolve(message.result)
+      }
+    })
+
+    shell.on('error', (error: Error) => {
+      console.error('Estimator server error:', error)
+    })
+
+    shell.on('close', () => {
+      // The process exited, so nothing in flight will be answered
+      if (this.shell === shell) {
+        this.shell = null
+      }
+      this.pending.forEach((request) => request.reject(new Error('Estimator server exited')))
+      this.pending.clear()
+    })
+
+    this.shell = shell
+    return shell
+  }
+}
+
+export default EstimatorServer
@@ -1,13 +1,15 @@
 // services/estimatorService.ts
-import { PythonShell, Options } from 'python-shell'
 import path from 'path'
 import StoryModel, { ComparisonStatus, RiskLevel } from '../../models/storypoint.model'
+import EstimatorServer from './estimatorServer'
+import { getModelDaemon } from '@helpers/modelDaemon'
 
 export interface StoryInput {
   title: string
   description?: string
   projectId?: string
   teamEstimate?: number
+  githubId?: number
 }
 
 export interface EstimationResult {
@@ -58,12 +60,35 @@ export interface OptimalInfluenceResult {
   }[]
 }
 
+export interface IncrementalEstimation {
+  results: EstimationResult[]
+  stats: {
+    stories: number
+    reused: number
+    computed: number
+    new: number
+    changed: number
+    unidentified: number
+    removed: number
+    invalidated: string | null
+  }
+}
+
 export class EstimatorService {
   private pythonScriptPath: string
 
+  private server: Pick<EstimatorServer, 'request'>
+
   constructor() {
     // Path to Python script
     this.pythonScriptPath = path.join(__dirname, '../../../models/risk/predict.py')
+
+    // Long-lived Python process that keeps the models loaded between requests: the shared
+    // model daemon when MODEL_DAEMON_SOCKET is set, otherwise a private predict.py --serve
+    const daemon = getModelDaemon()
+    this.server = daemon
+      ? daemon.service('estimator')
+      : new EstimatorServer(this.pythonScriptPath, 'python')
   }
 
   /**
@@ -79,23 +104,17 @@ export class EstimatorService {
     saveToDb = true
   ): Promise<EstimationResult> {
     try {
-      // Prepare options for Python Shell
-      const options: Options = {
-        mode: 'json' as const,
-        pythonPath: 'python', // Ensure Python 3 is installed and in PATH
-        args: [JSON.stringify(input), String(dqnInfluence)]
-      }
-
-      // Run Python script
-      const results = await PythonShell.run(this.pythonScriptPath, options)
+      // Run prediction on the persistent estimator server
+      const result = await this.server.request<any>('predict', {
+        input,
+        dqn_influence: dqnInfluence
+      })
 
-      // Check if we have valid results
-      if (!results || results.length === 0) {
+      // Check if we have a valid result
+      if (!result) {
         throw new Error('No estimation result returned')
       }
 
-      const result = results[0]
-
       // Check for errors
       if (result.error) {
         throw new Error(`Estimation failed: ${result.error}`)
@@ -136,22 +155,13 @@ export class EstimatorService {
     saveToDb = true
   ): Promise<EstimationResult[]> {
     try {
-      // Prepare options for Python Shell
-      const options: Options = {
-        mode: 'json' as const,
-        pythonPath: 'python',
-        args: [JSON.stringify(inputs), String(dqnInfluence)]
-      }
-
-      // Run Python script
-      const results = await PythonShell.run(this.pythonScriptPath, options)
+      // Run batch prediction on the persistent estimator server
+      const estimations = await this.requestBatch(inputs, dqnInfluence)
 
-      if (!results || results.length === 0) {
+      if (!estimations || estimations.length === 0) {
         throw new Error('No estimation results returned')
       }
 
-      const estimations = results[0]
-
       // Save to database if requested
       if (saveToDb) {
         const storiesToSave = inputs.map((input, index) => {
@@ -227,6 +237,56 @@ export class EstimatorService {
     }
   }
 
+  /**
+   * Run a batch prediction, re-estimating only new or changed stories when
+   * ESTIMATE_MANIFEST_DIR is set. Each project keeps a manifest there of its
+   * stories' last results, keyed by GitHub id and content; it is invalidated
+   * when the model artifacts or the DQN influence change. Stories are grouped
+   * by projectId, so each manifest only ever holds its own project's stories.
+   * @param inputs Array of user story inputs
+   * @param dqnInfluence Weight of DQN adjustment (0.0-1.0)
+   * @returns Array of estimation results, in the order of inputs
+   */
+  private async requestBatch(inputs: StoryInput[], dqnInfluence: number): Promise<any[]> {
+    const manifestDir = process.env.ESTIMATE_MANIFEST_DIR
+    if (!manifestDir) {
+      return this.server.request<any[]>('batch', {
+        input: inputs,
+        dqn_influence: dqnInfluence
+      })
+    }
+
+    // Each project has its own manifest, so a mixed batch runs one request per project
+    const positionsByProject = new Map<string, number[]>()
+    inputs.forEach((input, index) => {
+      const project = input.projectId ? String(input.projectId) : 'default'
+      const positions = positionsByProject.get(project) || []
+      positions.push(index)
+      positionsByProject.set(project, positions)
+    })
+
+    const estimations: any[] = new Array(inputs.length)
+    await Promise.all(
+      Array.from(positionsByProject.entries()).map(async ([project, positions]) => {
+        const { results, stats } = await this.server.request<IncrementalEstimation>('incremental', {
+          input: positions.map((index) => inputs[index]),
+          // encodeURIComponent keeps distinct project ids in distinct files and escapes '/'
+          manifest_path: path.resolve(manifestDir, `${encodeURIComponent(project)}.json`),
+          id_field: 'githubId',
+          dqn_influence: dqnInfluence
+        })
+        console.log(
+          `Incremental estimation for project ${project}: ` +
+            `${stats.computed} of ${stats.stories} stories recomputed, ${stats.reused} reused`
+        )
+        positions.forEach((index, i) => {
+          estimations[index] = results[i]
+        })
+      })
+    )
+    return estimations
+  }
+
   /**
    * Validate model performance using test data
    * @param testDataPath Path to CSV file with test data
@@ -235,21 +295,17 @@ export class EstimatorService {
    */
   async validateModel(testDataPath: string, dqnInfluence = 0.3): Promise<ValidationMetrics> {
     try {
-      // Prepare options for Python Shell
-      const options: Options = {
-        mode: 'json' as const,
-        pythonPath: 'python',
-        args: ['--validate', testDataPath, String(dqnInfluence)]
-      }
-
-      // Run Python script
-      const results = await PythonShell.run(this.pythonScriptPath, options)
+      // Run validation on the persistent estimator server
+      const metrics = await this.server.request<ValidationMetrics>('validate', {
+        test_data_path: testDataPath,
+        dqn_influence: dqnInfluence
+      })
 
-      if (!results || results.length === 0) {
+      if (!metrics) {
         throw new Error('No validation results returned')
       }
 
-      return results[0] as ValidationMetrics
+      return metrics
     } catch (error: any) {
       console.error('Validation error:', error)
       throw new Error(`Failed to validate model: ${error.message}`)
@@ -267,29 +323,18 @@ export class EstimatorService {
     influenceValues?: number[]
   ): Promise<OptimalInfluenceResult> {
     try {
-      // Prepare options for Python Shell
-      const options: Options = {
-        mode: 'json' as const,
-        pythonPath: 'python',
-        args: ['--find-optimal', testDataPath]
-      }
-
-      // Add influence values if provided
-      if (influenceValues && influenceValues.length > 0) {
-        // Make sure options.args exists before pushing to it
-        if (options.args) {
-          options.args.push(influenceValues.join(','))
-        }
-      }
-
-      // Run Python script
-      const results = await PythonShell.run(this.pythonScriptPath, options)
+      // Run the influence search on the persistent estimator server
+      const optimal = await this.server.request<OptimalInfluenceResult>('find_optimal', {
+        test_data_path: testDataPath,
+        // Fall back to the default influence values when none are provided
+        influence_values: influenceValues && influenceValues.length > 0 ? influenceValues : null
+      })
 
-      if (!results || results.length === 0) {
+      if (!optimal) {
         throw new Error('No optimal influence results returned')
       }
 
-      return results[0] as OptimalInfluenceResult
+      return optimal
     } catch (error: any) {
       console.error('Optimal influence error:', error)
       throw new Error(`Failed to find optimal influence: ${error.message}`)
@@ -0,0 +1,141 @@
+import net from 'net'
+
+interface PendingRequest {
+  resolve: (value: any) => void
+  reject: (reason: Error) => void
+}
+
+/**
+ * Client for the resident `models/model_daemon.py` process.
+ *
+ * The daemon keeps the estimator, requirement extractor and task model loaded
+ * in a pool of worker processes and answers newline-delimited JSON requests
+ * on a Unix socket. One connection is shared and requests are matched to
+ * responses by id, so concurrent requests do not wait for each other.
+ */
+export class ModelDaemonClient {
+  private socket: net.Socket | null = null
+  private buffer = ''
+  private nextId = 1
+  private pending = new Map<number, PendingRequest>()
+
+  constructor(private socketPath: string) {}
+
+  /**
+   * Send a request to one of the daemon's services
+   * @param service Service name (estimator, extractor, tasks or daemon)
+   * @param type Request type, e.g. predict, batch, extract, stats or reload
+   * @param payload Request fields
+   * @returns The `result` field of the daemon response
+   */
+  request<T = any>(service: string, type: string, payload: Record<string, unknown> = {}): Promise<T> {
+    const socket = this.connect()
+    const id = this.nextId
+    this.nextId += 1
+
+    return new Promise<T>((resolve, reject) => {
+      this.pending.set(id, { resolve, reject })
+      socket.write(JSON.stringify({ ...payload, id, service, type }) + '\n')
+    })
+  }
+
+  /**
+   * Request interface of one service, usable in place of an EstimatorServer
+   * @param service Service name
+   */
+  service(service: string) {
+    return {
+      request: <T = any>(type: string, payload: Record<string, unknown> = {}) =>
+        this.request<T>(service, type, payload)
+    }
+  }
+
+  /**
+   * Close the connection, failing any requests still in flight
+   */
+  close() {
+    if (this.socket) {
+      this.socket.end()
+      this.socket = null
+    }
+  }
+
+  private connect(): net.Socket {
+    if (this.socket) {
+      return this.socket
+    }
+
+    const socket = net.createConnection(this.socketPath)
+    socket.setEncoding('utf8')
+
+    socket.on('data', (chunk: string) => {
+      this.buffer += chunk
+      let newline = this.buffer.indexOf('\n')
+      while (newline >= 0) {
+        const line = this.buffer.slice(0, newline).trim()
+        this.buffer = this.buffer.slice(newline + 1)
+        newline = this.buffer.indexOf('\n')
+        if (line) {
+          this.handleLine(line)
+        }
+      }
+    })
+
+    socket.on('error', (error: Error) => {
+      console.error('Model daemon connection error:', error)
+    })
+
+    socket.on('close', () => {
+      // The next request reconnects; nothing in flight will be answered
+      if (this.socket === socket) {
+        this.socket = null
+      }
+      this.buffer = ''
+      this.pending.forEach((request) => request.reject(new Error('Model daemon connection closed')))
+      this.pending.clear()
+    })
+
+    this.socket = socket
+    return socket
+  }
+
+  private handleLine(line: string) {
+    let message: any
+    try {
+      message = JSON.parse(line)
+    } catch (err) {
+      console.error('Invalid model daemon response:', line)
+      return
+    }
+
+    const request = this.pending.get(message.id)
+    if (!request) {
+      return
+    }
+    this.pending.delete(message.id)
+
+    if (message.error) {
+      request.reject(new Error(message.error))
+    } else {
+      request.resolve(message.result)
+    }
+  }
+}
+
+let daemon: ModelDaemonClient | null = null
+
+/**
+ * Shared daemon client when MODEL_DAEMON_SOCKET is set, otherwise null
+ */
+export const getModelDaemon = (): ModelDaemonClient | null => {
+  const socketPath = process.env.MODEL_DAEMON_SOCKET
+  if (!socketPath) {
+    return null
+  }
+  if (!daemon) {
+    daemon = new ModelDaemonClient(socketPath)
+  }
+  return daemon
+}
+
+export default ModelDaemonClient